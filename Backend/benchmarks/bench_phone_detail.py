@@ -0,0 +1,101 @@
+"""
+Query count and assembly time of the phone detail payload by variant count
+
+Creates phones with 1, 10 and 100 active variants (every variant with an
+image) in a throwaway test database, then times building the detail
+payload the way ProductDetailView does: PhoneDetailSerializer.get_queryset()
+followed by serialization. A phone loaded without the prefetch is
+measured too. Stripe calls, signals and cache writes are disabled.
+
+Usage (from Backend/):
+    python benchmarks/bench_phone_detail.py [--iterations 200] [--variants 1 10 100]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import signals
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.test import APIRequestFactory
+
+from products.serializers import PhoneDetailSerializer
+from store.models import Phone, PhoneVariant
+
+
+def create_phone(variants):
+    phone = Phone.objects.create(name=f"Phone {variants}", brand="Brand", stripe_id="prod_bench")
+    PhoneVariant.objects.bulk_create([
+        PhoneVariant(
+            phone=phone, sku=f"BENCH-{variants}-{i}", color=f"Color {i}", storage="128GB",
+            price=799, stock=5, image=f"phones/bench-{variants}-{i}.jpg"
+        )
+        for i in range(variants)
+    ])
+    return phone
+
+
+def measure(build, iterations):
+    with CaptureQueriesContext(connection) as queries:
+        build()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - start)
+    return len(queries), statistics.median(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--variants', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    # The schema is created from the models, like pytest --nomigrations
+    settings.MIGRATION_MODULES = {app.label: None for app in apps.get_app_configs()}
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+
+    request = APIRequestFactory().get('/products/phone/')
+    context = {'request': request}
+    try:
+        with patch.object(signals.post_save, 'send'), patch.object(signals.post_delete, 'send'):
+            phones = {count: create_phone(count) for count in args.variants}
+
+        print(f"{args.iterations} payloads per row, {connection.vendor} database\n")
+        print(f"  {'variants':>8}  {'path':<22} {'queries':>7}  {'median':>10}")
+        for count, phone in phones.items():
+            paths = (
+                ('get_queryset()', lambda: PhoneDetailSerializer(
+                    PhoneDetailSerializer.get_queryset().get(pk=phone.pk), context=context).data),
+                ('instance, no prefetch', lambda: PhoneDetailSerializer(
+                    Phone.objects.get(pk=phone.pk), context=context).data),
+            )
+            for label, build in paths:
+                queries, median = measure(build, args.iterations)
+                print(f"  {count:>8}  {label:<22} {queries:>7}  {median:>7.2f} ms")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
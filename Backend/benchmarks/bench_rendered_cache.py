@@ -0,0 +1,139 @@
+"""
+Hit-path latency of cached views with and without the rendered JSON cache
+
+Warms each view's cache once, then times repeated cache hits with
+RENDERED_CACHE_ENABLED off (data cache hit + DRF negotiation/rendering)
+and on (stored bytes returned as a plain HttpResponse). Builders are
+replaced with synthetic payloads, so no database is needed.
+
+Usage (from Backend/):
+    python benchmarks/bench_rendered_cache.py [--iterations 2000] [--products 24] [--redis]
+
+By default an in-memory cache is used; --redis uses the configured
+django-redis cache instead, which requires a running Redis server.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from products.services.cache_service import CacheService
+from products.views import BrandProductsView
+from store.views import HomePageAPIView
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'ecom',
+    }
+}
+
+
+def product_card(i):
+    return {
+        'id': i,
+        'name': f'Phone {i}',
+        'slug': f'brand-phone-{i}',
+        'brand': 'Brand',
+        'price': '999.00',
+        'image': f'http://localhost:8000/media/phones/phone-{i}.jpg',
+        'is_new_arrival': i % 2 == 0,
+        'is_best_seller': i % 3 == 0,
+        'colors': ['Black', 'White', 'Blue'],
+        'storage_options': ['128GB', '256GB', '512GB'],
+    }
+
+
+def homepage_payload(products):
+    cards = [product_card(i) for i in range(products)]
+    return {
+        'new_arrivals': {'phones': cards[:4], 'accessories': cards[4:8]},
+        'best_sellers': {'phones': cards[8:12], 'accessories': cards[12:16]},
+        'featured_phones': cards[:products],
+    }
+
+
+def brand_payload(products):
+    return {
+        'count': products,
+        'next': None,
+        'previous': None,
+        'results': [product_card(i) for i in range(products)],
+    }
+
+
+def time_requests(view, path, iterations, **kwargs):
+    factory = APIRequestFactory()
+    timings = []
+    for _ in range(iterations):
+        request = factory.get(path, HTTP_ACCEPT='application/json')
+        start = time.perf_counter()
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    median = statistics.median(timings) * 1e6
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1e6
+    print(f"  {label:<22} median {median:8.1f} us   p95 {p95:8.1f} us")
+    return median
+
+
+def run(name, view, path, iterations, **kwargs):
+    print(name)
+    medians = {}
+    for label, enabled in (('before (DRF render)', False), ('after (rendered bytes)', True)):
+        cache_settings = dict(settings.CACHE_SETTINGS, RENDERED_CACHE_ENABLED=enabled)
+        with override_settings(CACHE_SETTINGS=cache_settings):
+            cache.clear()
+            CacheService.clear_local_cache()
+            time_requests(view, path, 1, **kwargs)  # Warm the caches
+            medians[label] = summarize(label, time_requests(view, path, iterations, **kwargs))
+    before, after = medians.values()
+    print(f"  speedup {before / after:.1f}x\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=24, help='Product cards per payload')
+    parser.add_argument('--redis', action='store_true', help='Use the configured Redis cache')
+    args = parser.parse_args()
+
+    # Request and cache logging would dominate the timings (and locmem has no tag registry)
+    logging.disable(logging.CRITICAL)
+
+    caches = settings.CACHES if args.redis else LOCMEM_CACHES
+    with override_settings(CACHES=caches), \
+            patch.object(CacheService, '_acquire_fill_lock', return_value=(True, None)), \
+            patch.object(CacheService, '_release_fill_lock'), \
+            patch.object(HomePageAPIView, 'build_homepage_data', return_value=homepage_payload(args.products)), \
+            patch.object(BrandProductsView, 'build_brand_products', return_value=brand_payload(args.products)):
+        print(f"{args.iterations} cache hits, {args.products} products per payload, "
+              f"{'redis' if args.redis else 'locmem'} cache\n")
+        run('HomePageAPIView', HomePageAPIView.as_view(), '/api/homepage/', args.iterations)
+        run('BrandProductsView', BrandProductsView.as_view(), '/products/brand/apple/', args.iterations, brand='apple')
+
+
+if __name__ == '__main__':
+    main()
@@ -61,6 +61,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     'products.middleware.CacheMonitorMiddleware',  # Add cache monitoring
+    'products.middleware.InvalidationBatchMiddleware',  # Flush signal invalidations once per request
 ]
 
 ROOT_URLCONF = "ecommerce.urls"
@@ -82,6 +83,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "ecommerce.wsgi.application"
+ASGI_APPLICATION = "ecommerce.asgi.application"
+
+# Route the hot read endpoints to their async variants, which answer cache
+# hits on the event loop. Only worthwhile when served by an ASGI server.
+ASYNC_VIEWS_ENABLED = os.getenv('ASYNC_VIEWS_ENABLED', 'false').lower() == 'true'
 
 
 # Database
@@ -135,6 +141,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Absolute base for media URLs in API responses, e.g. a CDN
+# (https://cdn.example.com/media/). Empty: the requesting host + MEDIA_URL.
+# See products.media.MediaURLResolver.
+MEDIA_BASE_URL = os.getenv('MEDIA_BASE_URL', '')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -148,6 +158,10 @@ CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', default=True)  # Fo
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 
+# Related products listed on phone and accessory details, precomputed into
+# products.RelatedProduct (see products.services.related_products)
+RELATED_PRODUCTS_LIMIT = 4
+
 # Tiered cache settings for different content types
 # All times in seconds
 CACHE_SETTINGS = {
@@ -155,9 +169,12 @@ CACHE_SETTINGS = {
     'DYNAMIC_TTL': 60 * 5,  # 5 minutes for highly dynamic content
     'BRAND_PRODUCTS_TTL': 60 * 10,  # 10 minutes for brand product listings
     'HOMEPAGE_TTL': 60 * 15,  # 15 minutes for homepage content
+    'FLASH_DEAL_DETAIL_TTL': 60 * 5,  # 5 minutes, deals are time-sensitive
     
     # Semi-dynamic content - medium cache times
-    'PRODUCT_DETAIL_TTL': 60 * 30,  # 30 minutes for product details
+    # 6 hours for product details: they are tagged and invalidated by model
+    # signals, so the TTL only bounds how long an unused entry stays in Redis
+    'PRODUCT_DETAIL_TTL': 60 * 60 * 6,
     'CATEGORY_TTL': 60 * 60,  # 1 hour for category listings
     
     # Static content - long cache times
@@ -165,6 +182,101 @@ CACHE_SETTINGS = {
     
     # Version for cache key namespacing
     'VERSION': 1,
+
+    # Single-flight cache fill (see CacheService.get_or_compute)
+    'FILL_LOCK_TIMEOUT': 10,  # Seconds before an abandoned rebuild lock expires
+    'FILL_WAIT_TIMEOUT': 2,  # Seconds other workers wait for the rebuild
+    'FILL_POLL_INTERVAL': 0.05,  # Seconds between cache polls while waiting
+
+    # In-process L1 tier in front of Redis (see CacheService.get_local_cache)
+    'L1_ENABLED': os.getenv('CACHE_L1_ENABLED', 'true').lower() == 'true',
+    'L1_MAX_ENTRIES': 1000,  # LRU bound per worker process
+    'L1_TTL': 30,  # Upper bound on how long a worker serves its local copy
+    'L1_CHANNEL': 'cache:l1:invalidate',  # Redis pub/sub channel for evictions
+
+    # Stale-while-revalidate: seconds past the TTL that an entry may still be
+    # served while a background thread rebuilds it (prefixes not listed: 0)
+    'STALE_TTL': {
+        'homepage': 60,
+        'brand_products': 60,
+        'product_detail': 60 * 5,
+        'new_arrivals': 60,
+        'best_sellers': 60,
+    },
+    'REVALIDATE_WORKERS': 4,  # Background rebuild threads per process
+
+    # Serve cached homepage/brand responses as pre-rendered JSON bytes
+    # (see products.mixins.RenderedResponseCacheMixin)
+    'RENDERED_CACHE_ENABLED': os.getenv('CACHE_RENDERED_ENABLED', 'true').lower() == 'true',
+
+    # HTTP cache tier (CDN / reverse proxy) in front of the API, see
+    # RenderedResponseCacheMixin.add_http_cache_headers
+    'HTTP_CACHE': {
+        'BROWSER_MAX_AGE': 0,  # Browsers revalidate with the ETag
+        'SURROGATE_MAX_AGE': None,  # Shared caches: the entry's TTL unless capped here
+    },
+    # Purges surrogate keys when tags are invalidated (see products.services.purge):
+    # NullPurgeBackend, MemoryPurgeBackend, FilePurgeBackend or HTTPPurgeBackend
+    'PURGE_BACKEND': {
+        'BACKEND': os.getenv('CACHE_PURGE_BACKEND', 'products.services.purge.NullPurgeBackend'),
+        'OPTIONS': {},
+        'RETRY_DELAY': 30,  # Seconds before failed purges are retried if no other purge comes
+    },
+
+    # Cached value encoding (see products.services.codec): 'json', 'msgpack'
+    # (needs the msgpack package), 'pickle', or 'none' to hand values to
+    # django-redis unchanged
+    'SERIALIZER': os.getenv('CACHE_SERIALIZER', 'json'),
+    'COMPRESS_MIN_BYTES': 1024,  # zlib-compress encoded values at least this large
+    'COMPRESS_LEVEL': 6,
+
+    # Cache keys (see CacheService.get_key / normalize_params): query params
+    # matching these patterns never become part of a key, and longer keys
+    # are hashed
+    'IGNORED_PARAMS': ['refresh', 'utm_*', 'fbclid', 'gclid', 'msclkid', '_', 'cb'],
+    'MAX_KEY_LENGTH': 200,
+
+    # Bulk invalidation (see products.services.invalidation)
+    'INVALIDATION_BATCH_SIZE': 500,  # Max keys per SCAN page / UNLINK call
+
+    # Unknown product slugs: 404s are cached for NEGATIVE_TTL seconds, and a
+    # Bloom filter of known slugs (products.services.slug_filter, built by
+    # the rebuild_slug_filter command) rejects most of them without a query
+    'NEGATIVE_TTL': 60,
+    'SLUG_FILTER': {
+        'ENABLED': os.getenv('CACHE_SLUG_FILTER_ENABLED', 'true').lower() == 'true',
+        'CAPACITY': 100000,  # Expected number of slugs
+        'ERROR_RATE': 0.01,  # False positive rate at capacity
+    },
+
+    # products/batch/?slugs=...: most slugs one request may ask for
+    'PRODUCT_BATCH_MAX_SLUGS': 50,
+
+    # Redis outages (see products.services.circuit_breaker): after
+    # FAILURE_THRESHOLD consecutive connection errors, cache calls go to an
+    # in-process fallback for RESET_TIMEOUT seconds before Redis is probed
+    'CIRCUIT_BREAKER': {
+        'ENABLED': os.getenv('CACHE_CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true',
+        'FAILURE_THRESHOLD': 5,
+        'RESET_TIMEOUT': 30,
+        'PROBE_TIMEOUT': 10,  # Seconds before a probe that never reported is retried
+        'FALLBACK_MAX_ENTRIES': 1000,  # Per worker process
+    },
+    
+    # Distinct keys per prefix are estimated from a 1-in-N hash sample of
+    # written keys, so most writes skip the HyperLogLog round trip
+    'KEY_CARDINALITY_SAMPLING': 16,
+
+    # Bearer token Prometheus sends to scrape metrics/cache/ without a staff
+    # login; unset, the endpoint is staff only
+    'METRICS_SCRAPE_TOKEN': os.getenv('CACHE_METRICS_TOKEN', ''),
+
+    # Keyspace sampling for the cache census endpoint and command
+    'CENSUS': {
+        'SAMPLE_SIZE': 1000,  # Cache keys sampled by default
+        'TAG_SAMPLE_SIZE': 200,  # Tag sets sampled by default
+        'MAX_SAMPLE_SIZE': 10000,  # Upper bound for both, whatever is requested
+    },
 }
 
 # Set default cache TTL
@@ -175,12 +287,15 @@ CACHE_VERSION = CACHE_SETTINGS['VERSION']
 
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # django-redis behind a circuit breaker, see CACHE_SETTINGS['CIRCUIT_BREAKER']
+        "BACKEND": "products.services.cache_backend.CircuitBreakerRedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",  # Redis server location
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
             # Remove the parser class that's causing issues
             "CONNECTION_POOL_KWARGS": {"max_connections": 100},
+            # Counts connection failures for the circuit breaker
+            "CONNECTION_POOL_CLASS": "products.services.circuit_breaker.CircuitBreakerConnectionPool",
             "SOCKET_CONNECT_TIMEOUT": 5,  # seconds
             "SOCKET_TIMEOUT": 5,  # seconds
         },
@@ -0,0 +1,69 @@
+from django.utils.module_loading import import_string
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for sparse fieldsets (?fields= / ?exclude=)
+
+    ``fields`` keeps only the named fields, ``exclude`` drops the named
+    ones; unknown names are ignored. Fields are removed when the
+    serializer is created, so the SerializerMethodFields and nested
+    serializers of fields left out never run. Works with many=True.
+    """
+
+    def __init__(self, *args, fields=None, exclude=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and not exclude:
+            return
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (exclude and name in exclude):
+                self.fields.pop(name)
+
+
+class FieldsetParam:
+    """
+    cache_params canonicalizer for ?fields= and ?exclude=
+
+    Keeps the names that are fields of one of the given serializers
+    (classes or dotted paths, imported on first use), sorted, so unknown
+    names and ordering do not create new cache keys.
+    """
+
+    def __init__(self, *serializer_classes):
+        self.serializer_classes = serializer_classes
+        self._field_names = None
+
+    @property
+    def field_names(self):
+        if self._field_names is None:
+            names = set()
+            for serializer_class in self.serializer_classes:
+                if isinstance(serializer_class, str):
+                    serializer_class = import_string(serializer_class)
+                names.update(serializer_class().fields)
+            self._field_names = frozenset(names)
+        return self._field_names
+
+    def __call__(self, value):
+        names = {name.strip() for name in value.split(',')}
+        return ','.join(sorted(names & self.field_names))
+
+
+def fieldset_kwargs(params, always=()):
+    """
+    Serializer kwargs for the ?fields= / ?exclude= params of a cache key
+
+    Built from the normalized params (see CacheService.normalize_params)
+    so a cached payload always matches its key.
+
+    Args:
+        params: Normalized query params
+        always: Fields kept whatever was asked for (e.g. the ones cache tags
+                are built from)
+    """
+    kwargs = {}
+    if params.get('fields'):
+        kwargs['fields'] = set(params['fields'].split(',')) | set(always)
+    if params.get('exclude'):
+        kwargs['exclude'] = set(params['exclude'].split(',')) - set(always)
+    return kwargs
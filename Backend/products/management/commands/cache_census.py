@@ -0,0 +1,73 @@
+import json
+import logging
+from django.core.management.base import BaseCommand
+from products.services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Report key counts, value sizes and TTLs per cache key prefix from a bounded keyspace sample'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample-size',
+            type=int,
+            help='Cache keys to sample (default: CACHE_SETTINGS CENSUS SAMPLE_SIZE)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--tag-sample-size',
+            type=int,
+            help='Tag sets to sample (default: CACHE_SETTINGS CENSUS TAG_SAMPLE_SIZE)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--top-tags',
+            type=int,
+            default=20,
+            help='Largest tag sets to list (default: 20)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the full census as JSON',
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        try:
+            census = CacheService.get_key_census(
+                sample_size=options.get('sample_size'),
+                tag_sample_size=options.get('tag_sample_size')
+            )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error taking cache census: {e}'))
+            logger.error(f'Error taking cache census: {e}')
+            return
+
+        if options.get('json'):
+            self.stdout.write(json.dumps(census, indent=2))
+            return
+
+        for prefix, stats in census['prefixes'].items():
+            ttl = ', '.join(f'{bucket}: {count}' for bucket, count in stats['ttl'].items() if count)
+            self.stdout.write(
+                f"{prefix}: {stats['keys']} keys, {stats['total_bytes']} bytes "
+                f"(p50 {stats['p50_bytes']}, p95 {stats['p95_bytes']}, p99 {stats['p99_bytes']}, "
+                f"max {stats['max_bytes']}); TTL {ttl or '-'}"
+            )
+
+        for tag, stats in list(census['tags'].items())[:options.get('top_tags')]:
+            self.stdout.write(f"tag:{tag}: {stats['members']} members, {stats['bytes']} bytes")
+
+        scope = 'whole keyspace' if census['complete'] else 'sample only, the scan stopped early'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sampled {census['sampled_keys']} keys and {census['sampled_tags']} tag sets ({scope})"
+            )
+        )
@@ -1,13 +1,14 @@
 import logging
 from django.core.management.base import BaseCommand
 from products.cache_utils import invalidate_brand_cache
+from store.models import Phone
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = 'Clear cache for specific brands or all common brands'
-    
+    help = 'Clear cache for specific brands or all brands in the catalog'
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--brand',
@@ -15,41 +16,69 @@ class Command(BaseCommand):
             help='Specific brand to clear cache for (e.g., "apple", "samsung")',
             required=False
         )
-        
+
         parser.add_argument(
             '--all',
             action='store_true',
-            help='Clear cache for all common brands',
+            help='Clear cache for every brand that has phones in the database',
+            required=False
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Maximum keys unlinked per Redis command',
             required=False
         )
-    
+
+    def get_brands(self):
+        """Distinct, lowercased brands of all phones"""
+        brands = Phone.objects.values_list('brand', flat=True).distinct()
+        return sorted({brand.lower() for brand in brands if brand})
+
     def handle(self, *args, **options):
         brand = options.get('brand')
         clear_all = options.get('all')
-        
+        verbosity = options.get('verbosity', 1)
+
         if not brand and not clear_all:
             self.stdout.write(self.style.ERROR('Please specify either --brand or --all'))
             return
-        
-        if brand:
-            # Clear cache for specific brand
-            num_keys = invalidate_brand_cache(brand.lower())
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully cleared {num_keys} cache keys for brand: {brand}')
-            )
-            logger.info(f'Manually cleared cache for brand: {brand} ({num_keys} keys)')
-        
-        if clear_all:
-            # List of common brands to clear
-            common_brands = ['apple', 'samsung', 'google', 'oneplus', 'xiaomi', 'huawei']
-            total_keys = 0
-            
-            for brand in common_brands:
-                num_keys = invalidate_brand_cache(brand)
-                total_keys += num_keys
-                self.stdout.write(f'Cleared {num_keys} cache keys for {brand}')
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully cleared {total_keys} cache keys for all common brands')
+
+        def progress(state):
+            if verbosity > 1:
+                self.stdout.write(
+                    f"  batch {state['batches']}: {state['deleted']}/{state['scanned']} keys "
+                    f"({state['elapsed']:.2f}s)"
+                )
+
+        def clear(brand_name):
+            return invalidate_brand_cache(
+                brand_name,
+                progress=progress,
+                batch_size=options.get('batch_size')
             )
-            logger.info(f'Manually cleared cache for all common brands ({total_keys} keys)')
+
+        def report(brand_name, result):
+            if result is None:
+                self.stdout.write(self.style.ERROR(f'Error invalidating {brand_name}, see the logs'))
+            elif result['old_generation'] is None:
+                self.stdout.write(f"{result['namespace']}: nothing cached yet")
+            else:
+                self.stdout.write(
+                    f"{result['namespace']}: generation {result['old_generation']} -> {result['new_generation']}"
+                )
+
+        brands = [brand.lower()] if brand else self.get_brands()
+        failed = 0
+        for brand_name in brands:
+            result = clear(brand_name)
+            report(brand_name, result)
+            failed += result is None
+
+        if failed:
+            self.stdout.write(self.style.ERROR(f'Failed to invalidate {failed} of {len(brands)} brands'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Successfully invalidated the cache of {len(brands)} brands'))
+        logger.info(f"Manually invalidated cache for brands: {', '.join(brands)}")
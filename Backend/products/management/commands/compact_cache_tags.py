@@ -0,0 +1,66 @@
+import logging
+from django.core.management.base import BaseCommand
+from products.services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Compact cache tag sets, removing expired and orphaned members'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be removed without changing anything',
+            required=False
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='SCAN count hint and pipeline size (default: 500)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--verbose-tags',
+            action='store_true',
+            help='Print a line for every tag set that had members removed',
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run')
+        verbose_tags = options.get('verbose_tags')
+
+        def report(tag_key, tag_stats):
+            removed = tag_stats['expired_members'] + tag_stats['orphaned_members']
+            if verbose_tags and (removed or tag_stats['deleted']):
+                self.stdout.write(
+                    f"{tag_key}: {tag_stats['expired_members']} expired, "
+                    f"{tag_stats['orphaned_members']} orphaned"
+                    f"{', deleted' if tag_stats['deleted'] else ''}"
+                )
+
+        try:
+            summary = CacheService.compact_tags(
+                batch_size=options.get('batch_size'),
+                dry_run=dry_run,
+                progress=report
+            )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error compacting cache tags: {e}'))
+            logger.error(f'Error compacting cache tags: {e}')
+            return
+
+        prefix = '[dry run] ' if dry_run else ''
+        self.stdout.write(f"{prefix}Scanned {summary['tags_scanned']} tag sets")
+        self.stdout.write(f"{prefix}Expired members: {summary['expired_members']}")
+        self.stdout.write(f"{prefix}Orphaned members: {summary['orphaned_members']}")
+        self.stdout.write(f"{prefix}Empty tag sets removed: {summary['tags_deleted']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefix}Memory reclaimed: {summary['bytes_reclaimed']} bytes")
+        )
+        logger.info(f'Compacted cache tag sets: {summary}')
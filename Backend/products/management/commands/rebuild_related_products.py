@@ -0,0 +1,43 @@
+import logging
+from django.core.management.base import BaseCommand
+from products.models import RelatedProduct
+from products.services.cache_service import CacheService
+from products.services.related_products import RelatedProductService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed related products of every phone and accessory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--brand',
+            type=str,
+            help='Only re-rank the phones of this brand',
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        brand = options.get('brand')
+        tags = set()
+
+        def progress(product_type, group, stale):
+            tags.update(RelatedProductService.product_tag(product_type, pk) for pk in stale)
+            self.stdout.write(f'{product_type} group {group}: {len(stale)} products updated')
+
+        try:
+            if brand:
+                group = RelatedProductService.phone_group(brand)
+                progress(RelatedProduct.PHONE, group, RelatedProductService.refresh_group(RelatedProduct.PHONE, group))
+            else:
+                RelatedProductService.rebuild_all(progress=progress)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error rebuilding related products: {e}'))
+            logger.error(f'Error rebuilding related products: {e}')
+            return
+
+        # Cached details still list the old related products
+        if tags:
+            CacheService.schedule_invalidation(*tags)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt related products, {len(tags)} products updated'))
@@ -0,0 +1,39 @@
+import logging
+from django.core.management.base import BaseCommand
+from products.models import ProductSlug
+from products.services.slug_filter import SlugFilter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Bloom filter of product slugs used to reject unknown slugs without a query'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Slugs written per Redis pipeline (default: 1000)',
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        if not SlugFilter.is_enabled():
+            self.stdout.write(self.style.WARNING('The slug filter is disabled in CACHE_SETTINGS'))
+            return
+
+        # Evaluated lazily by rebuild(), once saves are mirrored into the new filter
+        slugs = ProductSlug.objects.values_list('slug', flat=True).iterator()
+
+        try:
+            count = SlugFilter.rebuild(slugs, batch_size=options.get('batch_size'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error rebuilding slug filter: {e}'))
+            logger.error(f'Error rebuilding slug filter: {e}')
+            return
+
+        bits, hashes = SlugFilter.get_size()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt slug filter with {count} slugs ({bits} bits, {hashes} hashes)')
+        )
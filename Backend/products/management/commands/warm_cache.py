@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+from store.models import Phone, Accessory
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Spaces out calls across threads to at most `rate` per second (0 = unlimited)
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild cached homepage, collection, brand and product pages concurrently'
+
+    # Page groups selectable with --prefix
+    PREFIXES = ('homepage', 'collections', 'brand_products', 'product_detail', 'phone_detail', 'accessory_detail')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of pages rebuilt concurrently (default: 4)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=20,
+            help='Maximum page rebuilds started per second, 0 for no limit (default: 20)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            choices=self.PREFIXES,
+            help='Only warm this prefix (repeatable, default: all)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--host',
+            type=str,
+            default='localhost:8000',
+            help='Host used to build absolute media URLs in cached payloads (default: localhost:8000)',
+            required=False
+        )
+
+        parser.add_argument(
+            '--secure',
+            action='store_true',
+            help='Build https media URLs',
+            required=False
+        )
+
+    def get_targets(self, prefixes):
+        """(prefix, path) pairs for every page to rebuild"""
+        phone_slugs = list(
+            Phone.objects.filter(variants__is_active=True).distinct().values_list('slug', flat=True)
+        )
+        accessory_slugs = list(
+            Accessory.objects.filter(is_active=True).values_list('slug', flat=True)
+        )
+        brands = sorted({
+            brand.lower() for brand in Phone.objects.values_list('brand', flat=True).distinct() if brand
+        })
+
+        paths = {
+            'homepage': ['/api/homepage/'],
+            'collections': [
+                '/api/new-arrivals/',
+                '/api/best-sellers/',
+                '/api/variants/new_arrivals/',
+                '/api/variants/best_sellers/',
+                '/api/accessories/new_arrivals/',
+                '/api/accessories/best_sellers/',
+            ],
+            'brand_products': [f'/products/brand/{brand}/' for brand in brands],
+            'product_detail': [f'/products/{slug}/' for slug in phone_slugs + accessory_slugs],
+            'phone_detail': [f'/api/phones/{slug}/details/' for slug in phone_slugs],
+            'accessory_detail': [f'/api/accessories/{slug}/details/' for slug in accessory_slugs],
+        }
+        return [(prefix, path) for prefix in prefixes for path in paths[prefix]]
+
+    def warm(self, factory, limiter, path, host, secure):
+        """Rebuild one page through its view with ?refresh=1; returns (seconds, error)"""
+        limiter.wait()
+        start = time.perf_counter()
+        try:
+            match = resolve(path)
+            request = factory.get(
+                path, {'refresh': '1'}, HTTP_HOST=host, HTTP_ACCEPT='application/json', secure=secure
+            )
+            handler = match.func
+            if iscoroutinefunction(handler):
+                # Async* views routed in with ASYNC_VIEWS_ENABLED
+                handler = async_to_sync(handler)
+            response = handler(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            error = None if response.status_code == 200 else f'HTTP {response.status_code}'
+        except Exception as e:
+            error = str(e)
+        finally:
+            # Worker threads get their own DB connections
+            connections.close_all()
+        return time.perf_counter() - start, error
+
+    def handle(self, *args, **options):
+        prefixes = options.get('prefix') or self.PREFIXES
+        workers = max(1, options.get('workers'))
+        host = options.get('host')
+        secure = options.get('secure')
+
+        targets = self.get_targets(prefixes)
+        self.stdout.write(f'Warming {len(targets)} pages with {workers} workers')
+
+        factory = RequestFactory()
+        limiter = RateLimiter(options.get('rate'))
+        summary = {prefix: {'pages': 0, 'errors': 0, 'seconds': 0.0, 'max': 0.0} for prefix in prefixes}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warm-cache') as executor:
+            futures = {
+                executor.submit(self.warm, factory, limiter, path, host, secure): (prefix, path)
+                for prefix, path in targets
+            }
+            for future in as_completed(futures):
+                prefix, path = futures[future]
+                seconds, error = future.result()
+                stats = summary[prefix]
+                stats['pages'] += 1
+                stats['seconds'] += seconds
+                stats['max'] = max(stats['max'], seconds)
+                if error:
+                    stats['errors'] += 1
+                    self.stdout.write(self.style.WARNING(f'{path}: {error}'))
+                    logger.error(f'Error warming cache for {path}: {error}')
+        elapsed = time.perf_counter() - start
+
+        for prefix, stats in summary.items():
+            if not stats['pages']:
+                continue
+            self.stdout.write(
+                f"{prefix}: {stats['pages']} pages, {stats['errors']} errors, "
+                f"{stats['seconds']:.2f}s total, {stats['seconds'] / stats['pages'] * 1000:.0f}ms avg, "
+                f"{stats['max'] * 1000:.0f}ms max"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Warmed {len(targets)} pages in {elapsed:.2f}s')
+        )
+        logger.info(f'Warmed {len(targets)} cache pages in {elapsed:.2f}s')
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import models
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+class MediaURLResolver:
+    """
+    Absolute media URLs for one request
+
+    The media base (settings.MEDIA_BASE_URL, e.g. a CDN, or else the
+    requesting host + MEDIA_URL) is worked out once, and each URL under
+    MEDIA_URL is made absolute by joining it to that base instead of
+    calling request.build_absolute_uri per field. File URLs are memoized by
+    file name, so an image shared by several objects or fields is resolved
+    once. Without a request or MEDIA_BASE_URL, URLs stay relative.
+
+    Use get_media_resolver() to share one resolver across a request's
+    serializers.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.media_url = settings.MEDIA_URL
+        base_url = getattr(settings, 'MEDIA_BASE_URL', '')
+        if base_url:
+            self.base_url = base_url if base_url.endswith('/') else f"{base_url}/"
+        elif request is not None:
+            self.base_url = request.build_absolute_uri(self.media_url)
+        else:
+            self.base_url = self.media_url
+        self._file_urls = {}
+
+    def file_url(self, file):
+        """Absolute URL of a FieldFile (e.g. obj.image), or None if it has none"""
+        if not file:
+            return None
+        url = self._file_urls.get(file.name)
+        if url is None:
+            try:
+                url = self.absolute(file.url)
+            except (AttributeError, ValueError):
+                return None
+            self._file_urls[file.name] = url
+        return url
+
+    def absolute(self, url):
+        """Make a media URL or path absolute; absolute URLs are returned unchanged"""
+        if not url or url.startswith(('http://', 'https://', '//')):
+            return url
+        if url.startswith(self.media_url):
+            return self.base_url + url[len(self.media_url):]
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+
+def get_media_resolver(context):
+    """
+    The MediaURLResolver of a serializer context
+
+    One resolver is kept per request (on the underlying HttpRequest, so
+    every serializer the view builds shares it); without a request, one
+    per context.
+
+    Args:
+        context: The serializer's context
+    """
+    request = context.get('request')
+    holder = getattr(request, '_request', request)  # DRF Request wraps the HttpRequest
+    if holder is None:
+        resolver = context.get('media_resolver')
+        if resolver is None:
+            resolver = context['media_resolver'] = MediaURLResolver()
+        return resolver
+
+    resolver = getattr(holder, '_media_resolver', None)
+    if resolver is None:
+        resolver = holder._media_resolver = MediaURLResolver(request)
+    return resolver
+
+
+class MediaFileField(serializers.FileField):
+    """FileField whose URLs come from the request's MediaURLResolver"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        return get_media_resolver(self.context).file_url(value)
+
+
+class MediaImageField(serializers.ImageField, MediaFileField):
+    """ImageField whose URLs come from the request's MediaURLResolver"""
+
+
+class MediaURLMixin:
+    """
+    Serializer mixin for media URLs
+
+    media_url(file) resolves a FieldFile, absolute_media_url(url) a stored
+    URL or path, both through the request's MediaURLResolver. On
+    ModelSerializers, model file and image fields serialize through it too.
+    """
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: MediaFileField,
+        models.ImageField: MediaImageField,
+    }
+
+    def media_url(self, file):
+        return get_media_resolver(self.context).file_url(file)
+
+    def absolute_media_url(self, url):
+        return get_media_resolver(self.context).absolute(url)
@@ -1,89 +1,146 @@
 import time
 import logging
-from django.core.cache import cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 
+from .services.metrics import current_view, current_request_counts
+
 logger = logging.getLogger(__name__)
 
 class CacheMonitorMiddleware:
     """
-    Middleware that logs cache hit/miss statistics and response times
+    Middleware that attributes cache lookups to the view handling the request
+
+    Counting happens in CacheService via CacheMetrics, which aggregates hits,
+    misses, latency and bytes per prefix and view (see the cache metrics
+    endpoint). The middleware only sets the context variables those counters
+    read, so it is safe under threaded workers and costs next to nothing.
+
+    Runs natively under both WSGI and ASGI, so async views are not pushed
+    into a thread by this middleware.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # Initialize counters
-        self.cache_hits = 0
-        self.cache_misses = 0
-        self.total_requests = 0
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Django would run a sync process_view in a thread on every request
+            self.process_view = self.aprocess_view
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Skip monitoring for admin and static requests
-        if request.path.startswith('/admin/') or request.path.startswith('/static/'):
+        if self.is_skipped(request):
             return self.get_response(request)
 
         # Start timing
-        start_time = time.time()
-        
-        # Store original cache get method to restore later
-        original_get = cache.get
-        
-        # Counter for this request
-        request_hits = 0
-        request_misses = 0
-        
+        start_time = time.perf_counter()
+
+        request_counts = {'hits': 0, 'misses': 0}
+        counts_token = current_request_counts.set(request_counts)
+        request._cache_metrics_view_token = None
         try:
-            # Override cache.get to track hits and misses
-            def monitored_get(key, default=None, version=None, **kwargs):
-                nonlocal request_hits, request_misses
-                try:
-                    result = original_get(key, default=None, version=version, **kwargs)
-                    if result is None:
-                        request_misses += 1
-                        logger.debug(f"Cache MISS: {key}")
-                    else:
-                        request_hits += 1
-                        logger.debug(f"Cache HIT: {key}")
-                    return result
-                except Exception as e:
-                    logger.error(f"Error in cache.get for key {key}: {e}")
-                    return default
-            
-            # Replace cache.get with our monitored version
-            cache.get = monitored_get
-            
-            # Process the request
-            response = self.get_response(request)
-        except Exception as e:
-            # Log the error and ensure we restore the original cache.get
-            logger.error(f"Error in CacheMonitorMiddleware: {e}")
             response = self.get_response(request)
         finally:
-            # Always restore original cache.get
-            cache.get = original_get
-        
+            self.finish(request, counts_token)
+
+        return self.add_debug_headers(response, request_counts, start_time)
+
+    async def __acall__(self, request):
+        if self.is_skipped(request):
+            return await self.get_response(request)
+
+        start_time = time.perf_counter()
+
+        request_counts = {'hits': 0, 'misses': 0}
+        counts_token = current_request_counts.set(request_counts)
+        request._cache_metrics_view_token = None
         try:
-            # Calculate response time
-            duration = time.time() - start_time
-            
-            # Update counters
-            self.cache_hits += request_hits
-            self.cache_misses += request_misses
-            self.total_requests += 1
-            
-            # Log statistics for this request
-            if request_hits > 0 or request_misses > 0:
-                hit_ratio = request_hits / (request_hits + request_misses) * 100 if (request_hits + request_misses) > 0 else 0
-                logger.info(
-                    f"Path: {request.path} | Duration: {duration:.2f}s | "
-                    f"Cache: {request_hits} hits, {request_misses} misses ({hit_ratio:.1f}% hit ratio)"
-                )
-            
-            # Add cache statistics to response headers if debug is enabled
-            if settings.DEBUG and hasattr(response, '__setitem__'):
-                response['X-Cache-Hits'] = str(request_hits)
-                response['X-Cache-Misses'] = str(request_misses)
-                response['X-Response-Time'] = f"{duration:.2f}s"
-        except Exception as e:
-            logger.error(f"Error in CacheMonitorMiddleware stats: {e}")
-        
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, counts_token)
+
+        return self.add_debug_headers(response, request_counts, start_time)
+
+    def is_skipped(self, request):
+        return request.path.startswith('/admin/') or request.path.startswith('/static/')
+
+    def finish(self, request, counts_token):
+        current_request_counts.reset(counts_token)
+        view_token = request._cache_metrics_view_token
+        if view_token is not None:
+            current_view.reset(view_token)
+
+    def add_debug_headers(self, response, request_counts, start_time):
+        # Add cache statistics to response headers if debug is enabled
+        if settings.DEBUG and hasattr(response, '__setitem__'):
+            response['X-Cache-Hits'] = str(request_counts['hits'])
+            response['X-Cache-Misses'] = str(request_counts['misses'])
+            response['X-Response-Time'] = f"{time.perf_counter() - start_time:.2f}s"
         return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.set_view(request, view_func)
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.set_view(request, view_func)
+        return None
+
+    def set_view(self, request, view_func):
+        if not hasattr(request, '_cache_metrics_view_token'):
+            # Skipped path, see __call__
+            return
+
+        match = request.resolver_match
+        view_name = (match.view_name if match else None) or getattr(view_func, '__name__', '')
+        request._cache_metrics_view_token = current_view.set(view_name)
+
+
+class InvalidationBatchMiddleware:
+    """
+    Middleware that coalesces the cache invalidations of a whole request
+
+    Model signals schedule tags instead of hitting Redis per save; tags
+    scheduled while handling the request (e.g. an admin bulk edit) are
+    deduplicated and flushed once after the response is built, deferred
+    to commit if a transaction is still open.
+
+    Under ASGI, reads pass straight through, since they schedule nothing.
+    The batch of other requests is opened and closed on the request's sync
+    thread, where Django runs its sync views and their saves.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        from .services.cache_service import CacheService
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with CacheService.invalidation_batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        from .services.cache_service import CacheService
+
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return await self.get_response(request)
+
+        # Pending tags are per thread, see InvalidationEngine.batch
+        batch = CacheService.invalidation_batch()
+        await sync_to_async(batch.__enter__)()
+        try:
+            return await self.get_response(request)
+        finally:
+            await sync_to_async(batch.__exit__)(None, None, None)
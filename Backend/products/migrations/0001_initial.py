@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSlug",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("slug", models.SlugField(max_length=255, unique=True)),
+                (
+                    "product_type",
+                    models.CharField(
+                        choices=[
+                            ("phone", "Phone"),
+                            ("accessory", "Accessory"),
+                            ("flash_deal", "Flash deal"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("product_id", models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="productslug",
+            constraint=models.UniqueConstraint(
+                fields=("product_type", "product_id"),
+                name="unique_product_slug_product",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def free_slug(slug, product_type, taken):
+    """First <slug>-<type>-<n> not in taken, within the 255 character slug limit"""
+    n = 1
+    while True:
+        suffix = f"-{product_type.replace('_', '-')}-{n}"
+        candidate = f"{slug[:255 - len(suffix)]}{suffix}"
+        if candidate not in taken:
+            return candidate
+        n += 1
+
+
+def backfill_product_slugs(apps, schema_editor):
+    """
+    Register the slugs of existing products
+
+    Where products in different tables already share a slug, the first in
+    the old detail lookup order (phone, accessory, flash deal) keeps it and
+    the others are renamed to <slug>-<type>-<n>, so every product stays
+    reachable and can be saved again.
+    """
+    ProductSlug = apps.get_model("products", "ProductSlug")
+    sources = [
+        ("phone", apps.get_model("store", "Phone")),
+        ("accessory", apps.get_model("store", "Accessory")),
+        ("flash_deal", apps.get_model("promotions", "FlashDeal")),
+    ]
+    taken = set(ProductSlug.objects.values_list("slug", flat=True))
+    for product_type, model in sources:
+        own_slugs = set(model.objects.values_list("slug", flat=True))
+        registered = []
+        for product_id, slug in model.objects.exclude(slug="").values_list("id", "slug").iterator():
+            if slug in taken:
+                new_slug = free_slug(slug, product_type, taken | own_slugs)
+                model.objects.filter(id=product_id).update(slug=new_slug)
+                logger.warning(f"Slug {slug} of {product_type} {product_id} is taken, renamed to {new_slug}")
+                own_slugs.add(new_slug)
+                slug = new_slug
+            taken.add(slug)
+            registered.append(ProductSlug(slug=slug, product_type=product_type, product_id=product_id))
+        ProductSlug.objects.bulk_create(registered, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+        ("store", "0003_alter_accessory_created_at_alter_accessory_is_active_and_more"),
+        ("promotions", "0006_merge_20250614_0020"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_backfill_product_slugs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedProduct",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "product_type",
+                    models.CharField(
+                        choices=[("phone", "Phone"), ("accessory", "Accessory")],
+                        max_length=20,
+                    ),
+                ),
+                ("product_id", models.PositiveBigIntegerField()),
+                ("group", models.CharField(db_index=True, max_length=100)),
+                ("related_ids", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="relatedproduct",
+            constraint=models.UniqueConstraint(
+                fields=("product_type", "product_id"), name="unique_related_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,230 @@
+import hashlib
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+
+from .services.cache_service import CacheService, served_freshness
+from .services.purge import surrogate_key
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedResponseCacheMixin:
+    """
+    APIView mixin that caches the final rendered JSON of successful GETs
+
+    Hits are answered with a plain HttpResponse built from the stored bytes
+    and headers, before DRF wraps the request, negotiates content or runs
+    a renderer. Misses go through the view as usual (including its own data
+    cache) and the rendered result is stored under the same tags and
+    namespaces, so invalidation evicts both copies. A copy never outlives
+    the data it was rendered from, and responses built from stale data are
+    not stored.
+
+    Every response carries a strong ETag (a hash of the body) and a
+    Last-Modified date stored with the entry, so conditional requests
+    (If-None-Match / If-Modified-Since) are answered with 304 from the
+    cache alone. Cache-Control, Surrogate-Control and a Surrogate-Key
+    header listing the entry's tags and namespaces let a CDN or reverse proxy cache the
+    response until the tags are purged (see products.services.purge).
+
+    Only the query params listed in ``cache_params`` are part of the cache
+    keys (see CacheService.normalize_params), so tracking params and
+    cache-busters share one entry. Views use get_cache_params() for their
+    data cache keys too.
+
+    Only for public, AllowAny views: authentication, permissions and
+    throttling are skipped on hits. Requests asking for HTML (the browsable
+    API) always take the normal path.
+    """
+    rendered_cache_prefix = None
+    rendered_cache_timeout = None
+
+    # Query params that change the response: a list of names, or a dict of
+    # name -> canonicalizer (e.g. {'page': int}). None keeps every param
+    # except CACHE_SETTINGS['IGNORED_PARAMS'].
+    cache_params = None
+
+    def get_cache_params(self, request):
+        """Canonical query params for this view's cache keys"""
+        return CacheService.normalize_params(request.GET, self.cache_params)
+
+    def get_rendered_cache_identifier(self, request, *args, **kwargs):
+        """Identifier of the cached response, e.g. the brand or slug"""
+        raise NotImplementedError
+
+    def get_rendered_cache_tags(self, request, *args, **kwargs):
+        """Tags for the cached response, normally the view's data cache tags"""
+        return [self.rendered_cache_prefix]
+
+    def get_rendered_cache_namespaces(self, request, *args, **kwargs):
+        """Namespaces embedded in the cached response's key, see CacheService.set"""
+        return []
+    
+    def get_rendered_cache_timeout(self):
+        return self.rendered_cache_timeout or CacheService.get_ttl(self.rendered_cache_prefix)
+
+    def get_rendered_cache_key_parts(self, request, *args, **kwargs):
+        """(prefix, identifier, params, namespaces) of the cached response, see CacheService.get_key"""
+        return (
+            f"{self.rendered_cache_prefix}_rendered",
+            self.get_rendered_cache_identifier(request, *args, **kwargs),
+            self.get_cache_params(request),
+            self.get_rendered_cache_namespaces(request, *args, **kwargs),
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.use_rendered_cache(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        prefix, identifier, params, namespaces = self.get_rendered_cache_key_parts(request, *args, **kwargs)
+        key = CacheService.get_key(prefix, identifier, params, namespaces)
+
+        # An async front (see AsyncRenderedResponseView) may have just missed
+        if not request.GET.get('refresh') and not getattr(request, 'rendered_cache_checked', False):
+            try:
+                cached = CacheService.get_by_key(key)
+            except Exception as e:
+                # e.g. an entry written in a format this deploy cannot decode
+                logger.error(f"Error reading rendered cache for {prefix}:{identifier}: {e}")
+            else:
+                if cached is not None:
+                    return self.cached_response(request, cached)
+
+        freshness = {'stale': False, 'expires': None}
+        token = served_freshness.set(freshness)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            served_freshness.reset(token)
+
+        if response.status_code == 200 and hasattr(response, 'render'):
+            try:
+                response.render()
+                if response.get('Content-Type', '').startswith('application/json'):
+                    return self.store_response(request, response, key, namespaces, freshness, args, kwargs)
+            except Exception as e:
+                logger.error(f"Error caching rendered response for {prefix}:{identifier}: {e}")
+
+        return response
+
+    def store_response(self, request, response, key, namespaces, freshness, args, kwargs):
+        """Add validators to a freshly rendered response and cache it"""
+        etag = f'"{hashlib.sha256(response.content).hexdigest()[:32]}"'
+        last_modified = int(time.time())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+
+        timeout = self.get_rendered_cache_timeout()
+        if freshness['expires'] is not None:
+            timeout = min(timeout, round(freshness['expires'] - time.time()))
+        tags = self.get_rendered_cache_tags(request, *args, **kwargs)
+        cacheable = not freshness['stale'] and timeout > 0
+        # Namespace bumps purge surrogate keys too, so HTTP caches key by both
+        surrogate_tags = list(tags) + [ns for ns in namespaces if ns not in tags]
+        self.add_http_cache_headers(response, surrogate_tags, timeout if cacheable else 0)
+
+        if cacheable:
+            CacheService.set_entry(
+                key,
+                {
+                    # Text rather than bytes keeps the entry in the compact codec formats
+                    'content': response.content.decode('utf-8'),
+                    'status': response.status_code,
+                    'headers': dict(response.items()),
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'tags': surrogate_tags,
+                    'expires': time.time() + timeout,
+                },
+                timeout=timeout,
+                tags=tags
+            )
+
+        # The client may already hold this exact body even though the cache did not
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+    def cached_response(self, request, cached):
+        """Build the response for a cache hit, or a 304 if the client's copy is current"""
+        content = cached['content']
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        response = HttpResponse(content, status=cached['status'])
+        for header, value in cached['headers'].items():
+            response[header] = value
+        if 'expires' in cached:
+            # HTTP caches may keep the response only as long as this entry lives
+            self.add_http_cache_headers(response, cached['tags'], round(cached['expires'] - time.time()))
+        # The 304 keeps the ETag, Last-Modified and Vary headers of the full response
+        return get_conditional_response(
+            request, etag=cached.get('etag'), last_modified=cached.get('last_modified'), response=response
+        )
+
+    def add_http_cache_headers(self, response, tags, max_age):
+        """
+        Let HTTP caches store the response for max_age seconds, keyed by its tags
+
+        Browsers get CACHE_SETTINGS['HTTP_CACHE']['BROWSER_MAX_AGE'] (default 0,
+        i.e. revalidate with the ETag); shared caches get max_age, capped by
+        SURROGATE_MAX_AGE. With max_age <= 0 every cache must revalidate.
+        """
+        http_cache = getattr(settings, 'CACHE_SETTINGS', {}).get('HTTP_CACHE', {})
+        if max_age > 0:
+            surrogate_max_age = min(max_age, http_cache.get('SURROGATE_MAX_AGE') or max_age)
+            browser_max_age = min(max_age, http_cache.get('BROWSER_MAX_AGE', 0))
+            response['Cache-Control'] = f'public, max-age={browser_max_age}, s-maxage={surrogate_max_age}'
+            response['Surrogate-Control'] = f'max-age={surrogate_max_age}'
+        else:
+            response['Cache-Control'] = 'no-cache'
+            if 'Surrogate-Control' in response:
+                del response['Surrogate-Control']
+        response['Surrogate-Key'] = ' '.join(surrogate_key(tag) for tag in tags)
+
+    def use_rendered_cache(self, request):
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        return (
+            cache_settings.get('RENDERED_CACHE_ENABLED', True)
+            and request.method == 'GET'
+            and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+            and request.GET.get('format') in (None, 'json')
+        )
+
+
+class AsyncRenderedResponseView(View):
+    """
+    Async front for a RenderedResponseCacheMixin view, for ASGI deployments
+
+    Cache hits and 304s are answered on the event loop: generations and the
+    rendered entry are read from the L1 tier or with the async Redis client
+    (see CacheService.aget_key and aget_by_key), so concurrent hits need no
+    worker thread. Anything else (misses, refreshes, the browsable API) is
+    handed to ``sync_view_class`` in a thread, which builds the response
+    and fills the cache as usual without repeating the lookup.
+    """
+    sync_view_class = None
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view_class()
+        if view.use_rendered_cache(request) and not request.GET.get('refresh'):
+            try:
+                key = await CacheService.aget_key(*view.get_rendered_cache_key_parts(request, *args, **kwargs))
+                cached = await CacheService.aget_by_key(key)
+            except Exception as e:
+                logger.error(f"Error reading rendered cache for {view.rendered_cache_prefix}: {e}")
+            else:
+                if cached is not None:
+                    return view.cached_response(request, cached)
+                request.rendered_cache_checked = True
+
+        return await sync_to_async(self.get_sync_view())(request, *args, **kwargs)
+
+    @classmethod
+    def get_sync_view(cls):
+        if '_sync_view' not in cls.__dict__:
+            cls._sync_view = cls.sync_view_class.as_view()
+        return cls._sync_view
@@ -0,0 +1,101 @@
+from django.db import models
+
+
+class ProductSlug(models.Model):
+    """
+    Registry of every product slug and the phone, accessory or flash deal it belongs to
+
+    Lets product detail resolve a slug with one indexed lookup followed by
+    one fetch from the right table. The unique slug column also keeps slugs
+    unique across the three product tables. Rows are written by the model
+    signals in products.signals; a slug that collides with another
+    product's fails that product's save with an IntegrityError.
+    """
+    PHONE = 'phone'
+    ACCESSORY = 'accessory'
+    FLASH_DEAL = 'flash_deal'
+    PRODUCT_TYPES = [
+        (PHONE, 'Phone'),
+        (ACCESSORY, 'Accessory'),
+        (FLASH_DEAL, 'Flash deal'),
+    ]
+
+    slug = models.SlugField(max_length=255, unique=True)
+    product_type = models.CharField(max_length=20, choices=PRODUCT_TYPES)
+    product_id = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_type', 'product_id'], name='unique_product_slug_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.slug} -> {self.product_type} {self.product_id}"
+
+    @classmethod
+    def resolve(cls, slug):
+        """(product_type, product_id) of a slug, or None if no product has it"""
+        return cls.objects.filter(slug=slug).values_list('product_type', 'product_id').first()
+
+    @classmethod
+    def resolve_many(cls, slugs):
+        """Dict of slug -> (product_type, product_id) for the slugs that have a product"""
+        return {
+            slug: (product_type, product_id)
+            for slug, product_type, product_id in cls.objects.filter(slug__in=slugs).values_list(
+                'slug', 'product_type', 'product_id'
+            )
+        }
+
+    @classmethod
+    def is_taken(cls, slug):
+        return cls.objects.filter(slug=slug).exists()
+
+    @classmethod
+    def register(cls, product_type, product_id, slug):
+        """Point slug at a product, replacing the product's previous slug"""
+        cls.objects.update_or_create(
+            product_type=product_type, product_id=product_id, defaults={'slug': slug}
+        )
+
+    @classmethod
+    def unregister(cls, product_type, product_id):
+        cls.objects.filter(product_type=product_type, product_id=product_id).delete()
+
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed related products of a phone or accessory, best match first
+
+    related_ids are PhoneVariant ids for phones (one variant per related
+    phone) and Accessory ids for accessories. Rows are rebuilt a group at a
+    time, a group being the phones of one brand or all accessories; see
+    products.services.related_products.
+    """
+    PHONE = ProductSlug.PHONE
+    ACCESSORY = ProductSlug.ACCESSORY
+    PRODUCT_TYPES = [
+        (PHONE, 'Phone'),
+        (ACCESSORY, 'Accessory'),
+    ]
+
+    product_type = models.CharField(max_length=20, choices=PRODUCT_TYPES)
+    product_id = models.PositiveBigIntegerField()
+    group = models.CharField(max_length=100, db_index=True)
+    related_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_type', 'product_id'], name='unique_related_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_type} {self.product_id} -> {self.related_ids}"
+
+    @classmethod
+    def get_related_ids(cls, product_type, product_id):
+        """Ranked related ids of a product, or None if it has no row yet"""
+        return cls.objects.filter(
+            product_type=product_type, product_id=product_id
+        ).values_list('related_ids', flat=True).first()
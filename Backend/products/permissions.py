@@ -0,0 +1,21 @@
+import hmac
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasMetricsScrapeToken(BasePermission):
+    """
+    Allows requests sending ``Authorization: Bearer <token>`` with the token
+    in CACHE_SETTINGS['METRICS_SCRAPE_TOKEN'], for Prometheus scrapers that
+    cannot log in. Denies everything while no token is configured.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.CACHE_SETTINGS.get('METRICS_SCRAPE_TOKEN')
+        if not token:
+            return False
+
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != 'bearer' or not credentials:
+            return False
+        return hmac.compare_digest(credentials.strip().encode(), token.encode())
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from store.models import Phone, PhoneVariant, Accessory
 from django.db.models import Prefetch
+from .fieldsets import SparseFieldsetMixin
+from .media import MediaURLMixin
 
 
-class PhoneVariantDetailSerializer(serializers.ModelSerializer):
+class PhoneVariantDetailSerializer(MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()  # Add image field for frontend compatibility
     
@@ -15,19 +17,23 @@ class PhoneVariantDetailSerializer(serializers.ModelSerializer):
         ]
     
     def get_image_url(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-        return None
+        return self.media_url(obj.image)
         
     def get_image(self, obj):
         # Return the same URL as image_url for frontend compatibility
         return self.get_image_url(obj)
 
 
-class PhoneDetailSerializer(serializers.ModelSerializer):
+class PhoneDetailSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
+    """
+    Phone detail payload, assembled from one list of active variants
+
+    Load phones with get_queryset() (the phone and its active variants in
+    two queries); an instance loaded any other way costs one extra query
+    for its variants. Variant images and the primary image are collected
+    in a single pass over that list.
+    """
     variants = serializers.SerializerMethodField()
-    image = serializers.SerializerMethodField()
     specifications = serializers.SerializerMethodField()
     rating = serializers.FloatField(default=4.5)
     review_count = serializers.IntegerField(default=0)
@@ -42,29 +48,57 @@ class PhoneDetailSerializer(serializers.ModelSerializer):
             'rating', 'review_count', 'created_at', 'updated_at'
         ]
     
-    def get_variants(self, obj):
-        # Use prefetched variants if available to avoid additional queries
+    @staticmethod
+    def get_queryset():
+        """Phones with their active variants prefetched as prefetched_variants"""
+        return Phone.objects.prefetch_related(
+            Prefetch('variants',
+                     queryset=PhoneVariant.objects.filter(is_active=True),
+                     to_attr='prefetched_variants')
+        )
+    
+    def get_active_variants(self, obj):
+        """Active variants as a list, queried at most once per phone"""
         variants = getattr(obj, 'prefetched_variants', None)
         if variants is None:
-            variants = PhoneVariant.objects.filter(phone=obj, is_active=True)
+            variants = obj.prefetched_variants = list(PhoneVariant.objects.filter(phone=obj, is_active=True))
+        return variants
+    
+    def get_variant_media(self, obj):
+        """(primary image URL, image list) of the phone, built once per phone"""
+        media = getattr(obj, '_variant_media', None)
+        if media is not None:
+            return media
+        
+        primary = None
+        images = []
+        for index, variant in enumerate(self.get_active_variants(obj)):
+            image_url = self.media_url(variant.image)
+            if image_url is None:
+                continue
+            if index == 0:
+                # The first active variant's image represents the phone
+                primary = image_url
+            images.append({
+                'url': image_url,
+                'alt': f"{obj.brand} {obj.name} - {variant.color} {variant.storage}",
+                'color': variant.color,
+                'storage': variant.storage,
+                'variant_id': variant.id
+            })
+        
+        media = obj._variant_media = (primary, images)
+        return media
+    
+    def get_variants(self, obj):
         return PhoneVariantDetailSerializer(
-            variants, 
+            self.get_active_variants(obj), 
             many=True, 
             context=self.context
         ).data
     
     def get_image(self, obj):
-        request = self.context.get('request')
-        # Use prefetched variants if available to avoid additional queries
-        variants = getattr(obj, 'prefetched_variants', None)
-        if variants and variants:
-            variant = variants[0]
-        else:
-            variant = PhoneVariant.objects.filter(phone=obj, is_active=True).first()
-        
-        if variant and variant.image and hasattr(variant.image, 'url'):
-            return request.build_absolute_uri(variant.image.url) if request else variant.image.url
-        return None
+        return self.get_variant_media(obj)[0]
     
     def get_specifications(self, obj):
         return {
@@ -76,36 +110,10 @@ class PhoneDetailSerializer(serializers.ModelSerializer):
         }
         
     def get_images(self, obj):
-        request = self.context.get('request')
-        variants = getattr(obj, 'prefetched_variants', None) or obj.variants.filter(is_active=True)
-        images = []
-        
-        for variant in variants:
-            if variant.image and hasattr(variant.image, 'url'):
-                image_url = request.build_absolute_uri(variant.image.url) if request else variant.image.url
-                images.append({
-                    'url': image_url,
-                    'alt': f"{obj.brand} {obj.name} - {variant.color} {variant.storage}",
-                    'color': variant.color,
-                    'storage': variant.storage,
-                    'variant_id': variant.id
-                })
-        
-       
-        if not images and variants.exists():
-            first_variant = variants.first()
-            if first_variant and first_variant.image and hasattr(first_variant.image, 'url'):
-                image_url = request.build_absolute_uri(first_variant.image.url) if request else first_variant.image.url
-                images.append({
-                    'url': image_url,
-                    'alt': f"{obj.brand} {obj.name}",
-                    'variant_id': first_variant.id
-                })
-        
-        return images
+        return self.get_variant_media(obj)[1]
 
 
-class AccessoryDetailSerializer(serializers.ModelSerializer):
+class AccessoryDetailSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()  # Keep for backward compatibility
     images = serializers.SerializerMethodField()  
     specifications = serializers.SerializerMethodField()
@@ -122,10 +130,7 @@ class AccessoryDetailSerializer(serializers.ModelSerializer):
         ]
     
     def get_image_url(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-        return None
+        return self.media_url(obj.image)
     
     def get_specifications(self, obj):
         return {
@@ -137,12 +142,11 @@ class AccessoryDetailSerializer(serializers.ModelSerializer):
         
     def get_images(self, obj):
         # New method to provide consistent image array format
-        request = self.context.get('request')
         images = []
         
         # Main product image
-        if obj.image and hasattr(obj.image, 'url'):
-            image_url = request.build_absolute_uri(obj.image.url) if request else obj.image.url
+        image_url = self.media_url(obj.image)
+        if image_url:
             images.append({
                 'url': image_url,
                 'alt': obj.name,
@@ -153,7 +157,7 @@ class AccessoryDetailSerializer(serializers.ModelSerializer):
         return images
 
 
-class BrandProductSerializer(serializers.Serializer):
+class BrandProductSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
     slug = serializers.SlugField()
@@ -173,22 +177,10 @@ class BrandProductSerializer(serializers.Serializer):
     )
 
     def get_image(self, obj):
-        request = self.context.get('request')
-        image_url = obj.get('image')
-        
-        if not image_url:
-            return None
-            
-        if isinstance(image_url, str) and image_url.startswith(('http://', 'https://')):
-            return image_url
-            
-        if request is not None and not image_url.startswith(('http://', 'https://')):
-            return request.build_absolute_uri(image_url)
-            
-        return image_url
+        return self.absolute_media_url(obj.get('image')) or None
 
 
-class PhoneVariantForBrandSerializer(serializers.ModelSerializer):
+class PhoneVariantForBrandSerializer(MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -196,13 +188,10 @@ class PhoneVariantForBrandSerializer(serializers.ModelSerializer):
         fields = ['id', 'color', 'storage', 'price', 'image_url']
     
     def get_image_url(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-        return None
+        return self.media_url(obj.image)
 
 
-class PhoneForBrandSerializer(serializers.ModelSerializer):
+class PhoneForBrandSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     variants = PhoneVariantForBrandSerializer(many=True)
     image = serializers.SerializerMethodField()
     
@@ -212,13 +201,10 @@ class PhoneForBrandSerializer(serializers.ModelSerializer):
     
     def get_image(self, obj):
         variant = obj.variants.filter(is_active=True).first()
-        if variant and variant.image and hasattr(variant.image, 'url'):
-            request = self.context.get('request')
-            return request.build_absolute_uri(variant.image.url) if request else variant.image.url
-        return None
+        return self.media_url(variant.image) if variant else None
 
 
-class AccessoryForBrandSerializer(serializers.ModelSerializer):
+class AccessoryForBrandSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -226,7 +212,4 @@ class AccessoryForBrandSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'price', 'image_url']
     
     def get_image_url(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-        return None
+        return self.media_url(obj.image)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from . import circuit_breaker
+from .circuit_breaker import CircuitOpenError, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# redis.asyncio connections belong to the event loop that opened them, so
+# each loop (one per ASGI worker) gets its own client
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis_connection(alias="default"):
+    """
+    redis.asyncio client for the cache's Redis server, one per event loop
+
+    Returns None if the cache backend is not django-redis (e.g. LocMemCache
+    in tests). Like circuit_breaker.get_redis_connection, raises
+    CircuitOpenError unless the circuit breaker is closed.
+    """
+    if not isinstance(caches[alias], RedisCache):
+        return None
+    if circuit_breaker.is_enabled() and not get_breaker().is_closed():
+        raise CircuitOpenError("Redis circuit is open")
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        config = settings.CACHES[alias]
+        options = config.get('OPTIONS', {})
+        location = config['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        client = aioredis.Redis.from_url(
+            location,
+            socket_timeout=options.get('SOCKET_TIMEOUT'),
+            socket_connect_timeout=options.get('SOCKET_CONNECT_TIMEOUT'),
+            max_connections=options.get('CONNECTION_POOL_KWARGS', {}).get('max_connections'),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def execute(client, command, *args, **kwargs):
+    """Await one command, reporting its outcome to the circuit breaker like sync connections do"""
+    try:
+        result = await getattr(client, command)(*args, **kwargs)
+    except CircuitOpenError:
+        raise
+    except (RedisConnectionError, RedisTimeoutError):
+        get_breaker().record_failure()
+        raise
+    get_breaker().record_success()
+    return result
+
+
+async def cache_get(key, default=None):
+    """
+    Async django.core.cache.cache.get for the default cache
+
+    Reads the raw Redis key and decodes it with django-redis's own
+    serializer, so values written by the sync cache API are read back
+    unchanged. Redis errors and an open circuit count as misses; the sync
+    code path then answers from the circuit breaker's fallback.
+    """
+    try:
+        client = get_async_redis_connection()
+        if client is None:
+            return await sync_to_async(cache.get)(key, default)
+        value = await execute(client, 'get', cache.make_key(key))
+    except CircuitOpenError:
+        return default
+    except Exception as e:
+        logger.warning(f"Async cache get failed for {key}: {e}")
+        return default
+    return default if value is None else cache.client.decode(value)
+
+
+async def cache_set(key, value, timeout=DEFAULT_TIMEOUT):
+    """Async django.core.cache.cache.set for the default cache, logging instead of raising"""
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = cache.default_timeout
+    try:
+        client = get_async_redis_connection()
+        if client is None:
+            return await sync_to_async(cache.set)(key, value, timeout)
+        # Same semantics as django-redis: None never expires, <= 0 deletes
+        if timeout is not None and timeout <= 0:
+            await execute(client, 'delete', cache.make_key(key))
+        else:
+            px = int(timeout * 1000) if timeout is not None else None
+            await execute(client, 'set', cache.make_key(key), cache.client.encode(value), px=px)
+    except CircuitOpenError:
+        pass
+    except Exception as e:
+        logger.warning(f"Async cache set failed for {key}: {e}")
@@ -0,0 +1,107 @@
+import logging
+import threading
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+from . import circuit_breaker
+from .circuit_breaker import CircuitBreaker, OUTAGE_ERRORS, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# LocMemCache instances with the same location share their storage, so all
+# threads of a process see one fallback cache
+FALLBACK_LOCATION = 'redis-circuit-fallback'
+
+_listener_registered = False
+_listener_lock = threading.Lock()
+
+
+class CircuitBreakerRedisCache(RedisCache):
+    """
+    django-redis cache backend that degrades to process memory during Redis outages
+
+    Calls that fail with a connection error or timeout are answered from a
+    bounded in-process LocMemCache instead of raising, and while the
+    process-wide circuit breaker (see products.services.circuit_breaker) is
+    open, calls go straight to that fallback. An outage then costs hit ratio
+    (and sessions are only valid on the worker that created them) rather
+    than a socket timeout per call. The fallback is emptied each time the
+    circuit opens. Failures are counted by CircuitBreakerConnectionPool.
+
+    Only the basic cache API is guarded; django-redis extensions such as
+    ttl(), keys() or lock() talk to Redis directly.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        config = getattr(settings, 'CACHE_SETTINGS', {}).get('CIRCUIT_BREAKER', {})
+        self._fallback = LocMemCache(FALLBACK_LOCATION, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'OPTIONS': {'MAX_ENTRIES': config.get('FALLBACK_MAX_ENTRIES', 1000)},
+        })
+        self._register_listener()
+
+    def _register_listener(self):
+        global _listener_registered
+        with _listener_lock:
+            if not _listener_registered:
+                fallback = self._fallback
+                # Values left from an earlier outage may have been invalidated since
+                get_breaker().add_listener(lambda state: state == CircuitBreaker.OPEN and fallback.clear())
+                _listener_registered = True
+
+    def _call(self, method, *args, **kwargs):
+        if not circuit_breaker.is_enabled():
+            return getattr(super(), method)(*args, **kwargs)
+
+        if not get_breaker().allow():
+            return self._call_fallback(method, *args, **kwargs)
+
+        try:
+            return getattr(super(), method)(*args, **kwargs)
+        except OUTAGE_ERRORS as e:
+            logger.warning(f"Redis cache {method} failed, using the local fallback: {e}")
+            return self._call_fallback(method, *args, **kwargs)
+
+    def _call_fallback(self, method, *args, **kwargs):
+        # Drop django-redis specific arguments LocMemCache does not take
+        kwargs.pop('client', None)
+        kwargs.pop('xx', None)
+        if kwargs.pop('nx', False):
+            method = 'add'
+        return getattr(self._fallback, method)(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._call('set', *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._call('add', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._call('touch', *args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._call('has_key', *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._call('incr', *args, **kwargs)
+
+    def decr(self, *args, **kwargs):
+        return self._call('decr', *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self._call('get_many', *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._call('set_many', *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._call('delete_many', *args, **kwargs)
@@ -1,43 +1,582 @@
+import contextvars
+import fnmatch
+import hashlib
 import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
+from django.db import connections
 from django.conf import settings
-from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from . import async_cache
+from .async_cache import get_async_redis_connection
+from .circuit_breaker import CircuitBreaker, get_breaker, get_redis_connection
+from .local_cache import LocalCache, InvalidationBus
+from .codec import CacheCodec
+from .metrics import CacheMetrics
 
 logger = logging.getLogger(__name__)
 
+# Marks values stored with a soft expiry for stale-while-revalidate
+ENTRY_MARKER = '__cache_entry__'
+
+# Marks negative entries: the builder found nothing (e.g. an unknown slug)
+MISSING_MARKER = '__cache_missing__'
+
+# Upper bounds (seconds) of the remaining TTL buckets in get_key_census
+CENSUS_TTL_BUCKETS = (60, 300, 900, 3600, 86400)
+
+# Freshness of the values get_or_compute returned in the current context:
+# a dict with 'stale' and the earliest known 'expires' timestamp, set up by
+# callers that cache something derived from those values (see
+# RenderedResponseCacheMixin) so the copy never outlives its source.
+served_freshness = contextvars.ContextVar('cache_served_freshness', default=None)
+
+# Adds a key to tag sorted sets scored by its expiry time, drops members
+# that have already expired and keeps each tag set alive only as long as
+# its longest-lived member. Legacy plain sets are converted in place.
+# KEYS: tag keys, ARGV: cache key, expires_at, now
+TAG_KEY_SCRIPT = """
+for _, tag_key in ipairs(KEYS) do
+    if redis.call('TYPE', tag_key)['ok'] == 'set' then
+        local members = redis.call('SMEMBERS', tag_key)
+        redis.call('DEL', tag_key)
+        for _, member in ipairs(members) do
+            redis.call('ZADD', tag_key, ARGV[2], member)
+        end
+    end
+    redis.call('ZADD', tag_key, ARGV[2], ARGV[1])
+    redis.call('ZREMRANGEBYSCORE', tag_key, '-inf', ARGV[3])
+    local last = redis.call('ZRANGE', tag_key, -1, -1, 'WITHSCORES')
+    if last[2] then
+        redis.call('EXPIREAT', tag_key, math.ceil(tonumber(last[2])))
+    end
+end
+return #KEYS
+"""
+
+# Reads namespace generation counters, creating missing ones. New counters
+# start at the current time in milliseconds rather than 0, so a counter lost
+# to eviction never comes back with a value an older entry was written under.
+# KEYS: generation keys, ARGV: now in milliseconds
+GENERATION_READ_SCRIPT = """
+local values = {}
+for i, gen_key in ipairs(KEYS) do
+    local value = redis.call('GET', gen_key)
+    if not value then
+        value = ARGV[1]
+        redis.call('SET', gen_key, value)
+    end
+    values[i] = value
+end
+return values
+"""
+
+# Moves existing generation counters past both their current value and the
+# seed a recreated counter would get. Counters nobody has read are skipped:
+# no cache key embeds them.
+# KEYS: generation keys, ARGV: now in milliseconds
+GENERATION_BUMP_SCRIPT = """
+local bumped = 0
+for _, gen_key in ipairs(KEYS) do
+    local value = redis.call('GET', gen_key)
+    if value then
+        redis.call('SET', gen_key, string.format('%d', math.max(tonumber(value) + 1, tonumber(ARGV[1]))))
+        bumped = bumped + 1
+    end
+end
+return bumped
+"""
+
 
 class CacheService:
     """
     Redis-optimized service for all cache operations with tagging support
+    
+    When CACHE_SETTINGS['L1_ENABLED'] is set, reads are first served from a
+    bounded per-process LRU tier that is kept coherent across workers via
+    Redis pub/sub invalidation messages.
+    
+    Entries covering a whole brand or collection are keyed by namespace
+    generations instead of being registered under tags: invalidating such a
+    namespace bumps its counter, so every key built from the old generation
+    becomes unreachable at once and ages out through its TTL.
     """
     
+    # Per-process L1 tier, created on first use
+    _local_cache = None
+    _invalidation_bus = None
+    _init_lock = threading.Lock()
+    
+    # Value codec, created on first use (None stores values as given)
+    _codec = None
+    _codec_loaded = False
+    
+    # Background rebuilds of stale entries
+    _revalidation_executor = None
+    _revalidating = set()
+    _revalidation_lock = threading.Lock()
+    
+    @classmethod
+    def get_key(cls, prefix, identifier, params=None, namespaces=None):
+        """
+        Generate standardized cache key with version support
+        
+        The current generation of each namespace is embedded in the key, so
+        bumping any of them (see bump_generations) moves the entry to a new key.
+        Params are canonicalized (see normalize_params), and keys longer than
+        CACHE_SETTINGS['MAX_KEY_LENGTH'] keep their prefix but hash the rest.
+        """
+        generations = cls.get_generations(namespaces) if namespaces else None
+        return cls._format_key(prefix, identifier, params, generations)
+    
     @classmethod
-    def get_key(cls, prefix, identifier, params=None):
-        """Generate standardized cache key with version support"""
+    async def aget_key(cls, prefix, identifier, params=None, namespaces=None):
+        """get_key for async views, reading generations with the async Redis client"""
+        generations = await cls.aget_generations(namespaces) if namespaces else None
+        return cls._format_key(prefix, identifier, params, generations)
+    
+    @classmethod
+    def _format_key(cls, prefix, identifier, params, generations):
         version = getattr(settings, 'CACHE_VERSION', 1)
         key = f"{prefix}:{identifier}"
         
+        if generations:
+            key = f"{key}:g" + ".".join(str(generations[ns]) for ns in sorted(generations))
+        
         if params:
             if isinstance(params, dict):
-                # Sort params for consistent keys
-                sorted_params = sorted(params.items())
-                params_str = ":".join(f"{k}={v}" for k, v in sorted_params)
-                key = f"{key}:{params_str}"
+                params = cls.normalize_params(params)
+                if params:
+                    params_str = ":".join(f"{k}={v}" for k, v in params.items())
+                    key = f"{key}:{params_str}"
             else:
                 key = f"{key}:{params}"
         
+        max_length = getattr(settings, 'CACHE_SETTINGS', {}).get('MAX_KEY_LENGTH', 200)
+        if max_length and len(key) > max_length:
+            key = f"{prefix}:~{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}"
+        
         # Add version and key prefix from settings
         key_prefix = getattr(settings, 'CACHES', {}).get('default', {}).get('KEY_PREFIX', 'ecom')
         return f"{key_prefix}:v{version}:{key}"
     
     @classmethod
-    def get(cls, prefix, identifier, params=None):
+    def normalize_params(cls, params, allowed=None):
+        """
+        Canonical form of the query params that belong in a cache key
+        
+        Params matching CACHE_SETTINGS['IGNORED_PARAMS'] (refresh, utm_*,
+        click ids, cache-busters) are dropped, values are stripped, repeated
+        params are sorted and joined, empty values are dropped and the result
+        is sorted by name.
+        
+        Args:
+            params: Dict or QueryDict of query params
+            allowed: Names of the params that affect the response, or a dict
+                     mapping them to a canonicalizer (e.g. int); values it
+                     rejects with ValueError are dropped. None keeps every
+                     param that is not ignored.
+        """
+        ignored = getattr(settings, 'CACHE_SETTINGS', {}).get('IGNORED_PARAMS', ['refresh'])
+        items = params.lists() if hasattr(params, 'lists') else params.items()
+        
+        normalized = {}
+        for name, values in items:
+            if allowed is not None and name not in allowed:
+                continue
+            if allowed is None and any(fnmatch.fnmatchcase(name, pattern) for pattern in ignored):
+                continue
+            
+            canonicalize = allowed.get(name) if isinstance(allowed, dict) else None
+            canonical = []
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                value = str(value).strip()
+                if canonicalize is not None:
+                    try:
+                        value = str(canonicalize(value))
+                    except (TypeError, ValueError):
+                        continue
+                if value:
+                    canonical.append(value)
+            if canonical:
+                normalized[name] = ",".join(sorted(set(canonical)))
+        
+        return dict(sorted(normalized.items()))
+    
+    @staticmethod
+    def _generation_key(namespace):
+        return f"gen:{namespace}"
+    
+    @classmethod
+    def get_generations(cls, namespaces):
+        """
+        Get the current generation of each namespace (e.g. 'brand:samsung')
+        
+        Generations are cached in the L1 tier, whose copies are evicted on
+        every worker when a namespace is bumped. On a Redis error every
+        namespace reads as generation 0.
+        """
+        namespaces = sorted(set(namespaces))
+        generations = {}
+        local_cache = cls.get_local_cache()
+        if local_cache is not None:
+            for namespace in namespaces:
+                found, generation = local_cache.get(cls._generation_key(namespace))
+                if found:
+                    generations[namespace] = generation
+        
+        missing = [namespace for namespace in namespaces if namespace not in generations]
+        if not missing:
+            return generations
+        
+        try:
+            redis_conn = get_redis_connection("default")
+            values = redis_conn.eval(
+                GENERATION_READ_SCRIPT,
+                len(missing),
+                *[cls._generation_key(namespace) for namespace in missing],
+                int(time.time() * 1000)
+            )
+        except Exception as e:
+            logger.error(f"Error reading cache generations for {missing}: {e}")
+            generations.update((namespace, 0) for namespace in missing)
+            return generations
+        
+        for namespace, value in zip(missing, values):
+            generations[namespace] = int(value)
+            if local_cache is not None:
+                local_cache.set(cls._generation_key(namespace), generations[namespace])
+        return generations
+    
+    @classmethod
+    async def aget_generations(cls, namespaces):
+        """get_generations for async views, reading missing counters with the async Redis client"""
+        namespaces = sorted(set(namespaces))
+        generations = {}
+        local_cache = cls.get_local_cache()
+        if local_cache is not None:
+            for namespace in namespaces:
+                found, generation = local_cache.get(cls._generation_key(namespace))
+                if found:
+                    generations[namespace] = generation
+        
+        missing = [namespace for namespace in namespaces if namespace not in generations]
+        if not missing:
+            return generations
+        
+        try:
+            redis_conn = get_async_redis_connection()
+            if redis_conn is None:
+                return await sync_to_async(cls.get_generations)(namespaces)
+            values = await async_cache.execute(
+                redis_conn, 'eval',
+                GENERATION_READ_SCRIPT,
+                len(missing),
+                *[cls._generation_key(namespace) for namespace in missing],
+                int(time.time() * 1000)
+            )
+        except Exception as e:
+            logger.error(f"Error reading cache generations for {missing}: {e}")
+            generations.update((namespace, 0) for namespace in missing)
+            return generations
+        
+        for namespace, value in zip(missing, values):
+            generations[namespace] = int(value)
+            if local_cache is not None:
+                local_cache.set(cls._generation_key(namespace), generations[namespace])
+        return generations
+    
+    @classmethod
+    def peek_generations(cls, namespaces):
+        """
+        Current generation of each namespace straight from Redis, for reporting
+
+        Unlike get_generations no counter is created: namespaces nobody has
+        read map to None.
+        """
+        namespaces = sorted(set(namespaces))
+        values = get_redis_connection("default").mget(cls.generation_keys(namespaces))
+        return {
+            namespace: int(value) if value is not None else None
+            for namespace, value in zip(namespaces, values)
+        }
+    
+    @classmethod
+    def bump_generations(cls, namespaces, redis_conn=None):
+        """
+        Invalidate every entry keyed by one of the namespaces in O(1)
+        
+        Only counters that exist are bumped; a namespace nobody has read has
+        no entries. Pass a pipeline as redis_conn to queue the bump with
+        other commands; the caller then broadcasts the L1 eviction of
+        generation_keys(namespaces) itself.
+        """
+        namespaces = sorted(set(namespaces))
+        if not namespaces:
+            return 0
+        
+        gen_keys = cls.generation_keys(namespaces)
+        pipelined = redis_conn is not None
+        if redis_conn is None:
+            redis_conn = get_redis_connection("default")
+        bumped = redis_conn.eval(GENERATION_BUMP_SCRIPT, len(gen_keys), *gen_keys, int(time.time() * 1000))
+        if not pipelined:
+            cls.broadcast_eviction(keys=gen_keys)
+            logger.debug(f"Bumped cache generations of {', '.join(namespaces)}")
+        return bumped
+    
+    @classmethod
+    def generation_keys(cls, namespaces):
+        """Redis (and L1) keys holding the namespaces' generation counters"""
+        return [cls._generation_key(namespace) for namespace in namespaces]
+    
+    @classmethod
+    def get_ttl(cls, prefix):
+        """Get the content-specific TTL for a prefix"""
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        ttl_mapping = {
+            'product_detail': cache_settings.get('PRODUCT_DETAIL_TTL', 60 * 30),
+            'phone_detail': cache_settings.get('PRODUCT_DETAIL_TTL', 60 * 30),
+            'accessory_detail': cache_settings.get('PRODUCT_DETAIL_TTL', 60 * 30),
+            'brand_products': cache_settings.get('BRAND_PRODUCTS_TTL', 60 * 10),
+            'homepage': cache_settings.get('HOMEPAGE_TTL', 60 * 15),
+            'category': cache_settings.get('CATEGORY_TTL', 60 * 60),
+            'static': cache_settings.get('STATIC_TTL', 60 * 60 * 24),
+        }
+        return ttl_mapping.get(prefix, cache_settings.get('DYNAMIC_TTL', 60 * 5))
+    
+    @classmethod
+    def get_stale_ttl(cls, prefix):
+        """Get how long a prefix may be served stale while it is rebuilt (0 disables)"""
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        return cache_settings.get('STALE_TTL', {}).get(prefix, 0)
+    
+    @classmethod
+    def get_local_cache(cls):
+        """Return this process's L1 cache, or None if the tier is disabled"""
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        if not cache_settings.get('L1_ENABLED', False):
+            return None
+        
+        if cls._local_cache is None:
+            with cls._init_lock:
+                if cls._local_cache is None:
+                    local_cache = LocalCache(
+                        max_entries=cache_settings.get('L1_MAX_ENTRIES', 1000),
+                        default_ttl=cache_settings.get('L1_TTL', 30)
+                    )
+                    cls._invalidation_bus = InvalidationBus(
+                        local_cache,
+                        channel=cache_settings.get('L1_CHANNEL', 'cache:l1:invalidate')
+                    )
+                    cls._local_cache = local_cache
+        
+        cls._invalidation_bus.ensure_listening()
+        return cls._local_cache
+    
+    @classmethod
+    def clear_local_cache(cls):
+        """Drop every L1 entry in this process"""
+        if cls._local_cache is not None:
+            cls._local_cache.clear()
+    
+    @classmethod
+    def broadcast_eviction(cls, keys=None, pattern=None):
+        """Evict keys (or a glob pattern of keys) from the L1 tier of every worker"""
+        if cls.get_local_cache() is None:
+            return
+        cls._invalidation_bus.publish(keys=keys, pattern=pattern)
+    
+    @classmethod
+    def get_codec(cls):
+        """Return the configured value codec, or None if SERIALIZER is disabled"""
+        if not cls._codec_loaded:
+            cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+            serializer = cache_settings.get('SERIALIZER', 'json')
+            if serializer in ('', 'none'):
+                serializer = None
+            cls._codec = CacheCodec(
+                serializer=serializer,
+                compress_min_bytes=cache_settings.get('COMPRESS_MIN_BYTES', 1024),
+                compress_level=cache_settings.get('COMPRESS_LEVEL', 6)
+            ) if serializer else None
+            cls._codec_loaded = True
+        return cls._codec
+    
+    @staticmethod
+    def get_prefix(key):
+        """Content prefix of a full key (<key_prefix>:v<version>:<prefix>:<identifier>...)"""
+        parts = key.split(':', 3)
+        return parts[2] if len(parts) > 2 else key
+    
+    @classmethod
+    def get_size_stats(cls):
+        """
+        Get the average encoded value size per key prefix for values written by this process
+        
+        avg_bytes is what is sent to Redis, avg_serialized_bytes the size
+        before compression.
+        """
+        sizes = CacheMetrics.snapshot()['writes']
+        
+        for counts in sizes.values():
+            counts['avg_bytes'] = counts['bytes'] / counts['writes']
+            counts['avg_serialized_bytes'] = counts['serialized_bytes'] / counts['writes']
+            counts['compression_ratio'] = counts['bytes'] / counts['serialized_bytes'] if counts['serialized_bytes'] else 1
+        return sizes
+    
+    @classmethod
+    def get_entry_by_key(cls, key):
+        """
+        Get a (value, soft_expires) pair by full key, checking the L1 tier before Redis
+        
+        soft_expires is None for entries stored without a stale window.
+        Returns None on a miss.
+        """
+        prefix = cls.get_prefix(key)
+        local_cache = cls.get_local_cache()
+        if local_cache is not None:
+            started = time.perf_counter()
+            found, stored = local_cache.get(key)
+            CacheMetrics.record_lookup(prefix, 'l1', found, time.perf_counter() - started)
+            if found:
+                return cls._unwrap(stored)
+        
+        started = time.perf_counter()
+        stored = cache.get(key)
+        CacheMetrics.record_lookup(
+            prefix, 'redis', stored is not None, time.perf_counter() - started,
+            len(stored) if isinstance(stored, bytes) else 0
+        )
+        if stored is None:
+            return None
+        # The L1 tier keeps decoded values so repeat hits skip decoding
+        stored = CacheCodec.decode(stored)
+        if local_cache is not None:
+            local_cache.set(key, stored)
+        return cls._unwrap(stored)
+    
+    @classmethod
+    async def aget_entry_by_key(cls, key):
+        """get_entry_by_key for async views, reading Redis with the async client"""
+        prefix = cls.get_prefix(key)
+        local_cache = cls.get_local_cache()
+        if local_cache is not None:
+            started = time.perf_counter()
+            found, stored = local_cache.get(key)
+            CacheMetrics.record_lookup(prefix, 'l1', found, time.perf_counter() - started)
+            if found:
+                return cls._unwrap(stored)
+        
+        started = time.perf_counter()
+        stored = await async_cache.cache_get(key)
+        CacheMetrics.record_lookup(
+            prefix, 'redis', stored is not None, time.perf_counter() - started,
+            len(stored) if isinstance(stored, bytes) else 0
+        )
+        if stored is None:
+            return None
+        stored = CacheCodec.decode(stored)
+        if local_cache is not None:
+            local_cache.set(key, stored)
+        return cls._unwrap(stored)
+    
+    @classmethod
+    async def aget_by_key(cls, key):
+        """get_by_key for async views"""
+        entry = await cls.aget_entry_by_key(key)
+        return entry[0] if entry is not None else None
+    
+    @classmethod
+    def get_by_key(cls, key):
+        """Get a value by its full key, checking the L1 tier before Redis"""
+        entry = cls.get_entry_by_key(key)
+        return entry[0] if entry is not None else None
+    
+    @classmethod
+    def get_entries_by_keys(cls, keys):
+        """
+        get_entry_by_key for many keys: the L1 tier, then one MGET for the rest
+
+        Returns a dict of key -> (value, soft_expires) for the keys found.
+        """
+        entries = {}
+        remaining = []
+        local_cache = cls.get_local_cache()
+        for key in keys:
+            if local_cache is not None:
+                started = time.perf_counter()
+                found, stored = local_cache.get(key)
+                CacheMetrics.record_lookup(cls.get_prefix(key), 'l1', found, time.perf_counter() - started)
+                if found:
+                    entries[key] = cls._unwrap(stored)
+                    continue
+            remaining.append(key)
+
+        if not remaining:
+            return entries
+
+        started = time.perf_counter()
+        found = cache.get_many(remaining)
+        # One round trip for all keys, so each lookup is charged its share
+        elapsed = (time.perf_counter() - started) / len(remaining)
+        for key in remaining:
+            stored = found.get(key)
+            CacheMetrics.record_lookup(
+                cls.get_prefix(key), 'redis', stored is not None, elapsed,
+                len(stored) if isinstance(stored, bytes) else 0
+            )
+            if stored is None:
+                continue
+            stored = CacheCodec.decode(stored)
+            if local_cache is not None:
+                local_cache.set(key, stored)
+            entries[key] = cls._unwrap(stored)
+        return entries
+
+    @staticmethod
+    def _unwrap(stored):
+        if isinstance(stored, dict) and stored.get(ENTRY_MARKER):
+            return stored['value'], stored['soft_expires']
+        return stored, None
+    
+    @classmethod
+    def set_by_key(cls, key, data, timeout):
+        """Set a value by its full key in Redis and the L1 tier"""
+        codec = cls.get_codec()
+        if codec is not None:
+            encoded, serialized_size = codec.encode(data)
+            cache.set(key, encoded, timeout)
+            CacheMetrics.record_write(cls.get_prefix(key), len(encoded), serialized_size)
+        else:
+            cache.set(key, data, timeout)
+        local_cache = cls.get_local_cache()
+        if local_cache is not None:
+            local_cache.set(key, data, timeout)
+    
+    @staticmethod
+    def product_tags(product_type, product_id, slug):
+        """
+        Tags for a cached product payload
+        
+        Ids are qualified by type because phones, accessories and flash deals
+        use separate id sequences; slugs are shared by the detail endpoints.
+        """
+        return [f"{product_type}:{product_id}", f"product:{slug}"]
+    
+    @classmethod
+    def get(cls, prefix, identifier, params=None, namespaces=None):
         """Get cached value with standardized key"""
-        key = cls.get_key(prefix, identifier, params)
-        return cache.get(key)
+        key = cls.get_key(prefix, identifier, params, namespaces)
+        return cls.get_by_key(key)
     
     @classmethod
-    def set(cls, prefix, identifier, data, timeout=None, params=None, tags=None):
+    def set(cls, prefix, identifier, data, timeout=None, params=None, tags=None, stale_ttl=0,
+            namespaces=None):
         """
         Set cache with standardized key and maintain tag registry using Redis sets
         
@@ -48,71 +587,431 @@ class CacheService:
             timeout: Cache TTL in seconds
             params: Optional query parameters
             tags: List of tags to associate with this cache entry
+            stale_ttl: Extra seconds the entry may be served stale after
+                       timeout while it is rebuilt (see get_or_compute)
+            namespaces: Namespaces whose generations are embedded in the key
+                        (e.g. 'brand:samsung'); invalidating one of them is
+                        a single counter bump instead of a key-by-key delete
+        """
+        key = cls.get_key(prefix, identifier, params, namespaces)
+        cls.set_entry(key, data, timeout=timeout, tags=tags, stale_ttl=stale_ttl)
+    
+    @staticmethod
+    def get_cardinality_sampling():
+        """Only one in this many keys is counted in the HyperLogLogs (1 counts all)"""
+        sampling = getattr(settings, 'CACHE_SETTINGS', {}).get('KEY_CARDINALITY_SAMPLING', 1)
+        return max(1, int(sampling))
+    
+    @classmethod
+    def record_distinct_key(cls, key):
+        """
+        Count a written key in its prefix's HyperLogLog for today
+        
+        HyperLogLogs estimate distinct members in 12KB each, so a prefix
+        whose key count explodes (e.g. an unlisted query param) shows up in
+        get_key_cardinality without storing the keys.
+        
+        Only keys whose hash falls in a 1-in-N sample (see
+        get_cardinality_sampling) are counted, so most writes skip the extra
+        round trip. A key is always in or always out of the sample, which
+        keeps N times the sampled count an estimate of all distinct keys.
+        """
+        sampling = cls.get_cardinality_sampling()
+        if sampling > 1:
+            digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+            if int.from_bytes(digest, 'big') % sampling:
+                return
+        
+        prefix = cls.get_prefix(key)
+        day = time.strftime('%Y%m%d', time.gmtime())
+        hll_key = f"hll:keys:{prefix}:{day}"
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            pipe.pfadd(hll_key, key)
+            pipe.expire(hll_key, 2 * 24 * 60 * 60)
+            pipe.sadd(f"hll:prefixes:{day}", prefix)
+            pipe.expire(f"hll:prefixes:{day}", 2 * 24 * 60 * 60)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error counting cache key {key}: {e}")
+    
+    @classmethod
+    def get_key_cardinality(cls, day=None):
+        """
+        Estimated distinct keys written per prefix on a UTC day (default: today)
+        
+        Returns a dict of prefix -> count, from two Redis round trips. Counts
+        are scaled up by the key sampling, so they move in steps of N.
+        """
+        day = day or time.strftime('%Y%m%d', time.gmtime())
+        sampling = cls.get_cardinality_sampling()
+        redis_conn = get_redis_connection("default")
+        prefixes = sorted(
+            p.decode('utf-8') if isinstance(p, bytes) else p
+            for p in redis_conn.smembers(f"hll:prefixes:{day}")
+        )
+        pipe = redis_conn.pipeline(transaction=False)
+        for prefix in prefixes:
+            pipe.pfcount(f"hll:keys:{prefix}:{day}")
+        return {prefix: count * sampling for prefix, count in zip(prefixes, pipe.execute())}
+    
+    @classmethod
+    def set_entry(cls, key, data, timeout=None, tags=None, stale_ttl=0):
+        """
+        Store a value under a full key from get_key, see set
+        
+        Callers that read a key before building its value write back to the
+        same key, so a generation bump during the build cannot promote data
+        built before it to the new generation.
         """
         if timeout is None:
-            # Use content-specific TTL
-            cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
-            ttl_mapping = {
-                'product_detail': cache_settings.get('PRODUCT_DETAIL_TTL', 60 * 30),
-                'brand_products': cache_settings.get('BRAND_PRODUCTS_TTL', 60 * 10),
-                'homepage': cache_settings.get('HOMEPAGE_TTL', 60 * 15),
-                'category': cache_settings.get('CATEGORY_TTL', 60 * 60),
-                'static': cache_settings.get('STATIC_TTL', 60 * 60 * 24),
-            }
-            timeout = ttl_mapping.get(prefix, cache_settings.get('DYNAMIC_TTL', 60 * 5))
+            timeout = cls.get_ttl(cls.get_prefix(key))
         
-        key = cls.get_key(prefix, identifier, params)
-        cache.set(key, data, timeout)
+        if stale_ttl:
+            # Soft expiry lives in the entry, hard expiry is the Redis TTL
+            entry = {
+                ENTRY_MARKER: 1,
+                'value': data,
+                'soft_expires': time.time() + timeout,
+            }
+            cls.set_by_key(key, entry, timeout + stale_ttl)
+        else:
+            cls.set_by_key(key, data, timeout)
         
-        # Register this key with its tags using Redis sets
         if tags:
+            cls.tag_key(key, tags, timeout + stale_ttl)
+        cls.record_distinct_key(key)
+    
+    @classmethod
+    def tag_key(cls, key, tags, ttl):
+        """
+        Register a cache key with its tags
+        
+        Tag membership is stored in Redis sorted sets scored by the time the
+        key expires, so expired members are trimmed on every write and a tag
+        set itself expires with its longest-lived member.
+        """
+        try:
+            # Get direct Redis connection for sorted set operations
+            redis_conn = get_redis_connection("default")
+            now = time.time()
+            redis_conn.eval(
+                TAG_KEY_SCRIPT,
+                len(tags),
+                *[f"tag:{tag}" for tag in tags],
+                key,
+                now + ttl,
+                now
+            )
+            logger.debug(f"Tagged cache key {key} with {', '.join(tags)}")
+        except Exception as e:
+            logger.error(f"Error adding cache tags: {e}")
+    
+    @classmethod
+    def get_or_compute(cls, prefix, identifier, builder, timeout=None, params=None,
+                       tags=None, refresh=False, lock_timeout=None, wait_timeout=None,
+                       stale_ttl=None, namespaces=None, negative_ttl=0, negative_tags=None):
+        """
+        Get a cached value, rebuilding it in at most one worker on a miss
+        
+        On a miss a short Redis lock is taken for the key so that only one
+        worker runs the builder. Workers that lose the race poll the cache
+        until the value appears, and only build it themselves if the lock
+        holder has not finished within ``wait_timeout`` seconds.
+        
+        Entries written with a stale window are served past their TTL for up
+        to ``stale_ttl`` more seconds while a background thread rebuilds them.
+        
+        With ``negative_ttl`` a None result is cached too, so lookups of
+        things that do not exist skip the builder until it expires or one
+        of ``negative_tags`` is invalidated.
+        
+        Args:
+            prefix: Content type prefix (e.g., 'product_detail')
+            identifier: Unique identifier (e.g., slug)
+            builder: Zero-argument callable producing the data to cache.
+                     A None result is returned to the caller but not cached.
+            timeout: Cache TTL in seconds, or a callable taking the built
+                     data and returning the TTL
+            params: Optional query parameters
+            tags: List of tags to associate with this cache entry, or a
+                  callable taking the built data and returning them
+            refresh: Skip the cache read and rebuild unconditionally
+            lock_timeout: Seconds before an abandoned fill lock expires
+            wait_timeout: Seconds to wait for another worker's fill
+            stale_ttl: Seconds a soft-expired entry may still be served,
+                       defaults to CACHE_SETTINGS['STALE_TTL'][prefix]
+            namespaces: Namespaces whose generations are embedded in the key,
+                        see set
+            negative_ttl: Seconds to cache a None result (0 disables)
+            negative_tags: Tags for the negative entry, e.g. the tag that
+                           the thing being looked up would get once created
+        """
+        key = cls.get_key(prefix, identifier, params, namespaces)
+        if stale_ttl is None:
+            stale_ttl = cls.get_stale_ttl(prefix)
+        fill = (prefix, builder, timeout, tags, stale_ttl, negative_ttl, negative_tags)
+        
+        if not refresh:
+            entry = cls._safe_get_entry(key)
+            if entry is not None:
+                data, soft_expires = entry
+                if cls._is_missing(data):
+                    return None
+                stale = soft_expires is not None and soft_expires <= time.time()
+                if stale:
+                    cls._schedule_revalidation(key, fill, lock_timeout)
+                cls._note_served(stale=stale, expires=soft_expires)
+                return data
+        
+        acquired, lock = cls._acquire_fill_lock(key, lock_timeout)
+        
+        if not acquired and not refresh:
+            data = cls._wait_for_fill(key, wait_timeout)
+            if data is not None:
+                return None if cls._is_missing(data) else data
+            logger.warning(f"Timed out waiting for cache fill of {key}, building locally")
+        
+        try:
+            return cls._fill(key, *fill)
+        finally:
+            cls._release_fill_lock(key, lock)
+    
+    @classmethod
+    def get_many_or_compute(cls, prefix, identifiers, builder, timeout=None, params=None, tags=None,
+                            refresh=False, stale_ttl=None, negative_ttl=0, negative_tags=None):
+        """
+        get_or_compute for many identifiers: one MGET, then one builder call for all misses
+        
+        Stale entries are served and rebuilt in the background as in
+        get_or_compute. Misses are built without fill locks, so a batch never
+        waits for another worker's fill.
+        
+        Args:
+            prefix: Content type prefix (e.g., 'product_detail')
+            identifiers: Unique identifiers (e.g., slugs)
+            builder: Callable taking a list of identifiers and returning a
+                     dict of identifier -> data; identifiers left out are None
+            timeout: Cache TTL in seconds, or a callable taking one item's data
+            params: Optional query parameters, shared by every identifier
+            tags: List of tags, or a callable taking one item's data
+            refresh: Skip the cache read and rebuild everything
+            stale_ttl: Seconds a soft-expired entry may still be served,
+                       defaults to CACHE_SETTINGS['STALE_TTL'][prefix]
+            negative_ttl: Seconds to cache a None result (0 disables)
+            negative_tags: Callable taking an identifier and returning the
+                           tags of its negative entry
+        
+        Returns:
+            Dict of identifier -> data, None for identifiers without data
+        """
+        keys = {identifier: cls.get_key(prefix, identifier, params) for identifier in identifiers}
+        if stale_ttl is None:
+            stale_ttl = cls.get_stale_ttl(prefix)
+        
+        entries = {}
+        if not refresh:
             try:
-                # Get direct Redis connection for set operations
-                redis_conn = get_redis_connection("default")
-                
-                for tag in tags:
-                    tag_key = f"tag:{tag}"
-                    # Add key to the tag set (Redis SADD operation)
-                    redis_conn.sadd(tag_key, key)
-                    logger.debug(f"Tagged cache key {key} with {tag}")
+                entries = cls.get_entries_by_keys(list(keys.values()))
             except Exception as e:
-                logger.error(f"Error adding cache tags: {e}")
+                logger.error(f"Error reading {len(keys)} {prefix} cache keys: {e}")
+        
+        results = {}
+        misses = []
+        now = time.time()
+        for identifier, key in keys.items():
+            entry = entries.get(key)
+            if entry is None:
+                misses.append(identifier)
+                continue
+            data, soft_expires = entry
+            stale = soft_expires is not None and soft_expires <= now
+            if stale:
+                fill = (
+                    prefix, lambda identifier=identifier: builder([identifier]).get(identifier),
+                    timeout, tags, stale_ttl, negative_ttl,
+                    negative_tags(identifier) if negative_tags else None
+                )
+                cls._schedule_revalidation(key, fill)
+            cls._note_served(stale=stale, expires=soft_expires)
+            results[identifier] = None if cls._is_missing(data) else data
+        
+        if misses:
+            started = time.perf_counter()
+            built = builder(misses)
+            CacheMetrics.record_fill(prefix, time.perf_counter() - started)
+            for identifier in misses:
+                data = results[identifier] = built.get(identifier)
+                cls._store_filled(
+                    keys[identifier], prefix, data, timeout, tags, stale_ttl, negative_ttl,
+                    negative_tags(identifier) if negative_tags else None
+                )
+        return results
+    
+    @classmethod
+    def _fill(cls, key, prefix, builder, timeout, tags, stale_ttl, negative_ttl=0, negative_tags=None):
+        """Run a builder and cache its result, or a negative entry if it is None"""
+        started = time.perf_counter()
+        data = builder()
+        CacheMetrics.record_fill(prefix, time.perf_counter() - started)
+        cls._store_filled(key, prefix, data, timeout, tags, stale_ttl, negative_ttl, negative_tags)
+        return data
+    
+    @classmethod
+    def _store_filled(cls, key, prefix, data, timeout, tags, stale_ttl, negative_ttl=0, negative_tags=None):
+        """Cache a builder's result, or a negative entry if it is None"""
+        if data is not None:
+            ttl = timeout(data) if callable(timeout) else timeout
+            if ttl is None:
+                ttl = cls.get_ttl(prefix)
+            cls._note_served(expires=time.time() + ttl)
+            entry_tags = tags(data) if callable(tags) else tags
+            try:
+                cls.set_entry(key, data, timeout=ttl, tags=entry_tags, stale_ttl=stale_ttl)
+            except Exception as e:
+                logger.error(f"Error caching {key}: {e}")
+        elif negative_ttl:
+            try:
+                cls.set_entry(key, {MISSING_MARKER: 1}, timeout=negative_ttl, tags=negative_tags)
+            except Exception as e:
+                logger.error(f"Error caching negative entry {key}: {e}")
+    
+    @staticmethod
+    def _is_missing(data):
+        return isinstance(data, dict) and bool(data.get(MISSING_MARKER))
+    
+    @staticmethod
+    def _note_served(stale=False, expires=None):
+        freshness = served_freshness.get()
+        if freshness is None:
+            return
+        if stale:
+            freshness['stale'] = True
+        if expires is not None and (freshness['expires'] is None or expires < freshness['expires']):
+            freshness['expires'] = expires
+    
+    @classmethod
+    def _schedule_revalidation(cls, key, fill, lock_timeout=None):
+        """Rebuild a stale entry on the background pool, once per key per process"""
+        with cls._revalidation_lock:
+            if key in cls._revalidating:
+                return
+            cls._revalidating.add(key)
+            if cls._revalidation_executor is None:
+                workers = getattr(settings, 'CACHE_SETTINGS', {}).get('REVALIDATE_WORKERS', 4)
+                cls._revalidation_executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='cache-revalidate'
+                )
+        
+        try:
+            cls._revalidation_executor.submit(cls._revalidate, key, fill, lock_timeout)
+        except Exception as e:
+            logger.error(f"Error scheduling revalidation of {key}: {e}")
+            with cls._revalidation_lock:
+                cls._revalidating.discard(key)
+    
+    @classmethod
+    def _revalidate(cls, key, fill, lock_timeout=None):
+        """Background task: rebuild a stale entry unless another worker already is"""
+        lock = None
+        try:
+            acquired, lock = cls._acquire_fill_lock(key, lock_timeout)
+            if acquired:
+                cls._fill(key, *fill)
+                logger.debug(f"Revalidated stale cache entry {key}")
+        except Exception as e:
+            logger.error(f"Error revalidating {key}: {e}")
+        finally:
+            cls._release_fill_lock(key, lock)
+            with cls._revalidation_lock:
+                cls._revalidating.discard(key)
+            # Builders run ORM queries; don't leak this thread's DB connections
+            connections.close_all()
     
     @classmethod
-    def invalidate_by_tag(cls, tag):
+    def _safe_get_entry(cls, key):
+        """Read a key's entry, treating cache errors as a miss"""
+        try:
+            return cls.get_entry_by_key(key)
+        except Exception as e:
+            logger.error(f"Error reading cache key {key}: {e}")
+            return None
+    
+    @classmethod
+    def _safe_get(cls, key):
+        """Read a key, treating cache errors as a miss"""
+        try:
+            return cls.get_by_key(key)
+        except Exception as e:
+            logger.error(f"Error reading cache key {key}: {e}")
+            return None
+    
+    @classmethod
+    def _acquire_fill_lock(cls, key, lock_timeout=None):
         """
-        Invalidate all cache entries with a specific tag
-        Uses Redis SMEMBERS and pipeline for atomic operations
+        Try to take the single-flight lock for a key without blocking
+        
+        Returns an (acquired, lock) pair. If Redis is unavailable the caller
+        is allowed to build without a lock.
         """
+        if lock_timeout is None:
+            lock_timeout = getattr(settings, 'CACHE_SETTINGS', {}).get('FILL_LOCK_TIMEOUT', 10)
         try:
             redis_conn = get_redis_connection("default")
-            tag_key = f"tag:{tag}"
-            
-            # Get all keys in this tag set
-            tagged_keys = redis_conn.smembers(tag_key)
-            
-            if not tagged_keys:
+            lock = redis_conn.lock(f"lock:{key}", timeout=lock_timeout)
+            if lock.acquire(blocking=False):
+                return True, lock
+            return False, None
+        except Exception as e:
+            logger.error(f"Error acquiring fill lock for {key}: {e}")
+            return True, None
+    
+    @classmethod
+    def _release_fill_lock(cls, key, lock):
+        """Release a fill lock, ignoring locks that already expired"""
+        if lock is None:
+            return
+        try:
+            lock.release()
+        except Exception as e:
+            logger.warning(f"Error releasing fill lock for {key}: {e}")
+    
+    @classmethod
+    def _wait_for_fill(cls, key, wait_timeout=None):
+        """Poll the cache while another worker rebuilds the key"""
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        if wait_timeout is None:
+            wait_timeout = cache_settings.get('FILL_WAIT_TIMEOUT', 2)
+        poll_interval = cache_settings.get('FILL_POLL_INTERVAL', 0.05)
+        
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            data = cls._safe_get(key)
+            if data is not None:
+                return data
+        return None
+    
+    @classmethod
+    def invalidate_by_tag(cls, tag, background=False):
+        """
+        Invalidate all cache entries with a specific tag
+        Uses the tag index and UNLINK in bounded batches
+        
+        With background=True the work is queued and a Future is returned
+        """
+        from .invalidation import InvalidationEngine
+        
+        engine = InvalidationEngine()
+        if background:
+            return engine.submit('invalidate_tag', tag)
+        
+        try:
+            deleted = engine.invalidate_tag(tag)
+            if deleted:
+                logger.info(f"Invalidated {deleted} cache entries with tag {tag}")
+            else:
                 logger.debug(f"No cache entries found for tag {tag}")
-                return 0
-            
-            # Use Redis pipeline for atomic multi-operation
-            pipe = redis_conn.pipeline()
-            
-            # Delete all keys in the tag
-            for key in tagged_keys:
-                if isinstance(key, bytes):
-                    key = key.decode('utf-8')
-                pipe.delete(key)
-            
-            # Delete the tag set itself
-            pipe.delete(tag_key)
-            
-            # Execute all commands in a single Redis roundtrip
-            results = pipe.execute()
-            
-            # Count successful deletions (excluding the tag set deletion)
-            deleted = sum(results[:-1])
-            logger.info(f"Invalidated {deleted} cache entries with tag {tag}")
             return deleted
             
         except Exception as e:
@@ -120,28 +1019,175 @@ class CacheService:
             return 0
     
     @classmethod
-    def invalidate_by_prefix(cls, prefix):
+    def schedule_invalidation(cls, *tags):
+        """
+        Invalidate tags once the current transaction commits
+        
+        Tags scheduled within one transaction or invalidation_batch() are
+        deduplicated and removed in a single flush
+        """
+        from .invalidation import InvalidationEngine
+        
+        InvalidationEngine.schedule(tags)
+    
+    @classmethod
+    def invalidation_batch(cls):
+        """Context manager deferring scheduled invalidations until it exits"""
+        from .invalidation import InvalidationEngine
+        
+        return InvalidationEngine.batch()
+    
+    @staticmethod
+    def _get_tagged_keys(redis_conn, tag_key):
+        """Get the live members of a tag, tolerating legacy plain sets"""
+        try:
+            return redis_conn.zrangebyscore(tag_key, time.time(), '+inf')
+        except ResponseError:
+            return redis_conn.smembers(tag_key)
+    
+    @classmethod
+    def compact_tags(cls, batch_size=500, dry_run=False, progress=None):
+        """
+        Compact every tag set in Redis
+        
+        Drops members whose expiry has passed, members whose cache key no
+        longer exists (e.g. removed by invalidate_by_prefix) and empty tag
+        sets, converting legacy plain sets to scored sorted sets on the way.
+        
+        Args:
+            batch_size: SCAN count hint and EXISTS pipeline size
+            dry_run: Report what would be removed without changing anything
+            progress: Optional callable receiving (tag_key, tag_stats)
+        
+        Returns:
+            Summary dict with tags scanned, expired and orphaned members
+            removed, tag sets deleted and bytes reclaimed
+        """
+        redis_conn = get_redis_connection("default")
+        summary = {
+            'tags_scanned': 0,
+            'expired_members': 0,
+            'orphaned_members': 0,
+            'tags_deleted': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+        }
+        
+        for tag_key in redis_conn.scan_iter(match='tag:*', count=batch_size):
+            tag_key = tag_key.decode('utf-8') if isinstance(tag_key, bytes) else tag_key
+            tag_stats = cls._compact_tag(redis_conn, tag_key, batch_size, dry_run)
+            summary['tags_scanned'] += 1
+            for field in ('expired_members', 'orphaned_members', 'bytes_before', 'bytes_after'):
+                summary[field] += tag_stats[field]
+            summary['tags_deleted'] += int(tag_stats['deleted'])
+            if progress:
+                progress(tag_key, tag_stats)
+        
+        summary['bytes_reclaimed'] = summary['bytes_before'] - summary['bytes_after']
+        logger.info(
+            f"Compacted {summary['tags_scanned']} tag sets: "
+            f"{summary['expired_members']} expired and {summary['orphaned_members']} orphaned "
+            f"members, {summary['bytes_reclaimed']} bytes reclaimed"
+        )
+        return summary
+    
+    @classmethod
+    def _compact_tag(cls, redis_conn, tag_key, batch_size, dry_run):
+        """Compact a single tag set, see compact_tags"""
+        now = time.time()
+        tag_stats = {
+            'expired_members': 0,
+            'orphaned_members': 0,
+            'deleted': False,
+            'bytes_before': cls._memory_usage(redis_conn, tag_key),
+            'bytes_after': 0,
+        }
+        
+        key_type = redis_conn.type(tag_key)
+        key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else key_type
+        if key_type == 'set':
+            scored = {}
+            members = list(redis_conn.smembers(tag_key))
+        elif key_type == 'zset':
+            scored = dict(redis_conn.zrange(tag_key, 0, -1, withscores=True))
+            members = list(scored)
+            tag_stats['expired_members'] = sum(1 for score in scored.values() if score <= now)
+        else:
+            return tag_stats
+        
+        # Find live members whose cache entry is gone
+        live = [m for m in members if scored.get(m, float('inf')) > now]
+        orphaned = []
+        for start in range(0, len(live), batch_size):
+            batch = live[start:start + batch_size]
+            pipe = redis_conn.pipeline()
+            for member in batch:
+                member_key = member.decode('utf-8') if isinstance(member, bytes) else member
+                pipe.pttl(cache.make_key(member_key))
+            for member, pttl in zip(batch, pipe.execute()):
+                if pttl == -2:
+                    orphaned.append(member)
+                elif key_type == 'set':
+                    # No expiry (-1) stays until invalidated
+                    scored[member] = now + pttl / 1000 if pttl >= 0 else float('inf')
+        tag_stats['orphaned_members'] = len(orphaned)
+        
+        orphaned = set(orphaned)
+        remaining = [m for m in live if m not in orphaned]
+        if dry_run:
+            tag_stats['bytes_after'] = tag_stats['bytes_before']
+            tag_stats['deleted'] = not remaining
+            return tag_stats
+        
+        if not remaining:
+            redis_conn.delete(tag_key)
+            tag_stats['deleted'] = True
+            return tag_stats
+        
+        pipe = redis_conn.pipeline()
+        if key_type == 'set':
+            pipe.delete(tag_key)
+            pipe.zadd(tag_key, {m: scored[m] for m in remaining})
+        else:
+            pipe.zremrangebyscore(tag_key, '-inf', now)
+            if orphaned:
+                pipe.zrem(tag_key, *orphaned)
+        max_score = max(scored[m] for m in remaining)
+        if max_score == float('inf'):
+            pipe.persist(tag_key)
+        else:
+            pipe.expireat(tag_key, int(max_score) + 1)
+        pipe.execute()
+        
+        tag_stats['bytes_after'] = cls._memory_usage(redis_conn, tag_key)
+        return tag_stats
+    
+    @staticmethod
+    def _memory_usage(redis_conn, key):
+        try:
+            return redis_conn.memory_usage(key) or 0
+        except Exception:
+            return 0
+    
+    @classmethod
+    def invalidate_by_prefix(cls, prefix, background=False):
         """
         Invalidate all cache entries with a given prefix
-        Uses Redis SCAN for efficient key pattern matching
+        Uses incremental Redis SCAN and UNLINK in bounded batches
+        
+        With background=True the work is queued and a Future is returned
         """
+        from .invalidation import InvalidationEngine
+        
+        key_prefix = getattr(settings, 'CACHES', {}).get('default', {}).get('KEY_PREFIX', 'ecom')
+        pattern = f"{key_prefix}:*{prefix}*"
+        
+        engine = InvalidationEngine()
+        if background:
+            return engine.submit('invalidate_pattern', pattern, local_pattern=f"*{prefix}*")
+        
         try:
-            redis_conn = get_redis_connection("default")
-            key_prefix = getattr(settings, 'CACHES', {}).get('default', {}).get('KEY_PREFIX', 'ecom')
-            pattern = f"{key_prefix}:*{prefix}*"
-            
-            # Use SCAN instead of KEYS for production safety
-            count = 0
-            cursor = '0'
-            while cursor != 0:
-                cursor, keys = redis_conn.scan(cursor=cursor, match=pattern, count=1000)
-                if keys:
-                    redis_conn.delete(*keys)
-                    count += len(keys)
-                
-                # Convert string cursor to int for comparison
-                cursor = int(cursor)
-            
+            count = engine.invalidate_pattern(pattern, local_pattern=f"*{prefix}*")
             logger.info(f"Invalidated {count} cache entries with prefix {prefix}")
             return count
             
@@ -154,12 +1200,16 @@ class CacheService:
         """
         Get Redis cache statistics for monitoring
         """
+        from .invalidation import InvalidationEngine
+        
         try:
             redis_conn = get_redis_connection("default")
+            # One INFO call covers both the memory and stats sections
+            info = redis_conn.info()
             stats = {
-                'used_memory': redis_conn.info('memory')['used_memory_human'],
-                'hits': redis_conn.info('stats')['keyspace_hits'],
-                'misses': redis_conn.info('stats')['keyspace_misses'],
+                'used_memory': info['used_memory_human'],
+                'hits': info['keyspace_hits'],
+                'misses': info['keyspace_misses'],
                 'keys': redis_conn.dbsize()
             }
             
@@ -167,9 +1217,222 @@ class CacheService:
                 stats['hit_ratio'] = stats['hits'] / (stats['hits'] + stats['misses'])
             else:
                 stats['hit_ratio'] = 0
-                
+            
+            stats['tiers'] = cls.get_tier_stats()
+            stats['invalidation'] = InvalidationEngine.get_stats()
+            stats['sizes'] = cls.get_size_stats()
+            stats['circuit'] = get_breaker().get_stats()
+            stats['distinct_keys'] = cls.get_key_cardinality()
             return stats
             
         except Exception as e:
             logger.error(f"Error getting cache stats: {e}")
             return {}
+    
+    @classmethod
+    def get_key_census(cls, sample_size=None, tag_sample_size=None, batch_size=200):
+        """
+        Sample the keyspace and describe it per key prefix, for capacity planning
+        
+        Cache keys (``<key_prefix>:v*``) and tag sets are read with SCAN, each
+        stopping after its sample size or after scanning 10 times as many
+        keys, so the cost is bounded whatever the size of the keyspace. Sizes
+        and TTLs are read with pipelined STRLEN (the stored value's bytes) and
+        PTTL, tag set sizes with ZCARD and MEMORY USAGE. When a scan
+        stops early the figures describe the sample, not the whole keyspace.
+        
+        Args:
+            sample_size: Maximum cache keys sampled
+            tag_sample_size: Maximum tag sets sampled
+            batch_size: SCAN count hint and pipeline size
+        
+        Sample sizes default to CACHE_SETTINGS['CENSUS'] and are capped by
+        its MAX_SAMPLE_SIZE.
+        
+        Returns:
+            Dict with the sampled 'prefixes' (keys, total/percentile bytes and
+            a TTL histogram each), the 'tags' sampled by set size, and whether
+            each scan covered the whole keyspace ('complete')
+        """
+        config = getattr(settings, 'CACHE_SETTINGS', {}).get('CENSUS', {})
+        max_sample_size = config.get('MAX_SAMPLE_SIZE', 10000)
+        sample_size = min(sample_size or config.get('SAMPLE_SIZE', 1000), max_sample_size)
+        tag_sample_size = min(tag_sample_size or config.get('TAG_SAMPLE_SIZE', 200), max_sample_size)
+        
+        redis_conn = get_redis_connection("default")
+        key_prefix = getattr(settings, 'CACHES', {}).get('default', {}).get('KEY_PREFIX', 'ecom')
+        raw_prefix = cache.make_key('')
+        
+        keys, keys_complete = cls._sample_keys(
+            redis_conn, cache.make_key(f"{key_prefix}:v*"), sample_size, batch_size
+        )
+        prefixes = {}
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in batch:
+                pipe.strlen(key)
+                pipe.pttl(key)
+            results = pipe.execute(raise_on_error=False)
+            for i, key in enumerate(batch):
+                size, pttl = results[2 * i], results[2 * i + 1]
+                if not isinstance(pttl, int) or pttl == -2:
+                    # Expired or deleted since it was scanned
+                    continue
+                prefix = cls.get_prefix(key[len(raw_prefix):] if key.startswith(raw_prefix) else key)
+                sample = prefixes.setdefault(prefix, {'sizes': [], 'ttls': []})
+                sample['sizes'].append(size if isinstance(size, int) else 0)
+                sample['ttls'].append(pttl)
+        
+        tag_keys, tags_complete = cls._sample_keys(redis_conn, 'tag:*', tag_sample_size, batch_size)
+        tags = {}
+        for start in range(0, len(tag_keys), batch_size):
+            batch = tag_keys[start:start + batch_size]
+            pipe = redis_conn.pipeline(transaction=False)
+            for tag_key in batch:
+                pipe.type(tag_key)
+            types = pipe.execute()
+            pipe = redis_conn.pipeline(transaction=False)
+            for tag_key, key_type in zip(batch, types):
+                key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else key_type
+                # Legacy tag sets are plain sets, see compact_tags
+                if key_type == 'set':
+                    pipe.scard(tag_key)
+                else:
+                    pipe.zcard(tag_key)
+                pipe.memory_usage(tag_key)
+            results = pipe.execute(raise_on_error=False)
+            for i, tag_key in enumerate(batch):
+                members, size = results[2 * i], results[2 * i + 1]
+                if isinstance(members, int) and members:
+                    tags[tag_key[len('tag:'):]] = {'members': members, 'bytes': size if isinstance(size, int) else 0}
+        
+        return {
+            'prefixes': {
+                prefix: cls._describe_sample(sample['sizes'], sample['ttls'])
+                for prefix, sample in sorted(prefixes.items())
+            },
+            'tags': dict(sorted(tags.items(), key=lambda item: -item[1]['members'])),
+            'sampled_keys': sum(len(sample['sizes']) for sample in prefixes.values()),
+            'sampled_tags': len(tag_keys),
+            'complete': keys_complete and tags_complete,
+        }
+    
+    @staticmethod
+    def _sample_keys(redis_conn, pattern, limit, batch_size):
+        """Up to limit keys matching pattern, and whether the scan reached the end"""
+        keys = []
+        cursor = 0
+        scanned = 0
+        while len(keys) < limit:
+            cursor, batch = redis_conn.scan(cursor, match=pattern, count=batch_size)
+            keys.extend(key.decode('utf-8') if isinstance(key, bytes) else key for key in batch)
+            scanned += batch_size
+            if not cursor:
+                return keys[:limit], len(keys) <= limit
+            # A sparse pattern must not turn into a full keyspace walk
+            if scanned >= limit * 10:
+                break
+        return keys[:limit], False
+    
+    @classmethod
+    def _describe_sample(cls, sizes, ttls):
+        """Key count, size percentiles and TTL histogram of one prefix's sample"""
+        sizes = sorted(sizes)
+        buckets = {'none': 0}
+        for bound in CENSUS_TTL_BUCKETS:
+            buckets[f'<{bound}s'] = 0
+        buckets[f'>={CENSUS_TTL_BUCKETS[-1]}s'] = 0
+        for pttl in ttls:
+            if pttl < 0:
+                buckets['none'] += 1
+                continue
+            for bound in CENSUS_TTL_BUCKETS:
+                if pttl < bound * 1000:
+                    buckets[f'<{bound}s'] += 1
+                    break
+            else:
+                buckets[f'>={CENSUS_TTL_BUCKETS[-1]}s'] += 1
+        
+        def percentile(pct):
+            # Nearest rank
+            return sizes[max(0, math.ceil(pct / 100 * len(sizes)) - 1)] if sizes else 0
+        
+        return {
+            'keys': len(sizes),
+            'total_bytes': sum(sizes),
+            'p50_bytes': percentile(50),
+            'p95_bytes': percentile(95),
+            'p99_bytes': percentile(99),
+            'max_bytes': sizes[-1] if sizes else 0,
+            'ttl': buckets,
+        }
+    
+    @classmethod
+    def get_prometheus_metrics(cls):
+        """
+        Cache metrics of this process in the Prometheus text format
+        
+        Apart from the distinct key estimates (two small Redis round trips,
+        skipped while Redis is unavailable) only in-process counters are
+        included.
+        """
+        from .invalidation import InvalidationEngine
+        
+        invalidation = InvalidationEngine.get_stats()
+        circuit = get_breaker().get_stats()
+        local_cache = cls._local_cache
+        try:
+            cardinality = cls.get_key_cardinality()
+        except Exception as e:
+            logger.error(f"Error reading cache key cardinality: {e}")
+            cardinality = {}
+        extra = [
+            ('cache_distinct_keys', 'gauge', 'Estimated distinct keys written today per key prefix', [
+                ({'prefix': prefix}, count) for prefix, count in cardinality.items()
+            ]),
+            ('cache_circuit_open', 'gauge', 'Whether Redis calls are short-circuited to the local fallback', [
+                ({}, int(circuit['state'] != CircuitBreaker.CLOSED)),
+            ]),
+            ('cache_circuit_opened_total', 'counter', 'Times the Redis circuit breaker opened', [
+                ({}, circuit['opened']),
+            ]),
+            ('cache_circuit_rejected_total', 'counter', 'Cache calls answered by the fallback while open', [
+                ({}, circuit['rejected']),
+            ]),
+            ('cache_l1_entries', 'gauge', 'Entries in the per-process L1 tier', [
+                ({}, len(local_cache) if local_cache is not None else 0),
+            ]),
+            ('cache_invalidation_flushes_total', 'counter', 'Coalesced tag invalidation flushes', [
+                ({}, invalidation['flushes']),
+            ]),
+            ('cache_invalidation_tags_total', 'counter', 'Tags invalidated by flushes', [
+                ({}, invalidation['tags']),
+            ]),
+            ('cache_invalidation_keys_total', 'counter', 'Keys removed by flushes', [
+                ({}, invalidation['keys']),
+            ]),
+            ('cache_invalidation_flush_seconds_total', 'counter', 'Time spent flushing invalidations', [
+                ({}, invalidation['total_seconds']),
+            ]),
+        ]
+        return CacheMetrics.render_prometheus(extra)
+    
+    @classmethod
+    def get_tier_stats(cls):
+        """
+        Get per-process hit/miss counters for the L1 and Redis tiers
+        """
+        tiers = {tier: {'hits': 0, 'misses': 0} for tier in ('l1', 'redis')}
+        for (prefix, view, tier), counts in CacheMetrics.snapshot()['lookups'].items():
+            tiers[tier]['hits'] += counts['hits']
+            tiers[tier]['misses'] += counts['misses']
+        
+        for counts in tiers.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_ratio'] = counts['hits'] / total if total else 0
+        
+        tiers['l1']['enabled'] = cls._local_cache is not None
+        tiers['l1']['size'] = len(cls._local_cache) if cls._local_cache is not None else 0
+        tiers['l1']['listening'] = bool(cls._invalidation_bus and cls._invalidation_bus.is_listening())
+        return tiers
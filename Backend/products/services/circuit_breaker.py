@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from django_redis import get_redis_connection as get_raw_redis_connection
+from django_redis.exceptions import ConnectionInterrupted
+from redis import ConnectionPool
+from redis.connection import Connection
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean Redis is unreachable, as opposed to a bad command
+OUTAGE_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionInterrupted)
+
+
+class CircuitOpenError(RedisConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling Redis after repeated connection failures
+
+    Closed: calls go through; ``failure_threshold`` consecutive outage errors
+    open the circuit. Open: calls are refused for ``reset_timeout`` seconds,
+    so callers fall back immediately instead of waiting for socket timeouts.
+    Half-open: one cache call is let through as a probe; its success closes
+    the circuit and its failure opens it again. A probe that never reports
+    back is replaced after ``probe_timeout`` seconds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, probe_timeout=10):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.stats = {'opened': 0, 'closed': 0, 'rejected': 0}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a Redis call may be attempted now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                logger.info("Redis circuit half-open, probing")
+                return True
+            if self.state == self.HALF_OPEN and now - self.probe_started >= self.probe_timeout:
+                self.probe_started = now
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def is_closed(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            # Hot path: every Redis reply reports success
+            return
+        with self._lock:
+            self.failures = 0
+            if self.state == self.CLOSED:
+                return
+            self.state = self.CLOSED
+            self.stats['closed'] += 1
+        logger.warning("Redis circuit closed, cache calls resumed")
+        self._notify(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.OPEN:
+                return
+            if self.state == self.CLOSED and self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.stats['opened'] += 1
+        logger.error(f"Redis circuit opened after {self.failures} failures, "
+                     f"using the local fallback for {self.reset_timeout}s")
+        self._notify(self.OPEN)
+
+    def add_listener(self, listener):
+        """Call listener(state) whenever the circuit opens or closes"""
+        self._listeners.append(listener)
+
+    def _notify(self, state):
+        for listener in self._listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                logger.error(f"Error in circuit breaker listener {listener}: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, state=self.state, failures=self.failures)
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """The process-wide Redis circuit breaker, configured by CACHE_SETTINGS['CIRCUIT_BREAKER']"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                config = getattr(settings, 'CACHE_SETTINGS', {}).get('CIRCUIT_BREAKER', {})
+                _breaker = CircuitBreaker(
+                    failure_threshold=config.get('FAILURE_THRESHOLD', 5),
+                    reset_timeout=config.get('RESET_TIMEOUT', 30),
+                    probe_timeout=config.get('PROBE_TIMEOUT', 10)
+                )
+    return _breaker
+
+
+def is_enabled():
+    return getattr(settings, 'CACHE_SETTINGS', {}).get('CIRCUIT_BREAKER', {}).get('ENABLED', True)
+
+
+class CircuitBreakerConnectionMixin:
+    """Reports every Redis command's outcome to the circuit breaker"""
+
+    def connect(self, *args, **kwargs):
+        try:
+            return super().connect(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            _report_failure(e)
+            raise
+
+    def send_packed_command(self, *args, **kwargs):
+        try:
+            return super().send_packed_command(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            _report_failure(e)
+            raise
+
+    def read_response(self, *args, **kwargs):
+        try:
+            response = super().read_response(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            _report_failure(e)
+            raise
+        get_breaker().record_success()
+        return response
+
+
+def _report_failure(error):
+    # send_packed_command may fail inside connect(); count the error once
+    if not getattr(error, '_circuit_counted', False):
+        error._circuit_counted = True
+        get_breaker().record_failure()
+
+
+class CircuitBreakerConnectionPool(ConnectionPool):
+    """
+    Connection pool whose connections report to the circuit breaker
+
+    Set as the cache's CONNECTION_POOL_CLASS, so failures are counted for
+    every command: cache calls, pipelines and the direct connections used
+    for locks, tags and pub/sub alike. The configured connection_class is
+    extended rather than replaced.
+    """
+
+    def __init__(self, connection_class=None, **kwargs):
+        base = connection_class or Connection
+        connection_class = type(
+            f"CircuitBreaker{base.__name__}", (CircuitBreakerConnectionMixin, base), {}
+        )
+        super().__init__(connection_class=connection_class, **kwargs)
+
+
+def get_redis_connection(alias="default"):
+    """
+    django_redis.get_redis_connection that refuses to connect unless the circuit is closed
+
+    Direct connections (locks, tag sets, generations) never act as the
+    half-open probe: their callers handle errors themselves, so the probe
+    is left to the cache backend, which reports the outcome.
+    """
+    if is_enabled() and not get_breaker().is_closed():
+        raise CircuitOpenError("Redis circuit is open")
+    return get_raw_redis_connection(alias)
@@ -0,0 +1,122 @@
+import json
+import logging
+import pickle
+import zlib
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for SERIALIZER = 'msgpack'
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Header of every encoded value: magic, codec version, serializer, compression
+MAGIC = b'EC'
+VERSION = b'1'
+COMPRESSED = b'z'
+UNCOMPRESSED = b'-'
+HEADER_SIZE = len(MAGIC) + 3
+
+
+class CacheJSONEncoder(JSONEncoder):
+    """
+    DRF's encoder, so cached payloads render exactly as they would uncached
+
+    Decimals, dates and UUIDs become the same numbers/strings the JSON
+    renderer would produce. Bytes are refused instead of being decoded, so
+    values holding them fall back to pickle and round-trip unchanged; the
+    rendered response cache stores its bodies as text for this reason.
+    """
+    def default(self, obj):
+        if isinstance(obj, (bytes, bytearray)):
+            raise TypeError('bytes are not JSON serializable')
+        return super().default(obj)
+
+
+def _json_dumps(value):
+    return json.dumps(value, cls=CacheJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _msgpack_dumps(value):
+    return msgpack.packb(value, use_bin_type=True, default=CacheJSONEncoder().default)
+
+
+def _msgpack_loads(data):
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _pickle_dumps(value):
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+# Format byte -> (name, dumps, loads)
+SERIALIZERS = {
+    b'j': ('json', _json_dumps, _json_loads),
+    b'm': ('msgpack', _msgpack_dumps, _msgpack_loads),
+    b'p': ('pickle', _pickle_dumps, pickle.loads),
+}
+FORMATS = {name: fmt for fmt, (name, _, _) in SERIALIZERS.items()}
+
+
+class CacheCodec:
+    """
+    Encodes cache values to compact bytes with a self-describing header
+
+    Values are serialized with the configured serializer ('json', 'msgpack'
+    or 'pickle'); values it cannot represent fall back to pickle. Payloads of
+    at least ``compress_min_bytes`` are zlib-compressed. The header records
+    the serializer and compression, so entries written with other settings
+    (or before the codec existed) are still decoded.
+    """
+
+    def __init__(self, serializer='json', compress_min_bytes=1024, compress_level=6):
+        if serializer == 'msgpack' and msgpack is None:
+            logger.warning("msgpack is not installed, cache values fall back to JSON")
+            serializer = 'json'
+        if serializer not in FORMATS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        self.format = FORMATS[serializer]
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    def encode(self, value):
+        """Return (encoded bytes, serialized size before compression)"""
+        fmt = self.format
+        try:
+            payload = SERIALIZERS[fmt][1](value)
+        except (TypeError, ValueError, OverflowError):
+            fmt = b'p'
+            payload = _pickle_dumps(value)
+
+        size = len(payload)
+        compression = UNCOMPRESSED
+        if self.compress_min_bytes is not None and size >= self.compress_min_bytes:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < size:
+                payload, compression = compressed, COMPRESSED
+
+        return MAGIC + VERSION + fmt + compression + payload, size
+
+    @staticmethod
+    def is_encoded(stored):
+        return isinstance(stored, bytes) and stored[:len(MAGIC)] == MAGIC and len(stored) >= HEADER_SIZE
+
+    @classmethod
+    def decode(cls, stored):
+        """Decode an encoded value; anything else (legacy pickled values) is returned as is"""
+        if not cls.is_encoded(stored):
+            return stored
+
+        version, fmt, compression = stored[2:3], stored[3:4], stored[4:5]
+        if version != VERSION or fmt not in SERIALIZERS:
+            raise ValueError(f"Unsupported cache value format {stored[:HEADER_SIZE]!r}")
+
+        payload = stored[HEADER_SIZE:]
+        if compression == COMPRESSED:
+            payload = zlib.decompress(payload)
+        return SERIALIZERS[fmt][2](payload)
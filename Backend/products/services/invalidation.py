@@ -0,0 +1,346 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import ResponseError
+from .circuit_breaker import CircuitBreaker, get_breaker, get_redis_connection
+from .purge import has_failed_keys, purge_tags
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationEngine:
+    """
+    Bulk cache invalidation that never blocks Redis for long
+
+    Keys come either from the tag index or from an incremental SCAN and are
+    removed with UNLINK (falling back to DEL on Redis < 4) in batches of at
+    most ``batch_size`` keys, so no single command scans or frees the whole
+    keyspace. Progress is reported after every batch to an optional
+    callable receiving a dict with ``scanned``, ``deleted`` and ``batches``.
+    Tag invalidations also bump the generation of any namespace named like
+    the tag (see CacheService.bump_generations) and purge the matching
+    surrogate keys from the HTTP cache tier on the background pool (see
+    purge).
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    # Tags scheduled by the current thread, flushed together on commit
+    _pending = threading.local()
+
+    _flush_stats = {'flushes': 0, 'tags': 0, 'keys': 0, 'total_seconds': 0.0,
+                    'last_seconds': 0.0, 'max_seconds': 0.0}
+    _flush_stats_lock = threading.Lock()
+
+    # Tags whose flush failed (e.g. during a Redis outage), replayed once the
+    # circuit breaker closes so Redis does not keep serving what they covered
+    _failed_tags = set()
+    _failed_lock = threading.Lock()
+    _replay_registered = False
+
+    # Pending retry of failed surrogate key purges, see purge
+    _purge_retry_timer = None
+    _purge_retry_lock = threading.Lock()
+
+    def __init__(self, batch_size=None, progress=None):
+        cache_settings = getattr(settings, 'CACHE_SETTINGS', {})
+        self.batch_size = batch_size or cache_settings.get('INVALIDATION_BATCH_SIZE', 500)
+        self.progress = progress
+
+    def invalidate_tag(self, tag):
+        """Remove every live key registered under a tag, then the tag set itself"""
+        from .cache_service import CacheService
+
+        redis_conn = get_redis_connection("default")
+        tag_key = f"tag:{tag}"
+        tagged_keys = [
+            key.decode('utf-8') if isinstance(key, bytes) else key
+            for key in CacheService._get_tagged_keys(redis_conn, tag_key)
+        ]
+
+        state = self._new_state()
+        for start in range(0, len(tagged_keys), self.batch_size):
+            batch = tagged_keys[start:start + self.batch_size]
+            # Tag sets hold keys before the cache backend adds its own prefix and version
+            self._unlink_batch(redis_conn, [cache.make_key(key) for key in batch], state)
+            state['scanned'] += len(batch)
+            CacheService.broadcast_eviction(keys=batch)
+            self._report(state)
+
+        redis_conn.delete(tag_key)
+        if CacheService.bump_generations([tag], redis_conn):
+            CacheService.broadcast_eviction(keys=CacheService.generation_keys([tag]))
+        # The HTTP cache tier is purged only once Redis can no longer refill it
+        self.submit('purge', [tag])
+        return state['deleted']
+
+    def invalidate_tags(self, tags):
+        """
+        Remove every live key registered under any of the given tags
+
+        All tag sets are read (and the tags' namespace generations bumped)
+        in one pipeline and the union of their members is unlinked together
+        with the tag sets in a second one, so the number of round trips does
+        not grow with the number of tags.
+        """
+        from .cache_service import CacheService
+
+        tags = sorted(set(tags))
+        if not tags:
+            return 0
+
+        redis_conn = get_redis_connection("default")
+        tag_keys = [f"tag:{tag}" for tag in tags]
+        started = time.monotonic()
+
+        now = time.time()
+        pipe = redis_conn.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.zrangebyscore(tag_key, now, '+inf')
+        CacheService.bump_generations(tags, pipe)
+        results = pipe.execute(raise_on_error=False)
+        bumped = results[len(tag_keys):]
+        if bumped and isinstance(bumped[0], Exception):
+            logger.error(f"Error bumping cache generations for {tags}: {bumped[0]}")
+        elif bumped and bumped[0]:
+            CacheService.broadcast_eviction(keys=CacheService.generation_keys(tags))
+
+        keys = set()
+        for tag_key, members in zip(tag_keys, results):
+            if isinstance(members, ResponseError):
+                # Legacy plain set written before tags were scored
+                members = redis_conn.smembers(tag_key)
+            keys.update(key.decode('utf-8') if isinstance(key, bytes) else key for key in members)
+        keys = sorted(keys)
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for start in range(0, len(keys), self.batch_size):
+            pipe.unlink(*[cache.make_key(key) for key in keys[start:start + self.batch_size]])
+        pipe.delete(*tag_keys)
+        results = pipe.execute(raise_on_error=False)
+        if any(isinstance(result, ResponseError) for result in results):
+            # UNLINK needs Redis 4.0+
+            pipe = redis_conn.pipeline(transaction=False)
+            for start in range(0, len(keys), self.batch_size):
+                pipe.delete(*[cache.make_key(key) for key in keys[start:start + self.batch_size]])
+            results = pipe.execute() + [0]
+        deleted = sum(results[:-1])
+
+        if keys:
+            CacheService.broadcast_eviction(keys=keys)
+        # CDN round trips stay off the committing request
+        self.submit('purge', tags)
+
+        self._record_flush(len(tags), deleted, time.monotonic() - started)
+        return deleted
+
+    def purge(self, tags):
+        """
+        Purge the tags' surrogate keys from the HTTP cache tier
+
+        Runs on the background pool (see submit). Keys of a failed purge go
+        out with the next one, and a retry is scheduled in case none comes.
+        """
+        if not purge_tags(tags):
+            self._schedule_purge_retry()
+        return 0
+
+    @classmethod
+    def _schedule_purge_retry(cls):
+        config = getattr(settings, 'CACHE_SETTINGS', {}).get('PURGE_BACKEND') or {}
+        with cls._purge_retry_lock:
+            if cls._purge_retry_timer is not None and cls._purge_retry_timer.is_alive():
+                return
+            cls._purge_retry_timer = threading.Timer(config.get('RETRY_DELAY', 30), cls._retry_purge)
+            cls._purge_retry_timer.daemon = True
+            cls._purge_retry_timer.start()
+
+    @classmethod
+    def _retry_purge(cls):
+        with cls._purge_retry_lock:
+            cls._purge_retry_timer = None
+        if has_failed_keys():
+            logger.info("Retrying failed surrogate key purges")
+            cls().submit('purge', [])
+
+    def invalidate_pattern(self, pattern, local_pattern=None):
+        """
+        Remove every key matching a Redis glob pattern using incremental SCAN
+
+        ``local_pattern`` is the matching pattern for L1 keys, which do not
+        carry the cache backend's prefix and version.
+        """
+        from .cache_service import CacheService
+
+        redis_conn = get_redis_connection("default")
+        state = self._new_state()
+
+        batch = []
+        for key in redis_conn.scan_iter(match=pattern, count=self.batch_size):
+            batch.append(key)
+            state['scanned'] += 1
+            if len(batch) >= self.batch_size:
+                self._unlink_batch(redis_conn, batch, state)
+                self._report(state)
+                batch = []
+        if batch:
+            self._unlink_batch(redis_conn, batch, state)
+            self._report(state)
+
+        CacheService.broadcast_eviction(pattern=local_pattern or pattern)
+        return state['deleted']
+
+    @classmethod
+    def schedule(cls, tags):
+        """
+        Queue tags for invalidation once the current transaction commits
+
+        Tags from every save in the transaction (or the enclosing batch()
+        block) are deduplicated and flushed by a single invalidate_tags call.
+        Outside a transaction and batch the flush happens immediately; tags
+        scheduled in a transaction that rolls back are dropped with it.
+        """
+        pending = cls._get_pending()
+        if pending['depth']:
+            pending['batch'].update(tags)
+            return
+
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls.flush(tags)
+            return
+
+        # One set per transaction, owned by its on_commit callback. Django
+        # discards the callback on rollback, so a callback missing from the
+        # connection's queue means a new transaction needs a new set.
+        callback = pending['callback']
+        if callback is None or not any(entry[1] is callback for entry in connection.run_on_commit):
+            tags_for_commit = set()
+            callback = partial(cls.flush, tags_for_commit)
+            callback.tags = tags_for_commit
+            pending['callback'] = callback
+            transaction.on_commit(callback)
+        callback.tags.update(tags)
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """Collect scheduled tags until the block exits, e.g. for one request"""
+        pending = cls._get_pending()
+        pending['depth'] += 1
+        try:
+            yield
+        finally:
+            pending['depth'] -= 1
+            if pending['depth'] == 0 and pending['batch']:
+                tags, pending['batch'] = pending['batch'], set()
+                cls.schedule(tags)
+
+    @classmethod
+    def flush(cls, tags):
+        """Invalidate a set of scheduled tags, logging instead of raising"""
+        if not tags:
+            return 0
+
+        try:
+            deleted = cls().invalidate_tags(tags)
+            logger.info(f"Invalidated {deleted} cache entries for {len(tags)} tags")
+            return deleted
+        except Exception as e:
+            logger.error(f"Error flushing cache invalidations for tags {sorted(tags)}: {e}")
+            cls._remember_failed(tags)
+            return 0
+
+    @classmethod
+    def _remember_failed(cls, tags):
+        with cls._failed_lock:
+            cls._failed_tags.update(tags)
+            if not cls._replay_registered:
+                get_breaker().add_listener(cls._replay_failed)
+                cls._replay_registered = True
+
+    @classmethod
+    def _replay_failed(cls, state):
+        """Circuit breaker listener: flush failed tags in the background once Redis is back"""
+        if state != CircuitBreaker.CLOSED:
+            return
+        with cls._failed_lock:
+            tags, cls._failed_tags = cls._failed_tags, set()
+        if tags:
+            logger.info(f"Replaying cache invalidations for {len(tags)} tags after Redis recovered")
+            cls().submit('flush', tags)
+
+    @classmethod
+    def get_stats(cls):
+        """Per-process counters and timings of coalesced invalidation flushes"""
+        with cls._flush_stats_lock:
+            stats = dict(cls._flush_stats)
+        stats['avg_seconds'] = stats['total_seconds'] / stats['flushes'] if stats['flushes'] else 0
+        return stats
+
+    @classmethod
+    def _get_pending(cls):
+        if not hasattr(cls._pending, 'state'):
+            cls._pending.state = {'batch': set(), 'depth': 0, 'callback': None}
+        return cls._pending.state
+
+    @classmethod
+    def _record_flush(cls, tags, keys, seconds):
+        with cls._flush_stats_lock:
+            stats = cls._flush_stats
+            stats['flushes'] += 1
+            stats['tags'] += tags
+            stats['keys'] += keys
+            stats['total_seconds'] += seconds
+            stats['last_seconds'] = seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Run an invalidation method on the shared background pool
+
+        Returns a Future resolving to the number of keys deleted.
+        """
+        with self._executor_lock:
+            if InvalidationEngine._executor is None:
+                InvalidationEngine._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='cache-invalidate'
+                )
+        return InvalidationEngine._executor.submit(self._run_logged, method, *args, **kwargs)
+
+    def _run_logged(self, method, *args, **kwargs):
+        try:
+            return getattr(self, method)(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background invalidation {method}{args} failed: {e}")
+            return 0
+
+    def _new_state(self):
+        return {'scanned': 0, 'deleted': 0, 'batches': 0, 'started': time.monotonic()}
+
+    def _unlink_batch(self, redis_conn, keys, state):
+        if not keys:
+            return
+        try:
+            deleted = redis_conn.unlink(*keys)
+        except ResponseError:
+            # UNLINK needs Redis 4.0+
+            deleted = redis_conn.delete(*keys)
+        state['deleted'] += deleted
+        state['batches'] += 1
+
+    def _report(self, state):
+        if self.progress:
+            self.progress({
+                'scanned': state['scanned'],
+                'deleted': state['deleted'],
+                'batches': state['batches'],
+                'elapsed': time.monotonic() - state['started'],
+            })
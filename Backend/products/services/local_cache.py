@@ -0,0 +1,153 @@
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from .circuit_breaker import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache used as the L1 tier in front of Redis
+
+    Entries expire after their own TTL (capped by ``default_ttl``) and the
+    least recently used entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries=1000, default_ttl=30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a (found, value) pair for a key"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return False, None
+
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        """Store a value for at most ``default_ttl`` seconds"""
+        if ttl is None or ttl > self.default_ttl:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        """Evict specific keys"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_pattern(self, pattern):
+        """Evict every key matching a glob-style pattern"""
+        with self._lock:
+            for key in [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class InvalidationBus:
+    """
+    Redis pub/sub channel that tells every worker to evict L1 entries
+
+    Messages are JSON objects with either a ``keys`` list, a glob
+    ``pattern`` or ``clear``. The listener thread is started lazily in each
+    process so it survives forking application servers.
+    """
+
+    RETRY_INTERVAL = 30  # Seconds between attempts to (re)start the listener
+
+    def __init__(self, local_cache, channel='cache:l1:invalidate'):
+        self.local_cache = local_cache
+        self.channel = channel
+        self._thread = None
+        self._pid = None
+        self._last_attempt = 0
+        self._lock = threading.Lock()
+
+    def publish(self, keys=None, pattern=None, clear=False):
+        """Evict locally, then broadcast the eviction to the other workers"""
+        message = {}
+        if keys:
+            message['keys'] = [k.decode('utf-8') if isinstance(k, bytes) else k for k in keys]
+        if pattern:
+            message['pattern'] = pattern
+        if clear:
+            message['clear'] = True
+        if not message:
+            return
+
+        self.apply(message)
+        try:
+            get_redis_connection("default").publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.error(f"Error publishing L1 invalidation: {e}")
+
+    def apply(self, message):
+        """Apply an eviction message to this process's L1 tier"""
+        if message.get('clear'):
+            self.local_cache.clear()
+            return
+        if message.get('keys'):
+            self.local_cache.delete_many(message['keys'])
+        if message.get('pattern'):
+            self.local_cache.delete_pattern(message['pattern'])
+
+    def ensure_listening(self):
+        """Start the subscriber thread for this process if it is not running"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if time.monotonic() - self._last_attempt < self.RETRY_INTERVAL:
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._last_attempt = time.monotonic()
+
+            # Entries cached while we were not listening may have missed evictions
+            self.local_cache.clear()
+            try:
+                pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_message})
+                self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+                self._pid = os.getpid()
+                logger.debug(f"Listening for L1 invalidations on {self.channel}")
+            except Exception as e:
+                self._thread = None
+                logger.error(f"Error subscribing to L1 invalidations: {e}")
+
+    def is_listening(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def _on_message(self, message):
+        try:
+            self.apply(json.loads(message['data']))
+        except Exception as e:
+            logger.error(f"Error applying L1 invalidation: {e}")
@@ -0,0 +1,142 @@
+import contextvars
+import threading
+
+# View handling the current request, set by CacheMonitorMiddleware. Lookups
+# outside a request (management commands, background rebuilds) use ''.
+current_view = contextvars.ContextVar('cache_metrics_view', default='')
+
+# Per-request hit/miss counters for the X-Cache-* debug headers
+current_request_counts = contextvars.ContextVar('cache_metrics_request', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class CacheMetrics:
+    """
+    In-process cache counters aggregated per key prefix and view
+
+    Recording is a dict update under a lock; nothing is formatted or logged
+    on the request path. Counters are per worker process, like Prometheus
+    client counters, and are rendered in the Prometheus text format by
+    render_prometheus() for scraping.
+    """
+
+    _lock = threading.Lock()
+
+    # (prefix, view, tier) -> {'hits', 'misses', 'seconds', 'bytes'}
+    _lookups = {}
+
+    # prefix -> {'writes', 'bytes', 'serialized_bytes'}
+    _writes = {}
+
+    # prefix -> {'fills', 'seconds'}
+    _fills = {}
+
+    @classmethod
+    def record_lookup(cls, prefix, tier, hit, seconds, nbytes=0):
+        view = current_view.get()
+        with cls._lock:
+            counts = cls._lookups.get((prefix, view, tier))
+            if counts is None:
+                counts = cls._lookups[(prefix, view, tier)] = {'hits': 0, 'misses': 0, 'seconds': 0.0, 'bytes': 0}
+            counts['hits' if hit else 'misses'] += 1
+            counts['seconds'] += seconds
+            counts['bytes'] += nbytes
+
+        # The L1 miss is followed by a Redis lookup; count the request once
+        if hit or tier == 'redis':
+            request_counts = current_request_counts.get()
+            if request_counts is not None:
+                request_counts['hits' if hit else 'misses'] += 1
+
+    @classmethod
+    def record_write(cls, prefix, nbytes, serialized_bytes):
+        with cls._lock:
+            counts = cls._writes.get(prefix)
+            if counts is None:
+                counts = cls._writes[prefix] = {'writes': 0, 'bytes': 0, 'serialized_bytes': 0}
+            counts['writes'] += 1
+            counts['bytes'] += nbytes
+            counts['serialized_bytes'] += serialized_bytes
+
+    @classmethod
+    def record_fill(cls, prefix, seconds):
+        with cls._lock:
+            counts = cls._fills.get(prefix)
+            if counts is None:
+                counts = cls._fills[prefix] = {'fills': 0, 'seconds': 0.0}
+            counts['fills'] += 1
+            counts['seconds'] += seconds
+
+    @classmethod
+    def snapshot(cls):
+        """Copy of all counters"""
+        with cls._lock:
+            return {
+                'lookups': {labels: dict(counts) for labels, counts in cls._lookups.items()},
+                'writes': {prefix: dict(counts) for prefix, counts in cls._writes.items()},
+                'fills': {prefix: dict(counts) for prefix, counts in cls._fills.items()},
+            }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._lookups.clear()
+            cls._writes.clear()
+            cls._fills.clear()
+
+    @classmethod
+    def render_prometheus(cls, extra=None):
+        """
+        Render all counters in the Prometheus text exposition format
+
+        Args:
+            extra: Optional list of (name, type, help, [(labels dict, value)])
+                   metric families to append, e.g. gauges owned by other services
+        """
+        snapshot = cls.snapshot()
+        families = [
+            ('cache_lookups_total', 'counter', 'Cache lookups by key prefix, view, tier and result', [
+                (dict(prefix=prefix, view=view, tier=tier, result=result), counts[field])
+                for (prefix, view, tier), counts in snapshot['lookups'].items()
+                for result, field in (('hit', 'hits'), ('miss', 'misses'))
+            ]),
+            ('cache_lookup_seconds_total', 'counter', 'Time spent in cache lookups', [
+                (dict(prefix=prefix, view=view, tier=tier), counts['seconds'])
+                for (prefix, view, tier), counts in snapshot['lookups'].items()
+            ]),
+            ('cache_read_bytes_total', 'counter', 'Encoded bytes read from Redis on hits', [
+                (dict(prefix=prefix, view=view), counts['bytes'])
+                for (prefix, view, tier), counts in snapshot['lookups'].items() if tier == 'redis'
+            ]),
+            ('cache_writes_total', 'counter', 'Values written to the cache', [
+                (dict(prefix=prefix), counts['writes']) for prefix, counts in snapshot['writes'].items()
+            ]),
+            ('cache_write_bytes_total', 'counter', 'Encoded bytes written to Redis', [
+                (dict(prefix=prefix), counts['bytes']) for prefix, counts in snapshot['writes'].items()
+            ]),
+            ('cache_write_serialized_bytes_total', 'counter', 'Bytes written before compression', [
+                (dict(prefix=prefix), counts['serialized_bytes']) for prefix, counts in snapshot['writes'].items()
+            ]),
+            ('cache_fills_total', 'counter', 'Cache misses rebuilt by get_or_compute', [
+                (dict(prefix=prefix), counts['fills']) for prefix, counts in snapshot['fills'].items()
+            ]),
+            ('cache_fill_seconds_total', 'counter', 'Time spent rebuilding missed entries', [
+                (dict(prefix=prefix), counts['seconds']) for prefix, counts in snapshot['fills'].items()
+            ]),
+        ]
+        families.extend(extra or [])
+
+        lines = []
+        for name, metric_type, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{{{_labels(**labels)}}} {value}' if labels else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+from urllib.parse import quote
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def surrogate_key(tag):
+    """
+    Surrogate key for a cache tag
+
+    Keys are space-separated in the Surrogate-Key header, so anything but
+    the characters used by our tags is percent-encoded (e.g. brand names
+    with spaces).
+    """
+    return quote(tag, safe=':_-.')
+
+
+class BasePurgeBackend:
+    """
+    Purges HTTP cache (CDN / reverse proxy) objects by surrogate key
+
+    Backends are configured through CACHE_SETTINGS['PURGE_BACKEND'] as
+    {'BACKEND': dotted path, 'OPTIONS': constructor kwargs}.
+    """
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class NullPurgeBackend(BasePurgeBackend):
+    """Default: no HTTP cache in front of the API"""
+
+    def purge(self, keys):
+        pass
+
+
+class MemoryPurgeBackend(BasePurgeBackend):
+    """Records purged keys in-process, for tests"""
+
+    purged = []
+    _lock = threading.Lock()
+
+    def purge(self, keys):
+        with self._lock:
+            MemoryPurgeBackend.purged.extend(keys)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.purged = []
+
+
+class FilePurgeBackend(BasePurgeBackend):
+    """Appends one JSON line per purge to a file, for local development"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def purge(self, keys):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'keys': list(keys)}) + '\n')
+
+
+class HTTPPurgeBackend(BasePurgeBackend):
+    """
+    Sends surrogate-key purge requests to a CDN or proxy API
+
+    Defaults match Fastly's purge-by-key endpoint (POST with a space-separated
+    Surrogate-Key header); Varnish xkey setups can use method='PURGE' and
+    header='xkey'.
+    """
+
+    def __init__(self, url, method='POST', header='Surrogate-Key', headers=None, batch_size=256, timeout=5):
+        self.url = url
+        self.method = method
+        self.header = header
+        self.headers = headers or {}
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def purge(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), self.batch_size):
+            request = urllib.request.Request(
+                self.url,
+                method=self.method,
+                headers={**self.headers, self.header: ' '.join(keys[start:start + self.batch_size])}
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+
+
+def get_purge_backend():
+    """Instantiate the configured purge backend (cheap, so settings overrides apply immediately)"""
+    config = getattr(settings, 'CACHE_SETTINGS', {}).get('PURGE_BACKEND') or {}
+    backend_class = import_string(config.get('BACKEND', 'products.services.purge.NullPurgeBackend'))
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+# Surrogate keys whose purge failed, sent again with the next purge
+_failed_keys = set()
+_failed_lock = threading.Lock()
+
+
+def purge_tags(tags):
+    """
+    Purge every HTTP cache object carrying one of the tags, logging instead of raising
+
+    Keys of earlier failed purges are retried along with the tags' keys.
+    Returns False if the purge failed, in which case all of its keys are
+    kept for the next one.
+    """
+    with _failed_lock:
+        keys = {surrogate_key(tag) for tag in tags} | _failed_keys
+        _failed_keys.clear()
+    if not keys:
+        return True
+    keys = sorted(keys)
+    try:
+        get_purge_backend().purge(keys)
+        logger.debug(f"Purged surrogate keys {keys}")
+        return True
+    except Exception as e:
+        logger.error(f"Error purging surrogate keys {keys}: {e}")
+        with _failed_lock:
+            _failed_keys.update(keys)
+        return False
+
+
+def has_failed_keys():
+    with _failed_lock:
+        return bool(_failed_keys)
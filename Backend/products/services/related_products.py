@@ -0,0 +1,307 @@
+import logging
+import threading
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from store.models import Phone, PhoneVariant, Accessory
+from ..models import RelatedProduct
+
+logger = logging.getLogger(__name__)
+
+# Every accessory is related to every other, so they form a single group
+ACCESSORY_GROUP = 'accessories'
+
+
+class RelatedProductService:
+    """
+    Maintains the precomputed related products in RelatedProduct
+
+    Phones are related to the other phones of their brand, closest base
+    price first (best sellers, then newer phones break ties), each
+    represented by its cheapest active variant. Accessories are related to
+    the other active accessories: best sellers, then new arrivals, then the
+    newest.
+
+    Rows are kept up to date incrementally. A product change queues the
+    product (schedule_refresh); once the transaction commits, refresh_group
+    re-ranks only the rows it can affect: its own list, the lists it was in
+    and the lists it now ranks into. Only rows that changed are written, and
+    only the cached details of products whose related products changed or
+    that list a changed product are invalidated. rebuild_all re-ranks every
+    row (see the rebuild_related_products command).
+    """
+
+    # Products queued by the current thread, refreshed together on commit
+    _pending = threading.local()
+
+    @staticmethod
+    def get_limit():
+        return getattr(settings, 'RELATED_PRODUCTS_LIMIT', 4)
+
+    @staticmethod
+    def phone_group(brand):
+        return brand.lower()
+
+    @staticmethod
+    def product_tag(product_type, product_id):
+        """Tag of a product's cached details, see CacheService.product_tags"""
+        return f"{product_type}:{product_id}"
+
+    @classmethod
+    def get_related_ids(cls, product_type, product):
+        """
+        Ranked related ids of a phone or accessory
+
+        One indexed read of the product's row. A product without a row yet
+        (e.g. created before the first rebuild) is ranked on the fly and the
+        row written, so later reads find it.
+        """
+        related_ids = RelatedProduct.get_related_ids(product_type, product.pk)
+        if related_ids is None:
+            logger.debug(f"No related products stored for {product_type} {product.pk}, ranking them now")
+            if product_type == RelatedProduct.PHONE:
+                group = cls.phone_group(product.brand)
+                phones = cls.load_phones(group)
+                related_ids = cls.rank_phones(phones, cls.get_limit(), [product.pk]).get(product.pk, [])
+            else:
+                group = ACCESSORY_GROUP
+                related_ids = cls.rank_accessories(cls.top_accessories(), cls.get_limit(), [product.pk])[product.pk]
+            # A refresh that wrote the row meanwhile wins
+            RelatedProduct.objects.bulk_create(
+                [RelatedProduct(product_type=product_type, product_id=product.pk, group=group, related_ids=related_ids)],
+                ignore_conflicts=True
+            )
+        return related_ids
+
+    @staticmethod
+    def load_phones(group):
+        """A brand's phones, each with its active variants cheapest first"""
+        return list(Phone.objects.filter(brand__iexact=group).prefetch_related(
+            Prefetch('variants',
+                     queryset=PhoneVariant.objects.filter(is_active=True).order_by('price', 'id'),
+                     to_attr='active_variants')
+        ))
+
+    @classmethod
+    def top_accessories(cls):
+        """Ids of the best ranked active accessories, one more than the limit"""
+        return list(
+            Accessory.objects.filter(is_active=True)
+            .order_by('-is_best_seller', '-is_new_arrival', '-created_at', 'pk')
+            .values_list('pk', flat=True)[:cls.get_limit() + 1]
+        )
+
+    @staticmethod
+    def phone_rank_key(phone, candidate):
+        """Sort key of candidate in phone's related products, lower ranks first"""
+        price = phone.active_variants[0].price if phone.active_variants else None
+        return (
+            abs(candidate.active_variants[0].price - price) if price is not None else 0,
+            not any(variant.is_best_seller for variant in candidate.active_variants),
+            -candidate.created_at.timestamp(),
+            candidate.pk,
+        )
+
+    @classmethod
+    def rank_phones(cls, phones, limit, product_ids=None):
+        """
+        Rank phones loaded by load_phones against each other
+
+        Returns a dict of phone id -> related variant ids for the phones in
+        product_ids (default: all of them).
+        """
+        candidates = [phone for phone in phones if phone.active_variants]
+        related = {}
+        for phone in phones:
+            if product_ids is not None and phone.pk not in product_ids:
+                continue
+            others = sorted(
+                (candidate for candidate in candidates if candidate.pk != phone.pk),
+                key=partial(cls.phone_rank_key, phone)
+            )
+            related[phone.pk] = [candidate.active_variants[0].pk for candidate in others[:limit]]
+        return related
+
+    @staticmethod
+    def rank_accessories(top, limit, product_ids):
+        """Related accessory ids of each of product_ids, given top_accessories"""
+        return {pk: [other for other in top if other != pk][:limit] for pk in product_ids}
+
+    @classmethod
+    def refresh_group(cls, product_type, group, product_ids=None):
+        """
+        Re-rank the rows of a group that changes to product_ids can affect
+
+        With product_ids None every row of the group is re-ranked. Rows of
+        products that left the group (deleted, or a phone that changed
+        brand) are dropped. Only rows whose related ids changed are written.
+
+        Returns the ids of the group's products whose cached details are
+        out of date: their related products changed, or they list one of
+        product_ids.
+        """
+        changed = set(product_ids) if product_ids is not None else None
+        stored = dict(
+            RelatedProduct.objects.filter(product_type=product_type, group=group)
+            .values_list('product_id', 'related_ids')
+        )
+        if product_type == RelatedProduct.PHONE:
+            related, listed = cls._rank_affected_phones(group, stored, changed)
+        else:
+            related, listed = cls._rank_affected_accessories(stored, changed)
+
+        updates = {pk: ids for pk, ids in related.items() if stored.get(pk) != ids}
+        gone = [pk for pk in stored if pk not in listed]
+        if updates or gone:
+            with transaction.atomic():
+                # A phone that changed brand still has its row in the old group
+                RelatedProduct.objects.filter(
+                    product_type=product_type, product_id__in=[*updates, *gone]
+                ).delete()
+                RelatedProduct.objects.bulk_create([
+                    RelatedProduct(product_type=product_type, product_id=pk, group=group, related_ids=ids)
+                    for pk, ids in updates.items()
+                ])
+
+        stale = set(updates)
+        if changed:
+            stale.update(pk for pk, ids in stored.items() if pk in listed and listed[pk] & changed)
+        return stale
+
+    @classmethod
+    def _rank_affected_phones(cls, group, stored, changed):
+        """
+        (related ids of the re-ranked phones, product id -> set of phone ids
+        listed in its stored row) for refresh_group
+        """
+        limit = cls.get_limit()
+        phones = cls.load_phones(group)
+        by_id = {phone.pk: phone for phone in phones}
+        variant_phones = {
+            variant.pk: phone.pk for phone in phones for variant in phone.active_variants
+        }
+        listed = {
+            pk: {variant_phones.get(variant_id) for variant_id in stored.get(pk, ())} for pk in by_id
+        }
+        if changed is None:
+            return cls.rank_phones(phones, limit), listed
+
+        entering = [by_id[pk] for pk in changed if pk in by_id and by_id[pk].active_variants]
+        affected = set(changed) & set(by_id)
+        for phone in phones:
+            if phone.pk in affected:
+                continue
+            related_ids = stored.get(phone.pk)
+            # No row yet, a listed variant no longer active, or a changed phone listed
+            if related_ids is None or None in listed[phone.pk] or listed[phone.pk] & changed:
+                affected.add(phone.pk)
+                continue
+            # A changed phone that fills a free slot or outranks the last listed one
+            others = [candidate for candidate in entering if candidate.pk != phone.pk]
+            if len(related_ids) < limit:
+                enters = bool(others)
+            else:
+                last_key = cls.phone_rank_key(phone, by_id[variant_phones[related_ids[-1]]]) if related_ids else None
+                enters = last_key is not None and any(
+                    cls.phone_rank_key(phone, candidate) < last_key for candidate in others
+                )
+            if enters:
+                affected.add(phone.pk)
+        return cls.rank_phones(phones, limit, affected), listed
+
+    @classmethod
+    def _rank_affected_accessories(cls, stored, changed):
+        """
+        (related ids of the re-ranked accessories, product id -> set of
+        accessory ids listed in its stored row) for refresh_group
+
+        The ranking is the same for every accessory, so one LIMIT query
+        re-ranks them all; rows only change when the top of it changes.
+        """
+        if changed is None:
+            product_ids = set(Accessory.objects.values_list('pk', flat=True))
+        else:
+            existing = set(Accessory.objects.filter(pk__in=changed).values_list('pk', flat=True))
+            product_ids = (set(stored) - changed) | existing
+        listed = {pk: set(stored.get(pk, ())) for pk in product_ids}
+        return cls.rank_accessories(cls.top_accessories(), cls.get_limit(), product_ids), listed
+
+    @classmethod
+    def rebuild_all(cls, progress=None):
+        """
+        Re-rank every group and drop the rows of brands without phones
+
+        Args:
+            progress: Optional callable receiving (product_type, group, stale)
+                      after each group, stale being the ids of the products
+                      whose cached details are out of date
+
+        Returns the number of products whose related products changed or
+        that list a product that did.
+        """
+        brands = Phone.objects.values_list('brand', flat=True).distinct()
+        phone_groups = sorted({cls.phone_group(brand) for brand in brands})
+        groups = [(RelatedProduct.PHONE, group) for group in phone_groups]
+        groups.append((RelatedProduct.ACCESSORY, ACCESSORY_GROUP))
+
+        total = 0
+        for product_type, group in groups:
+            stale = cls.refresh_group(product_type, group)
+            total += len(stale)
+            if progress is not None:
+                progress(product_type, group, stale)
+
+        RelatedProduct.objects.filter(product_type=RelatedProduct.PHONE).exclude(group__in=phone_groups).delete()
+        return total
+
+    @classmethod
+    def schedule_refresh(cls, product_type, product_id, *groups):
+        """
+        Refresh the rows a product change affects once the transaction commits
+
+        groups are the groups the product is in now and, for a phone that
+        changed brand, was in before. Products queued within one
+        transaction are refreshed together, one refresh_group per group,
+        then the cached details that went stale are invalidated. Outside a
+        transaction the refresh happens immediately; products queued in a
+        transaction that rolls back are dropped with it.
+        """
+        pending = {(product_type, group): {product_id} for group in groups if group}
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls.flush(pending)
+            return
+
+        # One dict per transaction, owned by its on_commit callback, as in
+        # InvalidationEngine.schedule
+        callback = getattr(cls._pending, 'callback', None)
+        if callback is None or not any(entry[1] is callback for entry in connection.run_on_commit):
+            pending_for_commit = {}
+            callback = partial(cls.flush, pending_for_commit)
+            callback.pending = pending_for_commit
+            cls._pending.callback = callback
+            transaction.on_commit(callback)
+        for group, product_ids in pending.items():
+            callback.pending.setdefault(group, set()).update(product_ids)
+
+    @classmethod
+    def flush(cls, pending):
+        """Refresh queued groups and invalidate stale details, logging instead of raising"""
+        from .cache_service import CacheService
+
+        tags = set()
+        for (product_type, group), product_ids in sorted(pending.items()):
+            try:
+                stale = cls.refresh_group(product_type, group, product_ids)
+                logger.debug(
+                    f"Refreshed related products of {len(product_ids)} {product_type} changes in group {group}, "
+                    f"{len(stale)} details stale"
+                )
+            except Exception as e:
+                logger.error(f"Error refreshing related products for {product_type} group {group}: {e}")
+                continue
+            tags.update(cls.product_tag(product_type, pk) for pk in stale)
+
+        if tags:
+            CacheService.schedule_invalidation(*tags)
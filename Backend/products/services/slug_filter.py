@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import math
+from django.conf import settings
+from .circuit_breaker import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Returns 1 if every bit is set, 0 if one is clear and -1 if the filter
+# has not been built yet.
+# KEYS: filter key, ARGV: bit offsets
+CHECK_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+for _, offset in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+# Sets bits in the live filter and in a rebuild in progress, but never
+# creates either: a partially filled filter would reject every slug it
+# was not told about.
+# KEYS: filter key, rebuild key, ARGV: bit offsets
+ADD_SCRIPT = """
+local updated = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for _, offset in ipairs(ARGV) do
+            redis.call('SETBIT', key, offset, 1)
+        end
+        updated = updated + 1
+    end
+end
+return updated
+"""
+
+
+class SlugFilter:
+    """
+    Bloom filter of every product slug, stored as a Redis bitmap
+
+    Lets detail views answer "no such product" for unknown slugs (typos,
+    crawlers probing dead links) without querying the database. A Bloom
+    filter has false positives but no false negatives, so a "might contain"
+    answer still goes to the database.
+
+    Slugs are added as products are saved; deleted slugs stay in the filter
+    until the next rebuild_slug_filter run. Until the filter has been built,
+    or whenever Redis errors, every slug is reported as possibly present.
+    Sized from CACHE_SETTINGS['SLUG_FILTER'] CAPACITY and ERROR_RATE.
+    """
+
+    @classmethod
+    def get_config(cls):
+        return getattr(settings, 'CACHE_SETTINGS', {}).get('SLUG_FILTER', {})
+
+    @classmethod
+    def is_enabled(cls):
+        return cls.get_config().get('ENABLED', True)
+
+    @classmethod
+    def get_size(cls):
+        """(bits, hashes) for the configured capacity and false positive rate"""
+        config = cls.get_config()
+        capacity = max(1, config.get('CAPACITY', 100000))
+        error_rate = config.get('ERROR_RATE', 0.01)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return bits, hashes
+
+    @classmethod
+    def get_key(cls):
+        # Resizing starts a new (unbuilt) filter instead of misreading the old one
+        bits, hashes = cls.get_size()
+        return f"bloom:slugs:{bits}:{hashes}"
+
+    @classmethod
+    def offsets(cls, slug):
+        """Bit offsets of a slug, by double hashing one 128-bit digest"""
+        bits, hashes = cls.get_size()
+        digest = hashlib.blake2b(slug.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % bits for i in range(hashes)]
+
+    @classmethod
+    def might_contain(cls, slug):
+        """False only if the slug is certainly not a product slug"""
+        if not cls.is_enabled():
+            return True
+        try:
+            redis_conn = get_redis_connection("default")
+            return redis_conn.eval(CHECK_SCRIPT, 1, cls.get_key(), *cls.offsets(slug)) != 0
+        except Exception as e:
+            logger.error(f"Error checking slug filter for {slug}: {e}")
+            return True
+
+    @classmethod
+    def add(cls, *slugs):
+        """Record new slugs, in the live filter and any rebuild in progress"""
+        slugs = [slug for slug in slugs if slug]
+        if not slugs or not cls.is_enabled():
+            return
+        key = cls.get_key()
+        try:
+            redis_conn = get_redis_connection("default")
+            offsets = sorted({offset for slug in slugs for offset in cls.offsets(slug)})
+            redis_conn.eval(ADD_SCRIPT, 2, key, f"{key}:rebuild", *offsets)
+        except Exception as e:
+            logger.error(f"Error adding {slugs} to slug filter: {e}")
+
+    @classmethod
+    def rebuild(cls, slugs, batch_size=1000):
+        """
+        Rebuild the filter from scratch and swap it in atomically
+
+        Args:
+            slugs: Iterable of every current slug. It is consumed only after
+                   the rebuild key exists, so slugs saved meanwhile are added
+                   to it by add() and not lost in the swap.
+            batch_size: Slugs per SETBIT pipeline
+
+        Returns:
+            Number of slugs added
+        """
+        bits, _ = cls.get_size()
+        key = cls.get_key()
+        rebuild_key = f"{key}:rebuild"
+        redis_conn = get_redis_connection("default")
+        redis_conn.delete(rebuild_key)
+        # Allocate the whole bitmap up front so add() sees the rebuild
+        redis_conn.setbit(rebuild_key, bits - 1, 0)
+
+        count = 0
+        pipe = redis_conn.pipeline(transaction=False)
+        for slug in slugs:
+            if not slug:
+                continue
+            for offset in cls.offsets(slug):
+                pipe.setbit(rebuild_key, offset, 1)
+            count += 1
+            if count % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+
+        redis_conn.rename(rebuild_key, key)
+        logger.info(f"Rebuilt slug filter with {count} slugs ({bits} bits)")
+        return count
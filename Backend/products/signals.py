@@ -1,44 +1,162 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 import logging
 
 from store.models import Phone, PhoneVariant, Accessory
+from promotions.models import FlashDeal
+from .models import ProductSlug, RelatedProduct
 from .services.cache_service import CacheService
+from .services.related_products import ACCESSORY_GROUP, RelatedProductService
+from .services.slug_filter import SlugFilter
 
 logger = logging.getLogger(__name__)
 
+# Tags are scheduled rather than invalidated inline: every tag touched in a
+# transaction (or request, see InvalidationBatchMiddleware) is deduplicated
+# and flushed to Redis once, after commit.
+
+
+def brand_tags(brand):
+    """
+    Brand tags affected by a change to one of the brand's phones
+    """
+    brand_lower = brand.lower()
+    tags = [f"brand:{brand_lower}"]
+
+    # Special handling for Apple products
+    if 'apple' in brand_lower:
+        tags.append("brand:apple")
+
+    return tags
+
+
+def collection_tags(instance):
+    """
+    Collection tags affected by a product or variant change
+    """
+    # Always invalidate collection pages when products change
+    tags = ["homepage"]
+
+    # Conditionally invalidate specific collections
+    if getattr(instance, 'is_new_arrival', False):
+        tags.append("new_arrivals")
+
+    if getattr(instance, 'is_best_seller', False):
+        tags.append("best_sellers")
+
+    return tags
+
+
+def remember_slug(slug):
+    """
+    Add a saved product's slug to the slug filter
+
+    The slug is added right away, before the negative cache entry for it is
+    invalidated on commit, and again after commit in case a filter rebuild
+    read the database before this transaction committed.
+    """
+    SlugFilter.add(slug)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: SlugFilter.add(slug))
+
+
+# Slug registry type of each product model
+PRODUCT_TYPES = {
+    Phone: ProductSlug.PHONE,
+    Accessory: ProductSlug.ACCESSORY,
+    FlashDeal: ProductSlug.FLASH_DEAL,
+}
+
+
+@receiver(post_save, sender=Phone)
+@receiver(post_save, sender=Accessory)
+@receiver(post_save, sender=FlashDeal)
+def register_product_slug(sender, instance, **kwargs):
+    """
+    Point the product's slug at it in the slug registry
+
+    A slug taken by a product in another table raises IntegrityError here,
+    failing the save (and rolling it back inside a transaction).
+    """
+    ProductSlug.register(PRODUCT_TYPES[sender], instance.pk, instance.slug)
+
+
+@receiver(post_delete, sender=Phone)
+@receiver(post_delete, sender=Accessory)
+@receiver(post_delete, sender=FlashDeal)
+def unregister_product_slug(sender, instance, **kwargs):
+    ProductSlug.unregister(PRODUCT_TYPES[sender], instance.pk)
+
+
+@receiver(post_save, sender=Phone)
+@receiver(post_save, sender=Accessory)
+@receiver(post_save, sender=FlashDeal)
+def remember_product_slug(sender, instance, **kwargs):
+    remember_slug(instance.slug)
+
+
+# Related products are refreshed after commit, before the entries listing
+# them are invalidated (see RelatedProductService)
+
+
+@receiver(post_init, sender=Phone)
+def track_phone_group(sender, instance, **kwargs):
+    """
+    Remember the brand group a phone was loaded with, so a save can tell
+    whether it left it without querying its related products row
+    """
+    # Read from __dict__ so a deferred brand is not loaded for every phone
+    brand = instance.__dict__.get('brand')
+    instance._related_group = RelatedProductService.phone_group(brand) if brand else None
+
+
+@receiver([post_save, post_delete], sender=Phone)
+def refresh_phone_related_products(sender, instance, **kwargs):
+    """
+    Refresh the phone's related products in its brand, and in the brand it
+    was loaded with if it changed
+    """
+    group = RelatedProductService.phone_group(instance.brand)
+    previous_group = getattr(instance, '_related_group', None)
+    if previous_group is None and not kwargs.get('created'):
+        # Loaded without its brand: fall back to the group its row was stored under
+        previous_group = RelatedProduct.objects.filter(
+            product_type=RelatedProduct.PHONE, product_id=instance.pk
+        ).values_list('group', flat=True).first()
+    RelatedProductService.schedule_refresh(
+        RelatedProduct.PHONE, instance.pk, group, previous_group if previous_group != group else None
+    )
+    instance._related_group = group
+
+
+@receiver([post_save, post_delete], sender=PhoneVariant)
+def refresh_variant_related_products(sender, instance, **kwargs):
+    if hasattr(instance, 'phone') and instance.phone:
+        RelatedProductService.schedule_refresh(
+            RelatedProduct.PHONE, instance.phone_id, RelatedProductService.phone_group(instance.phone.brand)
+        )
+
+
+@receiver([post_save, post_delete], sender=Accessory)
+def refresh_accessory_related_products(sender, instance, **kwargs):
+    RelatedProductService.schedule_refresh(RelatedProduct.ACCESSORY, instance.pk, ACCESSORY_GROUP)
+
 
 @receiver([post_save, post_delete], sender=Phone)
 def invalidate_phone_cache(sender, instance, **kwargs):
     """
     Invalidate cache when a phone is created, updated, or deleted
     """
-    logger.info(f"Invalidating cache for phone: {instance.slug}")
-    
-    # Tag-based invalidation for precise and comprehensive cache clearing
-    # Product-specific tags
-    CacheService.invalidate_by_tag(f"product:{instance.id}")
-    CacheService.invalidate_by_tag(f"product:{instance.slug}")
-    
-    # Brand-specific tags
-    brand_lower = instance.brand.lower()
-    CacheService.invalidate_by_tag(f"brand:{brand_lower}")
-    
-    # Always invalidate collection pages when products change
-    CacheService.invalidate_by_tag("homepage")
-    
-    # Conditionally invalidate specific collections
-    if hasattr(instance, 'is_new_arrival') and instance.is_new_arrival:
-        CacheService.invalidate_by_tag("new_arrivals")
-        
-    if hasattr(instance, 'is_best_seller') and instance.is_best_seller:
-        CacheService.invalidate_by_tag("best_sellers")
-    
-    # Special handling for Apple products
-    if 'apple' in brand_lower:
-        CacheService.invalidate_by_tag("brand:apple")
-    
-    logger.info(f"Successfully invalidated all caches for phone {instance.slug}")
+    logger.debug(f"Scheduling cache invalidation for phone: {instance.slug}")
+
+    CacheService.schedule_invalidation(
+        # Product-specific tags
+        *CacheService.product_tags('phone', instance.id, instance.slug),
+        # Brand-specific tags
+        *brand_tags(instance.brand),
+        *collection_tags(instance)
+    )
 
 
 @receiver([post_save, post_delete], sender=PhoneVariant)
@@ -47,31 +165,13 @@ def invalidate_variant_cache(sender, instance, **kwargs):
     Invalidate cache when a phone variant is created, updated, or deleted
     """
     if hasattr(instance, 'phone') and instance.phone:
-        logger.info(f"Invalidating cache for phone variant: {instance.phone.slug}")
-        
-        # Tag-based invalidation
-        CacheService.invalidate_by_tag(f"product:{instance.phone.id}")
-        CacheService.invalidate_by_tag(f"product:{instance.phone.slug}")
-        
-        # Brand-specific tags
-        brand_lower = instance.phone.brand.lower()
-        CacheService.invalidate_by_tag(f"brand:{brand_lower}")
-        
-        # Always invalidate homepage when variants change
-        CacheService.invalidate_by_tag("homepage")
-        
-        # Conditionally invalidate specific collections
-        if hasattr(instance, 'is_new_arrival') and instance.is_new_arrival:
-            CacheService.invalidate_by_tag("new_arrivals")
-            
-        if hasattr(instance, 'is_best_seller') and instance.is_best_seller:
-            CacheService.invalidate_by_tag("best_sellers")
-        
-        # Special handling for Apple products
-        if 'apple' in brand_lower:
-            CacheService.invalidate_by_tag("brand:apple")
-        
-        logger.info(f"Successfully invalidated all caches for phone variant {instance.id}")
+        logger.debug(f"Scheduling cache invalidation for phone variant: {instance.phone.slug}")
+
+        CacheService.schedule_invalidation(
+            *CacheService.product_tags('phone', instance.phone.id, instance.phone.slug),
+            *brand_tags(instance.phone.brand),
+            *collection_tags(instance)
+        )
 
 
 @receiver([post_save, post_delete], sender=Accessory)
@@ -79,20 +179,21 @@ def invalidate_accessory_cache(sender, instance, **kwargs):
     """
     Invalidate cache when an accessory is created, updated, or deleted
     """
-    logger.info(f"Invalidating cache for accessory: {instance.slug}")
-    
-    # Tag-based invalidation
-    CacheService.invalidate_by_tag(f"product:{instance.id}")
-    CacheService.invalidate_by_tag(f"product:{instance.slug}")
-    
-    # Always invalidate homepage for accessories
-    CacheService.invalidate_by_tag("homepage")
-    
-    # Conditionally invalidate specific collections
-    if hasattr(instance, 'is_new_arrival') and instance.is_new_arrival:
-        CacheService.invalidate_by_tag("new_arrivals")
-        
-    if hasattr(instance, 'is_best_seller') and instance.is_best_seller:
-        CacheService.invalidate_by_tag("best_sellers")
-    
-    logger.info(f"Successfully invalidated all caches for accessory {instance.slug}")
+    logger.debug(f"Scheduling cache invalidation for accessory: {instance.slug}")
+
+    CacheService.schedule_invalidation(
+        *CacheService.product_tags('accessory', instance.id, instance.slug),
+        *collection_tags(instance)
+    )
+
+
+@receiver([post_save, post_delete], sender=FlashDeal)
+def invalidate_flash_deal_cache(sender, instance, **kwargs):
+    """
+    Invalidate cache when a flash deal is created, updated, or deleted
+    """
+    logger.debug(f"Scheduling cache invalidation for flash deal: {instance.slug}")
+
+    CacheService.schedule_invalidation(
+        *CacheService.product_tags('flash_deal', instance.id, instance.slug)
+    )
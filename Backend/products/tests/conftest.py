@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from django.core.cache import cache
+from django.test import override_settings
+from products.services.cache_service import CacheService, GENERATION_READ_SCRIPT
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'ecom',
+    }
+}
+
+
+@pytest.fixture
+def no_cache_side_effects():
+    # Product saves would otherwise invalidate tags and update the slug filter in Redis
+    with patch.object(CacheService, 'schedule_invalidation'), patch('products.signals.remember_slug'):
+        yield
+
+
+@pytest.fixture
+def no_stripe(no_cache_side_effects):
+    with patch('store.models.stripe') as stripe:
+        stripe.Price.create.return_value.id = 'price_test'
+        yield stripe
+
+
+@pytest.fixture
+def local_cache():
+    with override_settings(CACHES=LOCMEM_CACHES):
+        cache.clear()
+        CacheService.clear_local_cache()
+        yield cache
+        cache.clear()
+        CacheService.clear_local_cache()
+
+
+@pytest.fixture
+def mock_redis():
+    with patch('products.services.cache_service.get_redis_connection') as mock_get_conn:
+        redis_conn = MagicMock()
+        # Namespace generation reads return one counter per key, bumps find no counters
+        redis_conn.eval.side_effect = (
+            lambda script, numkeys, *args: [b'0'] * numkeys if script == GENERATION_READ_SCRIPT else 0
+        )
+        mock_get_conn.return_value = redis_conn
+        yield redis_conn
@@ -0,0 +1,652 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from products.services.cache_service import CacheService, GENERATION_READ_SCRIPT
+from products.services.local_cache import LocalCache
+
+
+class TestCacheKeys:
+    def test_params_are_whitelisted_and_canonicalized(self):
+        from django.http import QueryDict
+
+        params = QueryDict('utm_source=mail&page=%2002&sort=price&sort=name&color=&fbclid=x')
+
+        assert CacheService.normalize_params(params) == {'page': '02', 'sort': 'name,price'}
+        assert CacheService.normalize_params(params, {'page': int}) == {'page': '2'}
+        assert CacheService.normalize_params(params, ()) == {}
+
+    def test_tracking_params_share_a_key_and_long_keys_are_hashed(self):
+        plain = CacheService.get_key('brand_products', 'apple')
+
+        assert CacheService.get_key('brand_products', 'apple', {'utm_campaign': 'x', 'refresh': '1'}) == plain
+        long_key = CacheService.get_key('product_detail', 'x' * 500)
+        assert long_key.startswith('ecom:v1:product_detail:~') and len(long_key) < 100
+
+
+class TestGetOrCompute:
+    def test_miss_builds_and_caches(self, local_cache, mock_redis):
+        """A miss runs the builder once and later calls are served from cache"""
+        mock_redis.lock.return_value.acquire.return_value = True
+        builder = MagicMock(return_value={'name': 'Test Phone'})
+
+        first = CacheService.get_or_compute('product_detail', 'test-phone', builder)
+        second = CacheService.get_or_compute('product_detail', 'test-phone', builder)
+
+        assert first == second == {'name': 'Test Phone'}
+        builder.assert_called_once()
+        mock_redis.lock.return_value.release.assert_called_once()
+
+    def test_none_result_is_not_cached(self, local_cache, mock_redis):
+        """Builders returning None (e.g. not found) are re-run on the next request"""
+        mock_redis.lock.return_value.acquire.return_value = True
+        builder = MagicMock(return_value=None)
+
+        assert CacheService.get_or_compute('product_detail', 'missing', builder) is None
+        assert CacheService.get_or_compute('product_detail', 'missing', builder) is None
+        assert builder.call_count == 2
+
+    def test_none_result_is_cached_with_negative_ttl(self, local_cache, mock_redis):
+        """Negative entries answer repeat lookups of unknown slugs without the builder"""
+        mock_redis.lock.return_value.acquire.return_value = True
+        builder = MagicMock(return_value=None)
+
+        for _ in range(2):
+            assert CacheService.get_or_compute(
+                'product_detail', 'missing', builder, negative_ttl=60, negative_tags=['product:missing']
+            ) is None
+
+        builder.assert_called_once()
+        tag_call = [c for c in mock_redis.eval.call_args_list if c[0][2] == 'tag:product:missing']
+        assert tag_call and tag_call[0][0][4] == pytest.approx(tag_call[0][0][5] + 60)
+
+    def test_waits_for_concurrent_fill(self, local_cache, mock_redis):
+        """Workers that lose the lock wait for the winner's value instead of building"""
+        mock_redis.lock.return_value.acquire.return_value = False
+        builder = MagicMock(return_value={'fresh': True})
+
+        def fill_during_wait(seconds):
+            CacheService.set('homepage', 'data', {'fresh': False})
+
+        with patch('products.services.cache_service.time.sleep', side_effect=fill_during_wait):
+            data = CacheService.get_or_compute('homepage', 'data', builder, wait_timeout=1)
+
+        assert data == {'fresh': False}
+        builder.assert_not_called()
+
+    def test_builds_locally_after_wait_timeout(self, local_cache, mock_redis):
+        """If the lock holder never fills the key, the waiter builds it itself"""
+        mock_redis.lock.return_value.acquire.return_value = False
+        builder = MagicMock(return_value={'fresh': True})
+
+        data = CacheService.get_or_compute('homepage', 'data', builder, wait_timeout=0)
+
+        assert data == {'fresh': True}
+        builder.assert_called_once()
+
+    def test_refresh_skips_cached_value(self, local_cache, mock_redis):
+        """refresh=True rebuilds even when a value is cached"""
+        mock_redis.lock.return_value.acquire.return_value = True
+        CacheService.set('homepage', 'data', {'fresh': False})
+
+        data = CacheService.get_or_compute(
+            'homepage', 'data', lambda: {'fresh': True}, refresh=True
+        )
+
+        assert data == {'fresh': True}
+        assert CacheService.get('homepage', 'data') == {'fresh': True}
+
+
+    def test_many_reads_once_and_builds_misses_together(self, local_cache, mock_redis):
+        """Cached items come from one get_many, the misses from one builder call"""
+        CacheService.set('product_detail', 'cached', {'slug': 'cached'})
+        builder = MagicMock(side_effect=lambda slugs: {slug: {'slug': slug} for slug in slugs if slug != 'missing'})
+
+        with patch.object(local_cache, 'get_many', wraps=local_cache.get_many) as get_many:
+            data = CacheService.get_many_or_compute(
+                'product_detail', ['built', 'cached', 'missing'], builder, negative_ttl=60,
+                negative_tags=lambda slug: [f'product:{slug}']
+            )
+
+        assert data == {'built': {'slug': 'built'}, 'cached': {'slug': 'cached'}, 'missing': None}
+        get_many.assert_called_once()
+        builder.assert_called_once_with(['built', 'missing'])
+
+        # Built items and the negative entry are served from cache next time
+        again = CacheService.get_many_or_compute('product_detail', ['built', 'missing'], builder, negative_ttl=60)
+        assert again == {'built': {'slug': 'built'}, 'missing': None}
+        builder.assert_called_once()
+
+class TestLocalCache:
+    def test_evicts_least_recently_used(self):
+        local_cache = LocalCache(max_entries=2, default_ttl=60)
+        local_cache.set('a', 1)
+        local_cache.set('b', 2)
+        local_cache.get('a')
+        local_cache.set('c', 3)
+
+        assert local_cache.get('a') == (True, 1)
+        assert local_cache.get('b') == (False, None)
+        assert local_cache.get('c') == (True, 3)
+
+    def test_ttl_is_capped_by_default_ttl(self):
+        local_cache = LocalCache(max_entries=10, default_ttl=0)
+        local_cache.set('a', 1, ttl=600)
+
+        assert local_cache.get('a') == (False, None)
+
+    def test_delete_pattern(self):
+        local_cache = LocalCache()
+        local_cache.set('ecom:v1:brand_products:apple', 1)
+        local_cache.set('ecom:v1:homepage:data', 2)
+        local_cache.delete_pattern('*brand_products*')
+
+        assert local_cache.get('ecom:v1:brand_products:apple') == (False, None)
+        assert local_cache.get('ecom:v1:homepage:data') == (True, 2)
+
+
+class TestL1Tier:
+    def test_l1_serves_repeat_reads(self, local_cache, mock_redis):
+        """Once read from Redis, a value is served from the L1 tier"""
+        CacheService.set('homepage', 'data', {'fresh': True})
+        key = CacheService.get_key('homepage', 'data')
+        local_cache.delete(key)  # Only the L1 copy remains
+
+        assert CacheService.get('homepage', 'data') == {'fresh': True}
+
+    def test_tag_invalidation_evicts_l1_and_publishes(self, local_cache, mock_redis):
+        """invalidate_by_tag evicts local copies and broadcasts the keys"""
+        key = CacheService.get_key('homepage', 'data')
+        CacheService.set('homepage', 'data', {'fresh': True})
+        mock_redis.zrangebyscore.return_value = [key.encode('utf-8')]
+        mock_redis.unlink.return_value = 1
+
+        with patch('products.services.local_cache.get_redis_connection', return_value=mock_redis), \
+                patch('products.services.invalidation.get_redis_connection', return_value=mock_redis):
+            deleted = CacheService.invalidate_by_tag('homepage')
+
+        assert deleted == 1
+        mock_redis.unlink.assert_called_once_with(cache.make_key(key))
+        mock_redis.delete.assert_called_once_with('tag:homepage')
+        mock_redis.publish.assert_called_once()
+        assert CacheService.get_local_cache().get(key) == (False, None)
+
+
+class TestInvalidationEngine:
+    def test_pattern_invalidation_unlinks_in_batches(self, local_cache, mock_redis):
+        """SCAN results are unlinked in batches no larger than batch_size"""
+        from products.services.invalidation import InvalidationEngine
+
+        mock_redis.scan_iter.return_value = iter([b'k1', b'k2', b'k3', b'k4', b'k5'])
+        mock_redis.unlink.side_effect = lambda *keys: len(keys)
+        progress = MagicMock()
+
+        with patch('products.services.local_cache.get_redis_connection', return_value=mock_redis), \
+                patch('products.services.invalidation.get_redis_connection', return_value=mock_redis):
+            deleted = InvalidationEngine(batch_size=2, progress=progress).invalidate_pattern('ecom:*brand*')
+
+        assert deleted == 5
+        assert [len(c[0]) for c in mock_redis.unlink.call_args_list] == [2, 2, 1]
+        assert progress.call_count == 3
+        mock_redis.keys.assert_not_called()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_scheduled_tags_are_coalesced_into_one_flush(self):
+        """Tags scheduled inside a batch are deduplicated and flushed once"""
+        from products.services.invalidation import InvalidationEngine
+
+        with patch.object(InvalidationEngine, 'invalidate_tags', return_value=0) as invalidate_tags:
+            with CacheService.invalidation_batch():
+                for _ in range(3):
+                    CacheService.schedule_invalidation('homepage', 'brand:apple')
+                invalidate_tags.assert_not_called()
+
+        invalidate_tags.assert_called_once_with({'homepage', 'brand:apple'})
+
+    def test_tag_invalidation_purges_surrogate_keys(self, local_cache, mock_redis):
+        """Invalidated tags are purged from the HTTP cache tier, percent-encoded"""
+        from products.services.invalidation import InvalidationEngine
+        from products.services.purge import MemoryPurgeBackend, purge_tags
+
+        MemoryPurgeBackend.reset()
+        mock_redis.pipeline.return_value.execute.side_effect = [[[], []], [0]]
+        purge_settings = dict(settings.CACHE_SETTINGS, PURGE_BACKEND={
+            'BACKEND': 'products.services.purge.MemoryPurgeBackend'
+        })
+
+        with override_settings(CACHE_SETTINGS=purge_settings), \
+                patch('products.services.invalidation.get_redis_connection', return_value=mock_redis), \
+                patch('products.services.invalidation.purge_tags', wraps=purge_tags) as purge:
+            InvalidationEngine().invalidate_tags(['brand:test brand', 'homepage'])
+            # The purge runs on the background pool, which handles one task at a time
+            InvalidationEngine().submit('purge', []).result()
+
+        assert purge.call_args_list[0].args == (['brand:test brand', 'homepage'],)
+        assert MemoryPurgeBackend.purged == ['brand:test%20brand', 'homepage']
+
+    def test_failed_purges_are_retried(self):
+        from products.services.invalidation import InvalidationEngine
+        from products.services.purge import MemoryPurgeBackend
+
+        MemoryPurgeBackend.reset()
+        purge_settings = dict(settings.CACHE_SETTINGS, PURGE_BACKEND={
+            'BACKEND': 'products.services.purge.MemoryPurgeBackend'
+        })
+
+        with override_settings(CACHE_SETTINGS=purge_settings), \
+                patch.object(InvalidationEngine, '_schedule_purge_retry') as schedule_retry, \
+                patch.object(MemoryPurgeBackend, 'purge', autospec=True,
+                             side_effect=[OSError('CDN timeout'), None]) as backend_purge:
+            InvalidationEngine().purge(['phone:1'])
+            schedule_retry.assert_called_once()
+
+            # The failed key goes out with the next purge
+            InvalidationEngine().purge(['phone:2'])
+
+        assert backend_purge.call_args_list[1].args[1] == ['phone:1', 'phone:2']
+
+
+class TestNamespaceGenerations:
+    def test_bump_moves_namespaced_entries_to_new_keys(self, local_cache, mock_redis):
+        """Bumping a namespace hides its entries without touching other namespaces"""
+        counters = {}
+
+        def run_script(script, numkeys, *args):
+            if script == GENERATION_READ_SCRIPT:
+                return [counters.setdefault(key, 1000) for key in args[:numkeys]]
+            for key in args[:numkeys]:
+                if key in counters:
+                    counters[key] += 1
+            return numkeys
+
+        mock_redis.eval.side_effect = run_script
+        CacheService.set('brand_products', 'apple', ['iphone'], namespaces=['brand:apple', 'brand_products'])
+        CacheService.set('brand_products', 'samsung', ['galaxy'], namespaces=['brand:samsung', 'brand_products'])
+
+        CacheService.bump_generations(['brand:apple'])
+
+        assert CacheService.get('brand_products', 'apple', namespaces=['brand:apple', 'brand_products']) is None
+        assert CacheService.get('brand_products', 'samsung', namespaces=['brand:samsung', 'brand_products']) == ['galaxy']
+        assert counters == {'gen:brand:apple': 1001, 'gen:brand:samsung': 1000, 'gen:brand_products': 1000}
+
+
+    def test_clear_brand_cache_reports_the_bump(self, mock_redis):
+        """The command reports each brand's generation change, not a key count"""
+        counters = {'gen:brand:apple': b'1000'}
+        mock_redis.mget.side_effect = lambda keys: [counters.get(key) for key in keys]
+
+        def invalidate_tag(tag):
+            counters[f'gen:{tag}'] = b'1700000000000'
+
+        out = StringIO()
+        with patch('products.cache_utils.cache', MagicMock()), \
+                patch('products.cache_utils.InvalidationEngine') as engine:
+            engine.return_value.invalidate_tag.side_effect = invalidate_tag
+            call_command('clear_brand_cache', '--brand', 'Apple', stdout=out)
+
+        engine.return_value.invalidate_tag.assert_called_once_with('brand:apple')
+        assert 'brand:apple: generation 1000 -> 1700000000000' in out.getvalue()
+        assert 'Successfully invalidated the cache of 1 brands' in out.getvalue()
+        assert 'keys' not in out.getvalue()
+
+
+class TestSlugFilter:
+    def test_unknown_slug_is_rejected_without_queries(self, mock_redis):
+        """A clear bit in the filter means the product lookup never reaches the database"""
+        from products.views import ProductDetailView
+
+        mock_redis.eval.side_effect = None
+        mock_redis.eval.return_value = 0
+        with patch('products.services.slug_filter.get_redis_connection', return_value=mock_redis), \
+                patch('products.views.Phone') as phone_model:
+            assert ProductDetailView().build_product_data(None, 'no-such-phone') is None
+
+        phone_model.objects.prefetch_related.assert_not_called()
+
+    def test_missing_filter_or_redis_error_fails_open(self, mock_redis):
+        from products.services.slug_filter import SlugFilter
+
+        mock_redis.eval.side_effect = None
+        mock_redis.eval.return_value = -1
+        with patch('products.services.slug_filter.get_redis_connection', return_value=mock_redis):
+            assert SlugFilter.might_contain('iphone-15')
+            mock_redis.eval.side_effect = ConnectionError
+            assert SlugFilter.might_contain('iphone-15')
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_probes_after_cool_down(self):
+        from products.services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        with patch('products.services.circuit_breaker.time.monotonic', return_value=breaker.opened_at + 31):
+            assert breaker.allow()
+            assert not breaker.allow()
+        breaker.record_success()
+
+        assert breaker.is_closed() and breaker.allow()
+
+    def test_backend_falls_back_to_local_memory_when_redis_is_down(self):
+        """Connection errors trip the breaker and calls are answered from process memory"""
+        from products.services.cache_backend import CircuitBreakerRedisCache
+        from products.services.circuit_breaker import CircuitBreaker
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        backend = CircuitBreakerRedisCache('redis://127.0.0.1:1/0', {
+            'KEY_PREFIX': 'test-breaker',
+            'OPTIONS': {
+                'CONNECTION_POOL_CLASS': 'products.services.circuit_breaker.CircuitBreakerConnectionPool',
+                'SOCKET_CONNECT_TIMEOUT': 0.1,
+                'SOCKET_TIMEOUT': 0.1,
+            },
+        })
+
+        with patch('products.services.circuit_breaker._breaker', breaker):
+            backend.set('session', {'user': 1})
+            assert breaker.state == CircuitBreaker.OPEN
+            with patch('django_redis.cache.RedisCache.get') as redis_get:
+                assert backend.get('session') == {'user': 1}
+                redis_get.assert_not_called()
+        backend._fallback.clear()
+
+
+class TestCacheCodec:
+    def test_round_trip_with_compression(self):
+        """Large JSON payloads are compressed and decode to the same data"""
+        from products.services.codec import CacheCodec
+
+        value = {'results': [{'name': f'Phone {i}', 'price': '999.00'} for i in range(100)]}
+        encoded, serialized_size = CacheCodec(compress_min_bytes=1024).encode(value)
+
+        assert encoded[:5] == b'EC1jz'
+        assert len(encoded) < serialized_size
+        assert CacheCodec.decode(encoded) == value
+
+    def test_bytes_fall_back_to_pickle(self):
+        from products.services.codec import CacheCodec
+
+        value = {'payload': b'\x00\x01', 'status': 200}
+        encoded, _ = CacheCodec().encode(value)
+
+        assert encoded[:5] == b'EC1p-'
+        assert CacheCodec.decode(encoded) == value
+
+    def test_legacy_values_are_returned_unchanged(self):
+        from products.services.codec import CacheCodec
+
+        assert CacheCodec.decode({'name': 'Test Phone'}) == {'name': 'Test Phone'}
+
+
+class TestCacheMetrics:
+    def test_lookups_are_counted_per_prefix_and_view(self, local_cache, mock_redis):
+        """Hits and misses are attributed to the view set in the context variable"""
+        from products.services.metrics import CacheMetrics, current_view
+
+        CacheMetrics.reset()
+        CacheService.set('homepage', 'data', {'fresh': True})
+        CacheService.clear_local_cache()
+
+        token = current_view.set('homepage')
+        try:
+            CacheService.get('homepage', 'data')
+            CacheService.get('homepage', 'missing')
+        finally:
+            current_view.reset(token)
+
+        lookups = CacheMetrics.snapshot()['lookups']
+        assert lookups[('homepage', 'homepage', 'redis')]['hits'] == 1
+        assert lookups[('homepage', 'homepage', 'redis')]['misses'] == 1
+        assert lookups[('homepage', 'homepage', 'redis')]['bytes'] > 0
+
+        text = CacheMetrics.render_prometheus()
+        assert 'cache_lookups_total{prefix="homepage",view="homepage",tier="redis",result="hit"} 1' in text
+        assert '# TYPE cache_writes_total counter' in text
+
+    def test_distinct_keys_are_sampled_by_hash(self, local_cache, mock_redis):
+        """Only a stable 1-in-N sample of keys costs the HyperLogLog round trip"""
+        pfadd = mock_redis.pipeline.return_value.pfadd
+        sampled_settings = {**settings.CACHE_SETTINGS, 'KEY_CARDINALITY_SAMPLING': 16}
+
+        with override_settings(CACHE_SETTINGS=sampled_settings):
+            for i in range(640):
+                CacheService.set('product_detail', f'phone-{i}', {'id': i})
+            sampled = {call.args[1] for call in pfadd.call_args_list}
+            assert 10 < len(sampled) < 80
+
+            # Rewriting the same keys never changes which ones are counted
+            for i in range(640):
+                CacheService.set('product_detail', f'phone-{i}', {'id': i})
+            assert {call.args[1] for call in pfadd.call_args_list} == sampled
+
+            mock_redis.smembers.return_value = {b'product_detail'}
+            mock_redis.pipeline.return_value.execute.return_value = [len(sampled)]
+            assert CacheService.get_key_cardinality() == {'product_detail': len(sampled) * 16}
+
+    def test_endpoint_needs_staff_or_scrape_token(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from products.views import CacheMetricsView
+
+        factory = APIRequestFactory()
+        view = CacheMetricsView.as_view()
+        staff_request = factory.get('/metrics/cache/')
+        force_authenticate(staff_request, user=MagicMock(is_staff=True))
+
+        with override_settings(CACHE_SETTINGS={**settings.CACHE_SETTINGS, 'METRICS_SCRAPE_TOKEN': 's3cret'}), \
+                patch.object(CacheService, 'get_prometheus_metrics', return_value='') as metrics:
+            assert view(factory.get('/metrics/cache/')).status_code == 403
+            assert view(factory.get('/metrics/cache/', HTTP_AUTHORIZATION='Bearer wrong')).status_code == 403
+            assert view(factory.get('/metrics/cache/', HTTP_AUTHORIZATION='Bearer s3cret')).status_code == 200
+            assert view(staff_request).status_code == 200
+
+        # Denied requests never reach Redis
+        assert metrics.call_count == 2
+
+        with override_settings(CACHE_SETTINGS={**settings.CACHE_SETTINGS, 'METRICS_SCRAPE_TOKEN': ''}):
+            assert view(factory.get('/metrics/cache/', HTTP_AUTHORIZATION='Bearer ')).status_code == 403
+
+
+class TestTagRegistry:
+    def test_tags_are_scored_by_hard_expiry(self, local_cache, mock_redis):
+        """Tag membership carries the entry's expiry, including the stale window"""
+        with patch('products.services.cache_service.time.time', return_value=1000.0):
+            CacheService.set('brand_products', 'apple', ['cached'], timeout=60,
+                             tags=['brand:apple', 'brand_products'], stale_ttl=30)
+
+        args = mock_redis.eval.call_args[0]
+        key = CacheService.get_key('brand_products', 'apple')
+        assert args[1:] == (2, 'tag:brand:apple', 'tag:brand_products', key, 1090.0, 1000.0)
+
+
+class TestKeyCensus:
+    def test_sample_is_described_per_prefix(self, local_cache, mock_redis):
+        """Sizes and TTLs are grouped by key prefix; keys gone since the scan are skipped"""
+        mock_redis.scan.side_effect = [
+            (0, [b'ecom:1:ecom:v1:brand_products:apple', b'ecom:1:ecom:v1:brand_products:samsung',
+                 b'ecom:1:ecom:v1:homepage:data', b'ecom:1:ecom:v1:homepage:old']),
+            (0, [b'tag:homepage']),
+        ]
+        mock_redis.pipeline.return_value.execute.side_effect = [
+            [100, 30000, 300, 500000, 50, -1, 0, -2],
+            [b'zset'],
+            [3, 128],
+        ]
+
+        census = CacheService.get_key_census(sample_size=10, tag_sample_size=10)
+
+        brand = census['prefixes']['brand_products']
+        assert (brand['keys'], brand['total_bytes'], brand['p50_bytes'], brand['max_bytes']) == (2, 400, 100, 300)
+        assert brand['ttl']['<60s'] == 1 and brand['ttl']['<900s'] == 1
+        assert census['prefixes']['homepage']['ttl']['none'] == 1
+        assert census['tags'] == {'homepage': {'members': 3, 'bytes': 128}}
+        assert census['complete']
+
+    def test_scan_stops_at_sample_size(self, local_cache, mock_redis):
+        """Sampling never walks past its bound, and says so"""
+        mock_redis.scan.return_value = (42, [f'ecom:1:ecom:v1:homepage:{i}'.encode() for i in range(5)])
+        mock_redis.pipeline.return_value.execute.return_value = [10, 1000] * 5
+
+        census = CacheService.get_key_census(sample_size=5, tag_sample_size=5)
+
+        assert mock_redis.scan.call_count == 2
+        assert census['sampled_keys'] == 5
+        assert not census['complete']
+
+
+class TestStaleWhileRevalidate:
+    def test_fresh_entry_is_served_without_rebuild(self, local_cache, mock_redis):
+        CacheService.set('brand_products', 'apple', ['cached'], timeout=60, stale_ttl=30)
+        builder = MagicMock(return_value=['rebuilt'])
+
+        data = CacheService.get_or_compute('brand_products', 'apple', builder, stale_ttl=30)
+
+        assert data == ['cached']
+        builder.assert_not_called()
+
+    def test_stale_entry_is_served_and_rebuilt_in_background(self, local_cache, mock_redis):
+        """After the soft expiry the old value is returned and rebuilt off-thread"""
+        mock_redis.lock.return_value.acquire.return_value = True
+        CacheService.set('brand_products', 'apple', ['stale'], timeout=0, stale_ttl=30)
+        builder = MagicMock(return_value=['rebuilt'])
+
+        with patch.object(CacheService, '_schedule_revalidation') as schedule:
+            data = CacheService.get_or_compute('brand_products', 'apple', builder, stale_ttl=30)
+
+        assert data == ['stale']
+        builder.assert_not_called()
+        key, fill, _ = schedule.call_args[0]
+        CacheService._revalidate(key, fill)
+
+        builder.assert_called_once()
+        assert CacheService.get('brand_products', 'apple') == ['rebuilt']
+
+
+class TestRenderedResponseCache:
+    def test_rendered_entries_are_stored_as_json(self, local_cache, mock_redis):
+        """Rendered bodies are stored as text, so the hottest entries skip the pickle fallback"""
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        request = APIRequestFactory().get('/api/homepage/', HTTP_ACCEPT='application/json')
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': ['Café']}):
+            first = HomePageAPIView.as_view()(request)
+            first.render()
+            CacheService.clear_local_cache()
+            second = HomePageAPIView.as_view()(request)
+
+        key = CacheService.get_key(*HomePageAPIView().get_rendered_cache_key_parts(request))
+        assert local_cache.get(key)[:4] == b'EC1j'
+        assert second.content == first.content
+
+    def test_hit_returns_stored_bytes_without_rendering(self, local_cache, mock_redis):
+        """The second request is answered from the rendered cache, skipping DRF"""
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        factory = APIRequestFactory()
+        view = HomePageAPIView.as_view()
+
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': []}):
+            first = view(factory.get('/api/homepage/', HTTP_ACCEPT='application/json'))
+            first.render()
+            with patch.object(JSONRenderer, 'render') as render:
+                second = view(factory.get('/api/homepage/', HTTP_ACCEPT='application/json'))
+                render.assert_not_called()
+
+        assert second.status_code == 200
+        assert second.content == first.content
+        assert second['Content-Type'] == first['Content-Type']
+
+    def test_matching_etag_gets_304_from_cache(self, local_cache, mock_redis):
+        """If-None-Match with the cached ETag is answered without rebuilding"""
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        factory = APIRequestFactory()
+        view = HomePageAPIView.as_view()
+
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': []}) as build:
+            first = view(factory.get('/api/homepage/', HTTP_ACCEPT='application/json'))
+            second = view(factory.get('/api/homepage/', HTTP_ACCEPT='application/json',
+                                      HTTP_IF_NONE_MATCH=first['ETag']))
+
+        assert first['ETag'] and first['Last-Modified']
+        assert second.status_code == 304
+        assert second['ETag'] == first['ETag']
+        build.assert_called_once()
+
+    def test_cacheable_response_carries_surrogate_headers(self, local_cache, mock_redis):
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': []}):
+            response = HomePageAPIView.as_view()(APIRequestFactory().get('/api/homepage/', HTTP_ACCEPT='application/json'))
+
+        assert response['Surrogate-Key'] == 'homepage new_arrivals best_sellers'
+        assert response['Surrogate-Control'] == 'max-age=300'
+        assert response['Cache-Control'] == 'public, max-age=0, s-maxage=300'
+
+    def test_unreadable_entry_is_treated_as_a_miss(self, local_cache, mock_redis):
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': []}) as build, \
+                patch.object(CacheService, 'get_by_key', side_effect=ValueError('Unknown cache codec header')):
+            response = HomePageAPIView.as_view()(APIRequestFactory().get('/api/homepage/', HTTP_ACCEPT='application/json'))
+
+        assert response.status_code == 200
+        build.assert_called_once()
+
+    def test_response_from_stale_data_is_not_stored(self, local_cache, mock_redis):
+        """A render of stale data must not outlive the background rebuild"""
+        from rest_framework.test import APIRequestFactory
+        from store.views import HomePageAPIView
+
+        namespaces = ['homepage', 'new_arrivals', 'best_sellers']
+        CacheService.set('homepage', 'data', {'featured_phones': ['stale']}, timeout=0, stale_ttl=60,
+                         namespaces=namespaces)
+
+        with patch.object(CacheService, '_schedule_revalidation'):
+            response = HomePageAPIView.as_view()(APIRequestFactory().get('/api/homepage/', HTTP_ACCEPT='application/json'))
+
+        assert response.status_code == 200
+        assert CacheService.get('homepage_rendered', 'data', namespaces=namespaces) is None
+
+
+class TestAsyncViews:
+    def test_hit_is_served_without_the_sync_view(self, local_cache, mock_redis):
+        """The async front answers hits itself and hands misses to the sync view once"""
+        from asgiref.sync import async_to_sync
+        from django.test import RequestFactory
+        from store.views import AsyncHomePageView, HomePageAPIView
+
+        mock_redis.lock.return_value.acquire.return_value = True
+        view = AsyncHomePageView.as_view()
+        request = lambda: RequestFactory().get('/api/homepage/', HTTP_ACCEPT='application/json')
+
+        with patch.object(HomePageAPIView, 'build_homepage_data', return_value={'featured_phones': []}), \
+                patch.object(CacheService, 'get_by_key', wraps=CacheService.get_by_key) as get_by_key:
+            first = async_to_sync(view)(request())
+            # The miss was already checked by the async front
+            get_by_key.assert_not_called()
+
+        with patch.object(AsyncHomePageView, 'get_sync_view') as get_sync_view:
+            second = async_to_sync(view)(request())
+            get_sync_view.assert_not_called()
+
+        assert first.status_code == second.status_code == 200
+        assert second.content == first.content
+        assert second['ETag'] == first['ETag']
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import patch
+from django.db import IntegrityError, transaction
+from products.models import ProductSlug
+from store.models import Accessory
+
+
+@pytest.mark.django_db
+class TestProductSlug:
+    def test_registry_follows_saves_and_deletes(self, no_cache_side_effects):
+        accessory = Accessory.objects.create(name="Leather Case", price=10, stock=2, stripe_id="prod_test")
+        assert ProductSlug.resolve('leather-case') == ('accessory', accessory.id)
+
+        accessory.slug = 'leather-case-v2'
+        accessory.save()
+        assert ProductSlug.resolve('leather-case') is None
+        assert ProductSlug.resolve('leather-case-v2') == ('accessory', accessory.id)
+
+        accessory.delete()
+        assert not ProductSlug.objects.exists()
+
+    def test_slugs_are_unique_across_product_tables(self, no_cache_side_effects):
+        ProductSlug.register(ProductSlug.FLASH_DEAL, 1, 'leather-case')
+
+        # Generated slugs skip slugs taken in other tables
+        assert Accessory.objects.create(name="Leather Case", price=10, stock=2, stripe_id="prod_a").slug == 'leather-case-1'
+
+        with pytest.raises(IntegrityError):
+            with transaction.atomic():
+                Accessory.objects.create(name="Case", slug='leather-case', price=10, stock=2, stripe_id="prod_b")
+        assert not Accessory.objects.filter(slug='leather-case').exists()
+
+    def test_detail_is_one_lookup_and_one_fetch(self, no_cache_side_effects, django_assert_num_queries):
+        from rest_framework.test import APIRequestFactory
+        from products.views import ProductDetailView
+
+        Accessory.objects.create(name="Leather Case", price=10, stock=2, stripe_id="prod_test")
+        request = APIRequestFactory().get('/products/leather-case/')
+
+        with patch('products.services.slug_filter.SlugFilter.might_contain', return_value=True):
+            with django_assert_num_queries(2):
+                data = ProductDetailView().build_product_data(request, 'leather-case')
+            with django_assert_num_queries(1):
+                assert ProductDetailView().build_product_data(request, 'unknown') is None
+
+        assert data['type'] == 'accessory'
+        assert data['slug'] == 'leather-case'
+
+    def test_batch_is_one_lookup_and_one_fetch_per_type(self, no_cache_side_effects, django_assert_num_queries):
+        from rest_framework.test import APIRequestFactory
+        from products.views import ProductBatchView
+
+        for name in ("Leather Case", "Charger"):
+            Accessory.objects.create(name=name, price=10, stock=2, stripe_id="prod_test")
+        request = APIRequestFactory().get('/products/batch/')
+
+        with patch('products.services.slug_filter.SlugFilter.might_contain', return_value=True):
+            with django_assert_num_queries(2):
+                data = ProductBatchView().build_products_data(request, ['charger', 'unknown', 'leather-case'])
+
+        assert sorted(data) == ['charger', 'leather-case']
+        assert data['charger']['type'] == 'accessory'
+
+    def test_backfill_renames_colliding_slugs(self, no_stripe):
+        from importlib import import_module
+        from django.apps import apps
+        from store.models import Phone
+
+        backfill = import_module('products.migrations.0002_backfill_product_slugs').backfill_product_slugs
+        phone = Phone.objects.create(name="Case", brand="Acme", stripe_id="prod_phone")
+        accessory = Accessory.objects.create(name="Acme Case", price=10, stock=2, stripe_id="prod_a")
+        Accessory.objects.create(name="Acme Case Accessory 1", price=10, stock=2, stripe_id="prod_b")
+        # Tables as they were before the registry, with a slug in two of them
+        ProductSlug.objects.all().delete()
+        Accessory.objects.filter(pk=accessory.pk).update(slug=phone.slug)
+
+        backfill(apps, None)
+
+        accessory.refresh_from_db()
+        assert ProductSlug.resolve('acme-case') == ('phone', phone.id)
+        assert accessory.slug == 'acme-case-accessory-2'
+        assert ProductSlug.resolve('acme-case-accessory-2') == ('accessory', accessory.id)
+        # The renamed product saves again without a registry conflict
+        accessory.save()
@@ -0,0 +1,135 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from products.models import RelatedProduct
+from products.services.cache_service import CacheService
+from products.services.related_products import RelatedProductService
+from store.models import Accessory, Phone, PhoneVariant
+from store.services.product_service import ProductService
+
+
+@pytest.fixture
+def create_phone(no_stripe):
+    def create(name, brand, *prices):
+        phone = Phone.objects.create(name=name, brand=brand, stripe_id="prod_test")
+        for price in prices:
+            PhoneVariant.objects.create(phone=phone, color=f"Color {price}", storage="128GB", price=price, stock=5)
+        return phone
+    return create
+
+
+def variant_phones(related_ids):
+    variants = PhoneVariant.objects.in_bulk(related_ids)
+    return [variants[pk].phone.name for pk in related_ids]
+
+
+@pytest.mark.django_db
+class TestRelatedProducts:
+    def test_phones_are_ranked_by_price_within_their_brand(self, create_phone, django_assert_num_queries):
+        s24 = create_phone("S24", "Samsung", 799, 899)
+        create_phone("S24 Ultra", "Samsung", 1299)
+        create_phone("A55", "Samsung", 449)
+        create_phone("iPhone 15", "Apple", 799)
+
+        assert RelatedProductService.rebuild_all() == 4
+        related_ids = RelatedProduct.get_related_ids('phone', s24.id)
+        assert variant_phones(related_ids) == ['A55', 'S24 Ultra']
+
+        # The detail path reads the stored ranking instead of recomputing it
+        with django_assert_num_queries(4):
+            data = ProductService.get_phone_details_by_slug(s24.slug)
+            assert [variant.phone.name for variant in data['related_products']] == ['A55', 'S24 Ultra']
+
+    def test_a_change_only_rewrites_the_rows_it_affects(self, create_phone, settings):
+        settings.RELATED_PRODUCTS_LIMIT = 1
+        phones = {price: create_phone(f"Phone {price}", "Samsung", price) for price in (100, 200, 400, 800, 1600)}
+        RelatedProductService.rebuild_all()
+        rows = dict(RelatedProduct.objects.values_list('product_id', 'pk'))
+
+        # 1600 -> 850 moves into the list of the 800 phone and nobody else's
+        PhoneVariant.objects.filter(phone=phones[1600]).update(price=850)
+        stale = RelatedProductService.refresh_group('phone', 'samsung', {phones[1600].id})
+
+        assert stale == {phones[800].id}
+        assert variant_phones(RelatedProduct.get_related_ids('phone', phones[800].id)) == ['Phone 1600']
+        assert variant_phones(RelatedProduct.get_related_ids('phone', phones[1600].id)) == ['Phone 800']
+        rewritten = {
+            product_id for product_id, pk in RelatedProduct.objects.values_list('product_id', 'pk')
+            if rows[product_id] != pk
+        }
+        assert rewritten == {phones[800].id}
+
+        # A change that moves no list still invalidates the details listing it
+        phones[100].name = "Phone 100 Pro"
+        phones[100].save()
+        assert RelatedProductService.refresh_group('phone', 'samsung', {phones[100].id}) == {phones[200].id}
+
+    def test_missing_row_is_ranked_once_and_stored(self, create_phone, django_assert_num_queries):
+        s24 = create_phone("S24", "Samsung", 799)
+        create_phone("A55", "Samsung", 449)
+        RelatedProduct.objects.all().delete()
+
+        assert variant_phones(RelatedProductService.get_related_ids('phone', s24)) == ['A55']
+        assert RelatedProduct.objects.get(product_type='phone', product_id=s24.id).group == 'samsung'
+        with django_assert_num_queries(1):
+            RelatedProductService.get_related_ids('phone', s24)
+
+    def test_previous_brand_is_only_refreshed_when_it_changed(self, create_phone):
+        s24 = create_phone("S24", "Samsung", 799)
+        phone = Phone.objects.get(pk=s24.pk)
+
+        with patch.object(RelatedProductService, 'schedule_refresh') as schedule_refresh, \
+                CaptureQueriesContext(connection) as queries:
+            phone.name = "S24 FE"
+            phone.save()
+            phone.brand = "Galaxy"
+            phone.save()
+
+        assert [call.args for call in schedule_refresh.call_args_list] == [
+            ('phone', s24.id, 'samsung', None), ('phone', s24.id, 'galaxy', 'samsung')
+        ]
+        assert not any('products_relatedproduct' in query['sql'] for query in queries.captured_queries)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_changes_are_refreshed_once_per_group_after_commit(self, create_phone):
+        s24 = create_phone("S24", "Samsung", 799)
+        a55 = create_phone("A55", "Samsung", 449)
+
+        with patch.object(RelatedProductService, 'refresh_group', wraps=RelatedProductService.refresh_group) as refresh, \
+                patch.object(CacheService, 'schedule_invalidation') as schedule_invalidation:
+            with transaction.atomic():
+                a55.brand = "Galaxy"
+                a55.save()
+                s23 = create_phone("S23", "Samsung", 699)
+                refresh.assert_not_called()
+
+        # Three saves, one refresh per affected brand
+        assert sorted(call.args for call in refresh.call_args_list) == [
+            ('phone', 'galaxy', {a55.id}), ('phone', 'samsung', {a55.id, s23.id})
+        ]
+        assert variant_phones(RelatedProduct.get_related_ids('phone', s24.id)) == ['S23']
+        assert RelatedProduct.objects.get(product_type='phone', product_id=a55.id).group == 'galaxy'
+        # Only the details whose related products changed, not the whole brand
+        tags = {tag for call in schedule_invalidation.call_args_list for tag in call.args}
+        assert {f'phone:{pk}' for pk in (s24.id, s23.id, a55.id)} <= tags
+        assert not any(tag.startswith('brand:') for tag in tags if tag not in ('brand:galaxy', 'brand:samsung'))
+
+    def test_accessories_and_full_rebuild_command(self, no_stripe):
+        charger = Accessory.objects.create(name="Charger", price=20, stock=2, stripe_id="prod_a")
+        case = Accessory.objects.create(name="Case", price=10, stock=2, stripe_id="prod_b", is_best_seller=True)
+        cable = Accessory.objects.create(name="Cable", price=5, stock=2, stripe_id="prod_c", is_active=False)
+        RelatedProduct.objects.create(product_type='phone', product_id=999, group='gone', related_ids=[1])
+
+        call_command('rebuild_related_products', stdout=StringIO())
+
+        related = ProductService.get_accessory_details_by_slug(charger.slug)['related_products']
+        assert [accessory.name for accessory in related] == ['Case']
+        assert not RelatedProduct.objects.filter(group='gone').exists()
+
+        # A stock change keeps the ranking; only the rows listing the Charger go stale
+        charger.stock = 1
+        charger.save()
+        assert RelatedProductService.refresh_group('accessory', 'accessories', {charger.id}) == {case.id, cable.id}
@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import patch
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIRequestFactory
+from products.fieldsets import FieldsetParam, fieldset_kwargs
+from products.serializers import PhoneDetailSerializer
+from products.services.cache_service import CacheService
+from store.models import Phone, PhoneVariant
+
+
+@pytest.fixture
+def phone(no_cache_side_effects, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    with patch('store.models.stripe') as stripe:
+        stripe.Price.create.return_value.id = 'price_test'
+        phone = Phone.objects.create(name="Galaxy S24", brand="Samsung", stripe_id="prod_test")
+        for i, color in enumerate(['Black', 'White', 'Blue']):
+            PhoneVariant.objects.create(
+                phone=phone, color=color, storage="128GB", price=799, stock=5,
+                is_active=color != 'Blue',
+                image=SimpleUploadedFile(f'{color}.jpg', b'jpeg') if color != 'White' else None
+            )
+    return phone
+
+
+@pytest.mark.django_db
+class TestPhoneDetailSerializer:
+    def test_detail_is_two_queries(self, phone, django_assert_num_queries):
+        """The phone and its active variants are loaded once, whatever fields read them"""
+        request = APIRequestFactory().get('/products/samsung-galaxy-s24/')
+
+        with django_assert_num_queries(2):
+            loaded = PhoneDetailSerializer.get_queryset().get(pk=phone.pk)
+            data = PhoneDetailSerializer(loaded, context={'request': request}).data
+
+        assert [variant['color'] for variant in data['variants']] == ['Black', 'White']
+        assert data['image'] == data['images'][0]['url']
+        assert data['image'].startswith('http://testserver/')
+        assert [image['color'] for image in data['images']] == ['Black']
+
+    def test_instance_without_prefetch_costs_one_query(self, phone, django_assert_num_queries):
+        phone = Phone.objects.get(pk=phone.pk)
+        with django_assert_num_queries(1):
+            data = PhoneDetailSerializer(phone).data
+        assert len(data['variants']) == 2
+
+
+@pytest.mark.django_db
+class TestMediaURLs:
+    def test_media_base_is_built_once_per_request(self, phone):
+        """Every image URL of the request is joined to one absolute media base"""
+        request = APIRequestFactory().get('/products/samsung-galaxy-s24/')
+        loaded = PhoneDetailSerializer.get_queryset().get(pk=phone.pk)
+        black = loaded.prefetched_variants[0]
+        expected = request.build_absolute_uri(black.image.url)
+
+        with patch.object(request, 'build_absolute_uri', wraps=request.build_absolute_uri) as build:
+            data = PhoneDetailSerializer(loaded, context={'request': request}).data
+
+        assert build.call_count == 1
+        assert data['image'] == data['variants'][0]['image_url'] == data['variants'][0]['image'] == expected
+        assert data['variants'][1]['image_url'] is None
+
+    def test_media_base_url_setting(self, phone, settings):
+        settings.MEDIA_BASE_URL = 'https://cdn.example.com/media'
+        data = PhoneDetailSerializer(PhoneDetailSerializer.get_queryset().get(pk=phone.pk)).data
+        assert data['image'].startswith('https://cdn.example.com/media/phones/')
+        assert data['variants'][0]['image'] == data['image']
+
+
+class TestSparseFieldsets:
+    def test_fieldset_params_are_canonical(self):
+        from django.http import QueryDict
+
+        fieldset = FieldsetParam(PhoneDetailSerializer)
+        allowed = {'fields': fieldset, 'exclude': fieldset}
+
+        params = CacheService.normalize_params(QueryDict('fields=slug,bogus, name&exclude=nope'), allowed)
+        assert params == {'fields': 'name,slug'}
+        assert CacheService.get_key('product_detail', 'x', params) == CacheService.get_key(
+            'product_detail', 'x', CacheService.normalize_params(QueryDict('fields=name,slug'), allowed)
+        )
+        assert fieldset_kwargs(params, always=('id',)) == {'fields': {'id', 'name', 'slug'}}
+
+    @pytest.mark.django_db
+    def test_unrequested_fields_never_run(self, phone, django_assert_num_queries):
+        phone = Phone.objects.get(pk=phone.pk)
+
+        with patch.object(PhoneDetailSerializer, 'get_variants') as get_variants, django_assert_num_queries(0):
+            data = PhoneDetailSerializer([phone], many=True, fields={'name', 'slug'}).data
+        get_variants.assert_not_called()
+        assert data == [{'name': 'Galaxy S24', 'slug': phone.slug}]
+
+        data = PhoneDetailSerializer(phone, exclude={'variants', 'images'}).data
+        assert 'variants' not in data and 'images' not in data and 'image' in data
@@ -0,0 +1,121 @@
+import importlib
+import pytest
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import clear_url_caches, resolve
+from products.management.commands.warm_cache import RateLimiter
+from products.services.cache_service import CacheService
+from products.views import BrandProductsView, ProductDetailView
+from store.models import Accessory, Phone, PhoneVariant
+from store.views import HomePageAPIView
+
+
+def rendered_entry(view_class, path, *args):
+    """The rendered response a view has cached for path, if any"""
+    view = view_class()
+    return CacheService.get(*view.get_rendered_cache_key_parts(RequestFactory().get(path), *args))
+
+
+@pytest.fixture
+def catalog(no_stripe, local_cache, mock_redis):
+    mock_redis.lock.return_value.acquire.return_value = True
+    phone = Phone.objects.create(name="iPhone 15", brand="Apple", stripe_id="prod_phone")
+    PhoneVariant.objects.create(phone=phone, color="Black", storage="128GB", price=999, stock=3,
+                                is_new_arrival=True)
+    accessory = Accessory.objects.create(name="Leather Case", price=49, stock=2, stripe_id="prod_case",
+                                         image='accessories/case.jpg')
+    return phone, accessory
+
+
+@pytest.fixture
+def async_views(settings):
+    """Reload the URLconfs with ASYNC_VIEWS_ENABLED, which they read at import time"""
+    def reload_urls():
+        for module in ('products.urls', 'store.urls', 'promotions.urls', 'ecommerce.urls'):
+            importlib.reload(importlib.import_module(module))
+        clear_url_caches()
+
+    settings.ASYNC_VIEWS_ENABLED = True
+    reload_urls()
+    yield
+    settings.ASYNC_VIEWS_ENABLED = False
+    reload_urls()
+
+
+def warm(*args):
+    out = StringIO()
+    call_command('warm_cache', '--rate', '0', *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWarmCache:
+    def test_every_page_is_cached(self, catalog):
+        phone, accessory = catalog
+
+        output = warm('--workers', '2')
+
+        assert 'Warmed 12 pages' in output
+        assert ' 1 errors' not in output
+        for slug in (phone.slug, accessory.slug):
+            assert CacheService.get('product_detail', slug)['slug'] == slug
+            assert rendered_entry(ProductDetailView, f'/products/{slug}/', slug) is not None
+        assert CacheService.get('phone_detail', phone.slug) is not None
+        assert CacheService.get('accessory_detail', accessory.slug) is not None
+        assert rendered_entry(BrandProductsView, '/products/brand/apple/', 'apple') is not None
+        assert rendered_entry(HomePageAPIView, '/api/homepage/') is not None
+
+    def test_prefix_host_and_secure(self, catalog, settings):
+        phone, accessory = catalog
+        settings.ALLOWED_HOSTS = ['shop.example.com']
+
+        output = warm('--prefix', 'product_detail', '--host', 'shop.example.com', '--secure')
+
+        assert 'Warmed 2 pages' in output
+        image_url = CacheService.get('product_detail', accessory.slug)['image_url']
+        assert image_url == 'https://shop.example.com/media/accessories/case.jpg'
+        assert CacheService.get('phone_detail', phone.slug) is None
+        assert rendered_entry(HomePageAPIView, '/api/homepage/') is None
+
+    def test_async_views_are_awaited(self, catalog, async_views):
+        phone, accessory = catalog
+        assert resolve('/api/homepage/').func.view_class.__name__ == 'AsyncHomePageView'
+
+        output = warm('--prefix', 'homepage', '--prefix', 'brand_products', '--prefix', 'product_detail')
+
+        assert 'Warmed 4 pages' in output
+        assert ' 1 errors' not in output and ' 2 errors' not in output
+        assert rendered_entry(HomePageAPIView, '/api/homepage/') is not None
+        assert rendered_entry(BrandProductsView, '/products/brand/apple/', 'apple') is not None
+        assert rendered_entry(ProductDetailView, f'/products/{phone.slug}/', phone.slug) is not None
+
+    def test_failures_are_reported_per_prefix(self, catalog):
+        phone, accessory = catalog
+
+        with patch.object(ProductDetailView, 'build_products_data', side_effect=RuntimeError('boom')):
+            output = warm('--prefix', 'product_detail', '--prefix', 'phone_detail')
+
+        assert f'/products/{phone.slug}/: ' in output
+        assert 'product_detail: 2 pages, 2 errors' in output
+        assert 'phone_detail: 1 pages, 0 errors' in output
+        assert CacheService.get('product_detail', accessory.slug) is None
+
+
+class TestRateLimiter:
+    def test_calls_are_spaced_across_threads(self):
+        with patch('products.management.commands.warm_cache.time') as clock:
+            clock.monotonic.return_value = 100.0
+            limiter = RateLimiter(10)
+            for _ in range(3):
+                limiter.wait()
+
+        assert [call.args[0] for call in clock.sleep.call_args_list] == pytest.approx([0.1, 0.2])
+
+    def test_zero_rate_never_waits(self):
+        with patch('products.management.commands.warm_cache.time') as clock:
+            limiter = RateLimiter(0)
+            limiter.wait()
+
+        clock.sleep.assert_not_called()
@@ -1,7 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from .views import ProductDetailView, BrandProductsView
+from .views import (
+    ProductDetailView, ProductBatchView, BrandProductsView, CacheMetricsView, CacheCensusView,
+    AsyncProductDetailView, AsyncBrandProductsView
+)
 
 urlpatterns = [
-    path('products/brand/<str:brand>/', BrandProductsView.as_view(), name='brand-products'),
-    path('products/<slug:slug>/', ProductDetailView.as_view(), name='product-detail'),
+    path('metrics/cache/', CacheMetricsView.as_view(), name='cache-metrics'),
+    path('metrics/cache/census/', CacheCensusView.as_view(), name='cache-census'),
+    path('products/brand/<str:brand>/', (
+        AsyncBrandProductsView if settings.ASYNC_VIEWS_ENABLED else BrandProductsView
+    ).as_view(), name='brand-products'),
+    # Before products/<slug>/, which would otherwise match 'batch'
+    path('products/batch/', ProductBatchView.as_view(), name='product-batch'),
+    path('products/<slug:slug>/', (
+        AsyncProductDetailView if settings.ASYNC_VIEWS_ENABLED else ProductDetailView
+    ).as_view(), name='product-detail'),
 ]
@@ -1,8 +1,9 @@
+from django.core.validators import slug_re
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.core.cache import cache
 from django.db.models import Q
 from django.utils import timezone
@@ -10,7 +11,11 @@ from django.conf import settings
 import logging
 from rest_framework.pagination import PageNumberPagination
 
-from store.models import Phone, PhoneVariant, Accessory
+from store.models import Phone, Accessory
+from .fieldsets import FieldsetParam, fieldset_kwargs
+from .models import ProductSlug
+from .permissions import HasMetricsScrapeToken
+from .mixins import AsyncRenderedResponseView, RenderedResponseCacheMixin
 from .serializers import (
     PhoneDetailSerializer, 
     AccessoryDetailSerializer,
@@ -28,110 +33,219 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
 
-class ProductDetailView(APIView):
+# ?fields= / ?exclude= of product detail payloads, see SparseFieldsetMixin
+PRODUCT_FIELDSET = FieldsetParam(
+    PhoneDetailSerializer, AccessoryDetailSerializer, 'promotions.serializers.FlashDealSerializer'
+)
+
+
+class ProductDataMixin:
+    """Builds and caches product detail payloads, for the single and batch endpoints"""
+    
+    # Only sparse fieldsets change the payload
+    cache_params = {'fields': PRODUCT_FIELDSET, 'exclude': PRODUCT_FIELDSET}
+    
+    def get_fieldset(self, params):
+        """Serializer fieldset kwargs; cache tags need the id and slug"""
+        return fieldset_kwargs(params, always=('id', 'slug'))
+    
+    def get_cache_ttl(self, response_data):
+        """Cache flash deals for a shorter time than regular products"""
+        from .services.cache_service import CacheService
+        
+        if response_data.get('type') == 'flash_deal':
+            return settings.CACHE_SETTINGS.get('FLASH_DEAL_DETAIL_TTL', 60 * 5)
+        return CacheService.get_ttl('product_detail')
+    
+    def get_cache_tags(self, response_data):
+        """Tag the entry so the model signals can invalidate it precisely"""
+        from .services.cache_service import CacheService
+        
+        return CacheService.product_tags(response_data['type'], response_data['id'], response_data['slug'])
+    
+    def get_product_source(self, product_type):
+        """(queryset, serializer class) of a ProductSlug product type"""
+        if product_type == ProductSlug.PHONE:
+            # Phones come with their active variants, one extra query in total
+            return PhoneDetailSerializer.get_queryset(), PhoneDetailSerializer
+        if product_type == ProductSlug.ACCESSORY:
+            return Accessory.objects.all(), AccessoryDetailSerializer
+        
+        from promotions.models import FlashDeal
+        from promotions.serializers import FlashDealSerializer
+        return FlashDeal.objects.all(), FlashDealSerializer
+    
+    def build_products_data(self, request, slugs, fieldset=None):
+        """
+        Build detail payloads for many slugs, one query per product type
+        
+        Returns a dict of slug -> payload; slugs without a product are left out.
+        
+        Args:
+            request: The request, for media URLs
+            slugs: Product slugs
+            fieldset: Optional fields / exclude serializer kwargs (see get_fieldset)
+        """
+        from .services.slug_filter import SlugFilter
+        
+        # Slugs that were never saved are rejected without any query
+        slugs = [slug for slug in slugs if SlugFilter.might_contain(slug)]
+        if not slugs:
+            return {}
+        
+        # One indexed lookup finds the table, so every product type costs the same
+        ids_by_type = {}
+        for slug, (product_type, product_id) in ProductSlug.resolve_many(slugs).items():
+            ids_by_type.setdefault(product_type, {})[product_id] = slug
+        
+        products_data = {}
+        for product_type, slugs_by_id in ids_by_type.items():
+            queryset, serializer_class = self.get_product_source(product_type)
+            for product in queryset.filter(pk__in=slugs_by_id):
+                response_data = serializer_class(product, context={'request': request}, **(fieldset or {})).data
+                response_data['type'] = product_type
+                products_data[slugs_by_id[product.pk]] = response_data
+            
+            for product_id, slug in slugs_by_id.items():
+                if slug not in products_data:
+                    # A row removed without signals, e.g. by a raw query
+                    logger.warning(f"Slug registry points {slug} at missing {product_type} {product_id}")
+        
+        logger.debug(f"Database queries executed for {len(slugs)} product slugs")
+        return products_data
+
+
+class ProductDetailView(ProductDataMixin, RenderedResponseCacheMixin, APIView):
     permission_classes = [AllowAny]
     
-    def get_cache_key(self, request, slug):
-        """Generate a cache key based on slug and query parameters"""
-        from .cache_utils import get_cache_key
-        # Extract relevant query parameters that affect the response
-        params = {k: v for k, v in request.GET.items() if k not in ['refresh']}
-        return get_cache_key('product_detail', slug, params)
+    rendered_cache_prefix = 'product_detail'
+    
+    def get_rendered_cache_identifier(self, request, slug):
+        return slug
+    
+    def get_rendered_cache_tags(self, request, slug):
+        return self.get_cache_tags(self.response_data)
+    
+    def get_rendered_cache_timeout(self):
+        return self.get_cache_ttl(self.response_data)
     
     def get(self, request, slug):
-        # Create a more specific cache key including query parameters
-        from .cache_utils import cache_get, cache_set
+        from .services.cache_service import CacheService
+        
+        params = self.get_cache_params(request)
         
         # Skip cache if refresh parameter is present
-        if request.GET.get('refresh'):
+        refresh = bool(request.GET.get('refresh'))
+        if refresh:
             logger.info(f"Bypassing cache for product {slug} due to refresh parameter")
-        else:
-            cached_data = cache_get('product_detail', slug, request.GET)
-            if cached_data:
-                logger.debug(f"Cache hit for product {slug}")
-                return Response(cached_data)
-            
-        try:
-            # Try to get phone with optimized query using select_related and prefetch_related
-            # Use Prefetch to optimize variant loading and store as prefetched_variants
-            from django.db.models import Prefetch
-            phone = Phone.objects.prefetch_related(
-                Prefetch('variants', 
-                         queryset=PhoneVariant.objects.filter(is_active=True),
-                         to_attr='prefetched_variants')
-            ).get(slug=slug)
-            
-            # Log query performance
-            logger.debug(f"Database query executed for phone {slug}")
-            
-            serializer = PhoneDetailSerializer(phone, context={'request': request})
-            response_data = serializer.data
-            response_data['type'] = 'phone'
-            
-            # Cache with different TTL based on product type
-            from .cache_utils import cache_set
-            cache_ttl = getattr(settings, 'CACHE_TTL', 60 * 15)  # Default 15 minutes
-            cache_set('product_detail', slug, response_data, cache_ttl, request.GET)
-            logger.debug(f"Cache set for phone {slug} with TTL {cache_ttl}s")
-            return Response(response_data)
-            
-        except Phone.DoesNotExist:
-            # Try accessory with optimized query
-            try:
-                # Get accessory with optimized query
-                accessory = Accessory.objects.get(slug=slug)
-                
-                # Log query performance
-                logger.debug(f"Database query executed for accessory {slug}")
-                
-                serializer = AccessoryDetailSerializer(accessory, context={'request': request})
-                response_data = serializer.data
-                response_data['type'] = 'accessory'
-                
-                # Cache accessory data
-                from .cache_utils import cache_set
-                cache_ttl = getattr(settings, 'CACHE_TTL', 60 * 15)
-                cache_set('product_detail', slug, response_data, cache_ttl, request.GET)
-                logger.debug(f"Cache set for accessory {slug} with TTL {cache_ttl}s")
-                return Response(response_data)
-                
-            except Accessory.DoesNotExist:
-                # Try flash deal with shorter cache time
-                try:
-                    from promotions.models import FlashDeal
-                    from promotions.serializers import FlashDealDetailSerializer
-                    
-                    # Get flash deal with optimized query
-                    flash_deal = FlashDeal.objects.select_related().prefetch_related('products').get(slug=slug)
-                    
-                    # Log query performance
-                    logger.debug(f"Database query executed for flash deal {slug}")
-                    
-                    serializer = FlashDealDetailSerializer(flash_deal, context={'request': request})
-                    response_data = serializer.data
-                    response_data['type'] = 'flash_deal'
-                    
-                    # Cache flash deals for shorter time (5 minutes)
-                    from .cache_utils import cache_set
-                    flash_deal_ttl = 60 * 5  # 5 minutes
-                    cache_set('product_detail', slug, response_data, flash_deal_ttl, request.GET)
-                    logger.debug(f"Cache set for flash deal {slug} with TTL {flash_deal_ttl}s")
-                    return Response(response_data)
-                    
-                except (ImportError, FlashDeal.DoesNotExist):
-                    return Response(
-                        {"detail": "Product not found"}, 
-                        status=status.HTTP_404_NOT_FOUND
-                    )
+        
+        response_data = CacheService.get_or_compute(
+            'product_detail',
+            slug,
+            lambda: self.build_product_data(request, slug, self.get_fieldset(params)),
+            timeout=self.get_cache_ttl,
+            params=params,
+            refresh=refresh,
+            tags=self.get_cache_tags,
+            # Remember unknown slugs until a product takes the slug (see product_tags)
+            negative_ttl=settings.CACHE_SETTINGS.get('NEGATIVE_TTL', 60),
+            negative_tags=[f"product:{slug}"]
+        )
+        # Kept for the rendered cache's tags and TTL
+        self.response_data = response_data
+        
+        if response_data is None:
+            return Response(
+                {"detail": "Product not found"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(response_data)
+    
+    def build_product_data(self, request, slug, fieldset=None):
+        """Build the detail payload for a phone, accessory or flash deal, or None if not found"""
+        return self.build_products_data(request, [slug], fieldset).get(slug)
 
 
-class BrandProductsView(APIView):
+class ProductBatchView(ProductDataMixin, APIView):
+    """
+    Detail payloads for many products at once: products/batch/?slugs=a,b,c
+    
+    For the cart, wishlist and compare pages. Payloads are shared with
+    products/<slug>/: cached ones are read with one MGET, and the misses
+    are built together (one query per product type) and cached. Results
+    follow the order of the requested slugs; unknown slugs are listed in
+    not_found. ?fields= / ?exclude= work as on products/<slug>/.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        from .services.cache_service import CacheService
+        
+        # Duplicates are dropped, keeping the first occurrence's position
+        slugs = list(dict.fromkeys(
+            slug.strip() for slug in request.GET.get('slugs', '').split(',') if slug.strip()
+        ))
+        if not slugs:
+            return Response(
+                {"detail": "slugs must list at least one product slug"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_slugs = settings.CACHE_SETTINGS.get('PRODUCT_BATCH_MAX_SLUGS', 50)
+        if len(slugs) > max_slugs:
+            return Response(
+                {"detail": f"At most {max_slugs} slugs can be requested at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Only valid slugs become cache keys; the rest cannot name a product
+        valid_slugs = [slug for slug in slugs if slug_re.match(slug)]
+        params = CacheService.normalize_params(request.GET, self.cache_params)
+        products = CacheService.get_many_or_compute(
+            'product_detail',
+            valid_slugs,
+            lambda missed: self.build_products_data(request, missed, self.get_fieldset(params)),
+            timeout=self.get_cache_ttl,
+            params=params,
+            tags=self.get_cache_tags,
+            refresh=bool(request.GET.get('refresh')),
+            negative_ttl=settings.CACHE_SETTINGS.get('NEGATIVE_TTL', 60),
+            negative_tags=lambda slug: [f"product:{slug}"]
+        ) if valid_slugs else {}
+        
+        return Response({
+            'results': [products[slug] for slug in slugs if products.get(slug) is not None],
+            'not_found': [slug for slug in slugs if products.get(slug) is None],
+        })
+
+
+# ?fields= / ?exclude= of brand listings, see SparseFieldsetMixin
+BRAND_PRODUCT_FIELDSET = FieldsetParam(BrandProductSerializer)
+
+
+class BrandProductsView(RenderedResponseCacheMixin, APIView):
     """
     API endpoint to fetch products by brand
     """
     permission_classes = [AllowAny]
     pagination_class = PageNumberPagination
     
+    rendered_cache_prefix = 'brand_products'
+    
+    # The listing is not paginated or filtered; only sparse fieldsets change it
+    cache_params = {'fields': BRAND_PRODUCT_FIELDSET, 'exclude': BRAND_PRODUCT_FIELDSET}
+    
+    def get_rendered_cache_identifier(self, request, brand):
+        return brand.lower()
+    
+    def get_rendered_cache_tags(self, request, brand):
+        return []
+    
+    def get_rendered_cache_namespaces(self, request, brand):
+        return [f'brand:{brand.lower()}', 'brand_products']
+    
+    def get_rendered_cache_timeout(self):
+        return getattr(settings, 'BRAND_CACHE_TTL', 60 * 5)
+    
     def get(self, request, brand):
         brand_lower = brand.lower()
         logger.info(f"BrandProductsView: Received request for brand '{brand_lower}'")
@@ -139,22 +253,45 @@ class BrandProductsView(APIView):
         # Use CacheService for consistent caching with tagging
         from .services.cache_service import CacheService
         
-        # Generate query params for cache key
-        params = {k: v for k, v in request.GET.items() if k not in ['refresh']}
+        params = self.get_cache_params(request)
         
         # Skip cache if refresh parameter is present
-        if request.GET.get('refresh'):
+        refresh = bool(request.GET.get('refresh'))
+        if refresh:
             logger.info(f"Cache bypass requested for brand '{brand_lower}'")
-            cached_data = None
-        else:
-            try:
-                cached_data = CacheService.get('brand_products', brand_lower, params)
-                if cached_data:
-                    logger.debug(f"Cache hit for brand '{brand_lower}'")
-                    return Response(cached_data)
-            except Exception as e:
-                logger.error(f"Error retrieving cache for brand '{brand_lower}': {str(e)}")
-                cached_data = None
+        
+        # Use a shorter cache TTL for brand products (5 minutes)
+        cache_ttl = getattr(settings, 'BRAND_CACHE_TTL', 60 * 5)  # 5 minutes default
+        
+        # Only one worker rebuilds an expired listing, the rest wait for it
+        data = CacheService.get_or_compute(
+            'brand_products',
+            brand_lower,
+            lambda: self.build_brand_products(request, brand_lower, fieldset_kwargs(params)),
+            timeout=cache_ttl,
+            params=params,
+            refresh=refresh,
+            # Invalidating a brand bumps its generation instead of deleting
+            # the listing under every query-param variant
+            namespaces=[
+                f'brand:{brand_lower}',
+                'brand_products'
+            ]
+        )
+        return Response(data)
+    
+    def build_brand_products(self, request, brand_lower, fieldset=None):
+        """
+        Query, combine and serialize the phones and accessories for a brand
+        
+        Args:
+            request: The request, for media URLs
+            brand_lower: Lowercased brand name
+            fieldset: Optional fields / exclude kwargs for BrandProductSerializer
+        """
+        fieldset = fieldset or {}
+        # A phone's fallback image costs a query, so images are only resolved when asked for
+        wants_image = 'image' in fieldset.get('fields', {'image'}) and 'image' not in fieldset.get('exclude', ())
         
         # Start timing the database queries
         import time
@@ -205,13 +342,15 @@ class BrandProductsView(APIView):
         phone_serializer = PhoneForBrandSerializer(
             phones, 
             many=True,
-            context={'request': request}
+            context={'request': request},
+            exclude=None if wants_image else {'image'}
         )
         
         accessory_serializer = AccessoryForBrandSerializer(
             accessories,
             many=True,
-            context={'request': request}
+            context={'request': request},
+            exclude=None if wants_image else {'image_url'}
         )
         
         # Combine and format the data
@@ -227,7 +366,7 @@ class BrandProductsView(APIView):
                     'slug': phone_data['slug'],
                     'brand': phone_data['brand'],
                     'price': float(base_variant['price']),
-                    'image': base_variant['image_url'] or phone_data['image'],
+                    'image': base_variant['image_url'] or phone_data.get('image'),
                     'type': 'phone',
                     'on_sale': False,
                     'is_new': any(v.get('is_new_arrival', False) for v in phone_data['variants']),
@@ -244,7 +383,7 @@ class BrandProductsView(APIView):
                 'slug': accessory_data['slug'],
                 'brand': brand_lower.capitalize(),
                 'price': float(accessory_data['price']),
-                'image': accessory_data['image_url'],
+                'image': accessory_data.get('image_url'),
                 'type': 'accessory',
                 'on_sale': False,
                 'is_new': accessory_data.get('is_new_arrival', False),
@@ -281,24 +420,66 @@ class BrandProductsView(APIView):
         except (ImportError, AttributeError) as e:
             print(f"BrandProductsView: Error applying flash deals: {str(e)}")
         
-        # Cache the results using CacheService with tags for precise invalidation
-        # Use a shorter cache TTL for brand products (5 minutes)
-        cache_ttl = getattr(settings, 'BRAND_CACHE_TTL', 60 * 5)  # 5 minutes default
-        
         # Use the BrandProductSerializer to ensure consistent output format
-        serializer = BrandProductSerializer(products, many=True, context={'request': request})
-        
-        # Cache the serialized data with appropriate tags
-        CacheService.set(
-            'brand_products', 
-            brand_lower, 
-            serializer.data, 
-            timeout=cache_ttl, 
-            params=params,
-            tags=[
-                f'brand:{brand_lower}',
-                'brand_products'
-            ]
+        serializer = BrandProductSerializer(products, many=True, context={'request': request}, **fieldset)
+        return serializer.data
+
+
+class AsyncProductDetailView(AsyncRenderedResponseView):
+    sync_view_class = ProductDetailView
+
+
+class AsyncBrandProductsView(AsyncRenderedResponseView):
+    sync_view_class = BrandProductsView
+
+
+class CacheMetricsView(APIView):
+    """
+    Prometheus scrape endpoint for this worker's cache metrics
+
+    Staff only, or scrapers sending the bearer token configured in
+    CACHE_SETTINGS['METRICS_SCRAPE_TOKEN'] (see HasMetricsScrapeToken).
+    """
+    permission_classes = [IsAdminUser | HasMetricsScrapeToken]
+    
+    def get(self, request):
+        from django.http import HttpResponse
+        from .services.cache_service import CacheService
+        
+        return HttpResponse(
+            CacheService.get_prometheus_metrics(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
         )
-        logger.debug(f"Cache set for brand '{brand_lower}' with TTL {cache_ttl}s and tags")
-        return Response(serializer.data)
+
+
+class CacheCensusView(APIView):
+    """
+    Staff-only per-prefix census of a bounded sample of the cache keyspace
+
+    Query params: sample (cache keys) and tag_sample (tag sets), capped by
+    CACHE_SETTINGS['CENSUS']['MAX_SAMPLE_SIZE'].
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        from .services.cache_service import CacheService
+
+        try:
+            sample_size = int(request.query_params.get('sample', 0)) or None
+            tag_sample_size = int(request.query_params.get('tag_sample', 0)) or None
+        except ValueError:
+            return Response(
+                {"error": "sample and tag_sample must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            census = CacheService.get_key_census(sample_size=sample_size, tag_sample_size=tag_sample_size)
+        except Exception as e:
+            logger.error(f"Error taking cache census: {e}")
+            return Response(
+                {"error": "Cache census failed"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response(census)
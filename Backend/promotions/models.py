@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 import stripe
 from django.conf import settings
+from products.models import ProductSlug
 
 # Set Stripe API key from settings
 stripe.api_key = settings.STRIPE_SECRET_KEY if hasattr(settings, 'STRIPE_SECRET_KEY') else ''
@@ -54,7 +55,8 @@ class FlashDeal(models.Model):
                 
             self.slug = base_slug
             n = 1
-            while FlashDeal.objects.filter(slug=self.slug).exists():
+            # Slugs are unique across all product tables, see ProductSlug
+            while FlashDeal.objects.filter(slug=self.slug).exists() or ProductSlug.is_taken(self.slug):
                 self.slug = f"{base_slug}-{n}"
                 n += 1
         
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from .models import FlashDeal
 from django.utils import timezone
+from products.fieldsets import SparseFieldsetMixin
+from products.media import MediaURLMixin
 
 
-class FlashDealSerializer(serializers.ModelSerializer):
+class FlashDealSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     """
     Serializer for the FlashDeal model.
     Includes all fields and adds some computed fields for convenience.
@@ -68,7 +70,7 @@ class FlashDealSerializer(serializers.ModelSerializer):
         return data
 
 
-class FlashDealListSerializer(serializers.ModelSerializer):
+class FlashDealListSerializer(MediaURLMixin, serializers.ModelSerializer):
     """
     Lightweight serializer for listing flash deals.
     """
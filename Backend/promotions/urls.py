@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -9,5 +10,7 @@ router.register('flash-deals', views.FlashDealViewSet, basename='flash-deal')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('active-flash-deals/', views.ActiveFlashDealsAPIView.as_view(), name='active-flash-deals'),
+    path('active-flash-deals/', (
+        views.AsyncActiveFlashDealsView if settings.ASYNC_VIEWS_ENABLED else views.ActiveFlashDealsAPIView
+    ).as_view(), name='active-flash-deals'),
 ]
@@ -1,13 +1,17 @@
 from django.utils import timezone
 from django.db.models import Q
 from django.core.cache import cache
+from django.http import HttpResponse
+from django.views import View
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework.renderers import JSONRenderer
 from .models import FlashDeal
 from .serializers import FlashDealSerializer, FlashDealListSerializer
+from products.services.async_cache import cache_get, cache_set
 
 
 class FlashDealViewSet(viewsets.ModelViewSet):
@@ -142,3 +146,30 @@ class ActiveFlashDealsAPIView(APIView):
         cache.set(cache_key, data, 60 * 5)
         
         return Response(data)
+
+
+class AsyncActiveFlashDealsView(View):
+    """
+    Async variant of ActiveFlashDealsAPIView for ASGI deployments
+
+    Shares its cache entry, reads and writes it with the async Redis client
+    and queries with the async ORM, so no worker thread is held per request.
+    Always renders JSON.
+    """
+
+    async def get(self, request):
+        cache_key = 'active_flash_deals_public'
+        data = await cache_get(cache_key)
+
+        if not data:
+            now = timezone.now()
+            flash_deals = [
+                flash_deal async for flash_deal in FlashDeal.objects.filter(
+                    is_active=True,
+                    end_date__gte=now  # Only include deals that haven't ended yet
+                ).order_by('start_date')
+            ]
+            data = FlashDealListSerializer(flash_deals, many=True, context={'request': request}).data
+            await cache_set(cache_key, data, 60 * 5)
+
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json')
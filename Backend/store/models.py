@@ -8,6 +8,7 @@ from django.utils.text import slugify
 import uuid
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from products.models import ProductSlug
 
 
 # Set Stripe API key from settings
@@ -34,7 +35,8 @@ class Phone(models.Model):
             base_slug = slugify(f"{self.brand}-{self.name}")
             self.slug = base_slug
             n = 1
-            while Phone.objects.filter(slug=self.slug).exists():
+            # Slugs are unique across all product tables, see ProductSlug
+            while Phone.objects.filter(slug=self.slug).exists() or ProductSlug.is_taken(self.slug):
                 self.slug = f"{base_slug}-{n}"
                 n += 1
        
@@ -160,7 +162,8 @@ class Accessory(models.Model):
             base_slug = slugify(self.name)
             self.slug = base_slug
             n = 1
-            while Accessory.objects.filter(slug=self.slug).exists():
+            # Slugs are unique across all product tables, see ProductSlug
+            while Accessory.objects.filter(slug=self.slug).exists() or ProductSlug.is_taken(self.slug):
                 self.slug = f"{base_slug}-{n}"
                 n += 1
 
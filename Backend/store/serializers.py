@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from .models import Phone, PhoneVariant, Accessory
 from django.conf import settings
+from products.fieldsets import SparseFieldsetMixin
+from products.media import MediaURLMixin
 
 
-class ProductCardSerializer(serializers.Serializer):
+class ProductCardSerializer(MediaURLMixin, serializers.Serializer):
     """
     Lightweight serializer for product cards with only the necessary fields.
     This is used for homepage, category pages, and other listing views.
@@ -32,25 +34,8 @@ class ProductCardSerializer(serializers.Serializer):
     
     def get_image_url(self, obj):
         """Return the image URL as expected by the frontend ProductCard component"""
-        request = self.context.get('request')
-        
-        # Handle PhoneVariant objects
-        if hasattr(obj, 'phone'):
-            if obj.image:
-                if request:
-                    return request.build_absolute_uri(obj.image.url)
-                return obj.image.url
-            return '/images/placeholder.png'
-            
-        # Handle Accessory objects
-        elif hasattr(obj, 'image'):
-            if obj.image:
-                if request:
-                    return request.build_absolute_uri(obj.image.url)
-                return obj.image.url
-            return '/images/placeholder.png'
-            
-        return '/images/placeholder.png'
+        # PhoneVariant and Accessory objects both carry their own image
+        return self.media_url(getattr(obj, 'image', None)) or '/images/placeholder.png'
     
     def get_is_new_arrival(self, obj):
         return getattr(obj, 'is_new_arrival', False)
@@ -59,7 +44,7 @@ class ProductCardSerializer(serializers.Serializer):
         return getattr(obj, 'is_best_seller', False)
 
 
-class PhoneVariantSerializer(serializers.ModelSerializer):
+class PhoneVariantSerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -71,12 +56,7 @@ class PhoneVariantSerializer(serializers.ModelSerializer):
         ]
     
     def get_image_url(self, obj):
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
-        return None
+        return self.media_url(obj.image)
         
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -86,7 +66,7 @@ class PhoneVariantSerializer(serializers.ModelSerializer):
         return representation
 
 
-class PhoneSerializer(serializers.ModelSerializer):
+class PhoneSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     variants = PhoneVariantSerializer(many=True, read_only=True)
     
     class Meta:
@@ -94,7 +74,7 @@ class PhoneSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'brand', 'variants', 'created_at']
 
 
-class AccessorySerializer(serializers.ModelSerializer):
+class AccessorySerializer(SparseFieldsetMixin, MediaURLMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -106,9 +86,4 @@ class AccessorySerializer(serializers.ModelSerializer):
         ]
     
     def get_image_url(self, obj):
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
-        return None
+        return self.media_url(obj.image)
@@ -1,5 +1,7 @@
 from django.db.models import Q
 from django.utils import timezone
+from products.models import RelatedProduct
+from products.services.related_products import RelatedProductService
 from ..models import Phone, PhoneVariant, Accessory
 
 class ProductService:
@@ -63,13 +65,10 @@ class ProductService:
             if not variants.exists():
                 return None
                 
-            # Get related products (other phones from same brand)
-            related_variants = PhoneVariant.objects.filter(
-                is_active=True,
-                phone__brand=phone.brand
-            ).exclude(
-                phone=phone
-            ).select_related('phone').distinct('phone__id')[:4]
+            # Related products (other phones from same brand), ranked ahead of time
+            related_ids = RelatedProductService.get_related_ids(RelatedProduct.PHONE, phone)
+            related = PhoneVariant.objects.filter(is_active=True).select_related('phone').in_bulk(related_ids)
+            related_variants = [related[pk] for pk in related_ids if pk in related]
             
             return {
                 'phone': phone,
@@ -87,12 +86,10 @@ class ProductService:
         try:
             accessory = Accessory.objects.get(slug=slug, is_active=True)
             
-            # Get related accessories
-            related_accessories = Accessory.objects.filter(
-                is_active=True
-            ).exclude(
-                id=accessory.id
-            )[:4]
+            # Related accessories, ranked ahead of time
+            related_ids = RelatedProductService.get_related_ids(RelatedProduct.ACCESSORY, accessory)
+            related = Accessory.objects.filter(is_active=True).in_bulk(related_ids)
+            related_accessories = [related[pk] for pk in related_ids if pk in related]
             
             return {
                 'accessory': accessory,
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -13,5 +14,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('new-arrivals/', views.NewArrivalsAPIView.as_view(), name='new-arrivals'),
     path('best-sellers/', views.BestSellersAPIView.as_view(), name='best-sellers'),
-    path('homepage/', views.HomePageAPIView.as_view(), name='homepage'),
+    path('homepage/', (
+        views.AsyncHomePageView if settings.ASYNC_VIEWS_ENABLED else views.HomePageAPIView
+    ).as_view(), name='homepage'),
 ]
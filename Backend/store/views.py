@@ -1,6 +1,5 @@
 from django.utils import timezone
 from django.db.models import Q
-from django.core.cache import cache
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
@@ -12,6 +11,9 @@ from django.shortcuts import get_object_or_404
 from .models import Phone, PhoneVariant, Accessory
 from .serializers import PhoneSerializer, PhoneVariantSerializer, AccessorySerializer, ProductCardSerializer
 from .services.product_service import ProductService
+from products.fieldsets import FieldsetParam, fieldset_kwargs
+from products.services.cache_service import CacheService
+from products.mixins import AsyncRenderedResponseView, RenderedResponseCacheMixin
 
 
 class ProductPagination(PageNumberPagination):
@@ -29,6 +31,17 @@ class PhoneViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', 'brand']
     ordering_fields = ['name', 'created_at']
     
+    # ?fields= / ?exclude= for list and retrieve, see SparseFieldsetMixin
+    fieldset_param = FieldsetParam(PhoneSerializer)
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            params = CacheService.normalize_params(
+                self.request.GET, {'fields': self.fieldset_param, 'exclude': self.fieldset_param}
+            )
+            kwargs.update(fieldset_kwargs(params))
+        return super().get_serializer(*args, **kwargs)
+    
     @action(detail=True, methods=['get'])
     def variants(self, request, slug=None):
         """Get all variants for a specific phone"""
@@ -40,34 +53,35 @@ class PhoneViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'])
     def details(self, request, slug=None):
         """Get detailed information about a phone with its variants"""
-        cache_key = f'phone_detail_{slug}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        def build():
+            product_data = ProductService.get_phone_details_by_slug(slug)
+            if not product_data:
+                return None
             
-        product_data = ProductService.get_phone_details_by_slug(slug)
-        if not product_data:
+            return {
+                'phone': PhoneSerializer(product_data['phone'], context={'request': request}).data,
+                'variants': PhoneVariantSerializer(
+                    product_data['variants'],
+                    many=True,
+                    context={'request': request}
+                ).data,
+                'related_products': PhoneVariantSerializer(
+                    product_data['related_products'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            }
+        
+        # Details listing a changed phone are invalidated by RelatedProductService
+        def tags(data):
+            return CacheService.product_tags('phone', data['phone']['id'], slug)
+        
+        response_data = CacheService.get_or_compute('phone_detail', slug, build, tags=tags)
+        if response_data is None:
             return Response(
                 {"error": "Phone not found or has no active variants"},
                 status=status.HTTP_404_NOT_FOUND
             )
-            
-        response_data = {
-            'phone': PhoneSerializer(product_data['phone'], context={'request': request}).data,
-            'variants': PhoneVariantSerializer(
-                product_data['variants'],
-                many=True,
-                context={'request': request}
-            ).data,
-            'related_products': PhoneVariantSerializer(
-                product_data['related_products'],
-                many=True,
-                context={'request': request}
-            ).data
-        }
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
         return Response(response_data)
 
 
@@ -85,33 +99,29 @@ class PhoneVariantViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def new_arrivals(self, request):
         """Get all new arrival phone variants"""
-        cache_key = 'new_arrivals_phones'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        new_arrivals = self.queryset.filter(is_new_arrival=True)
-        serializer = self.get_serializer(new_arrivals, many=True, context={'request': request})
-        response_data = serializer.data
+        def build():
+            new_arrivals = self.queryset.filter(is_new_arrival=True)
+            serializer = self.get_serializer(new_arrivals, many=True, context={'request': request})
+            return serializer.data
         
         # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
+        response_data = CacheService.get_or_compute(
+            'new_arrivals', 'phones', build, timeout=60 * 15, namespaces=['new_arrivals']
+        )
         return Response(response_data)
     
     @action(detail=False, methods=['get'])
     def best_sellers(self, request):
         """Get all best seller phone variants"""
-        cache_key = 'best_sellers_phones'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        best_sellers = self.queryset.filter(is_best_seller=True)
-        serializer = self.get_serializer(best_sellers, many=True, context={'request': request})
-        response_data = serializer.data
+        def build():
+            best_sellers = self.queryset.filter(is_best_seller=True)
+            serializer = self.get_serializer(best_sellers, many=True, context={'request': request})
+            return serializer.data
         
         # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
+        response_data = CacheService.get_or_compute(
+            'best_sellers', 'phones', build, timeout=60 * 15, namespaces=['best_sellers']
+        )
         return Response(response_data)
 
 
@@ -129,64 +139,61 @@ class AccessoryViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def new_arrivals(self, request):
         """Get all new arrival accessories"""
-        cache_key = 'new_arrivals_accessories'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        new_arrivals = self.queryset.filter(is_new_arrival=True)
-        serializer = self.get_serializer(new_arrivals, many=True, context={'request': request})
-        response_data = serializer.data
+        def build():
+            new_arrivals = self.queryset.filter(is_new_arrival=True)
+            serializer = self.get_serializer(new_arrivals, many=True, context={'request': request})
+            return serializer.data
         
         # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
+        response_data = CacheService.get_or_compute(
+            'new_arrivals', 'accessories', build, timeout=60 * 15, namespaces=['new_arrivals']
+        )
         return Response(response_data)
     
     @action(detail=False, methods=['get'])
     def best_sellers(self, request):
         """Get all best seller accessories"""
-        cache_key = 'best_sellers_accessories'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        best_sellers = self.queryset.filter(is_best_seller=True)
-        serializer = self.get_serializer(best_sellers, many=True, context={'request': request})
-        response_data = serializer.data
+        def build():
+            best_sellers = self.queryset.filter(is_best_seller=True)
+            serializer = self.get_serializer(best_sellers, many=True, context={'request': request})
+            return serializer.data
         
         # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
+        response_data = CacheService.get_or_compute(
+            'best_sellers', 'accessories', build, timeout=60 * 15, namespaces=['best_sellers']
+        )
         return Response(response_data)
         
     @action(detail=True, methods=['get'])
     def details(self, request, slug=None):
         """Get detailed information about an accessory"""
-        cache_key = f'accessory_detail_{slug}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        def build():
+            product_data = ProductService.get_accessory_details_by_slug(slug)
+            if not product_data:
+                return None
             
-        product_data = ProductService.get_accessory_details_by_slug(slug)
-        if not product_data:
+            return {
+                'accessory': AccessorySerializer(
+                    product_data['accessory'],
+                    context={'request': request}
+                ).data,
+                'related_products': AccessorySerializer(
+                    product_data['related_products'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            }
+        
+        # Details listing a changed accessory are invalidated by RelatedProductService
+        def tags(data):
+            return CacheService.product_tags('accessory', data['accessory']['id'], slug)
+        
+        response_data = CacheService.get_or_compute('accessory_detail', slug, build, tags=tags)
+        if response_data is None:
             return Response(
                 {"error": "Accessory not found or not active"},
                 status=status.HTTP_404_NOT_FOUND
             )
-            
-        response_data = {
-            'accessory': AccessorySerializer(
-                product_data['accessory'],
-                context={'request': request}
-            ).data,
-            'related_products': AccessorySerializer(
-                product_data['related_products'],
-                many=True,
-                context={'request': request}
-            ).data
-        }
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
         return Response(response_data)
 
 
@@ -198,27 +205,25 @@ class NewArrivalsAPIView(APIView):
     pagination_class = ProductPagination
     
     def get(self, request, format=None):
-        cache_key = 'new_arrivals'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        def build():
+            new_arrivals = ProductService.get_new_arrivals()
             
-        new_arrivals = ProductService.get_new_arrivals()
-        
-        response_data = {
-            'products': PhoneVariantSerializer(
-                new_arrivals['phones'],
-                many=True,
-                context={'request': request}
-            ).data + AccessorySerializer(
-                new_arrivals['accessories'],
-                many=True,
-                context={'request': request}
-            ).data
-        }
+            return {
+                'products': PhoneVariantSerializer(
+                    new_arrivals['phones'],
+                    many=True,
+                    context={'request': request}
+                ).data + AccessorySerializer(
+                    new_arrivals['accessories'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            }
         
         # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
+        response_data = CacheService.get_or_compute(
+            'new_arrivals', 'all', build, timeout=60 * 15, namespaces=['new_arrivals']
+        )
         return Response(response_data)
 
 
@@ -227,120 +232,67 @@ class BestSellersAPIView(APIView):
     pagination_class = ProductPagination
     
     def get(self, request, format=None):
-        cache_key = 'best_sellers'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        def build():
+            best_sellers = ProductService.get_best_sellers()
             
-        best_sellers = ProductService.get_best_sellers()
-        
-        response_data = {
-            'products': PhoneVariantSerializer(
-                best_sellers['phones'],
-                many=True,
-                context={'request': request}
-            ).data + AccessorySerializer(
-                best_sellers['accessories'],
-                many=True,
-                context={'request': request}
-            ).data
-        }
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 5)
+            return {
+                'products': PhoneVariantSerializer(
+                    best_sellers['phones'],
+                    many=True,
+                    context={'request': request}
+                ).data + AccessorySerializer(
+                    best_sellers['accessories'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            }
         
+        # Cache for 5 minutes
+        response_data = CacheService.get_or_compute(
+            'best_sellers', 'all', build, timeout=60 * 5, namespaces=['best_sellers']
+        )
         return Response(response_data)
 
 
-class HomePageAPIView(APIView):
+class HomePageAPIView(RenderedResponseCacheMixin, APIView):
     permission_classes = [AllowAny]
     
+    rendered_cache_prefix = 'homepage'
+    rendered_cache_timeout = 60 * 5  # 5 minutes, same as the data cache
+    
+    # No query param changes the payload
+    cache_params = ()
+    
+    def get_rendered_cache_identifier(self, request, *args, **kwargs):
+        return 'data'
+    
+    def get_rendered_cache_tags(self, request, *args, **kwargs):
+        return []
+    
+    def get_rendered_cache_namespaces(self, request, *args, **kwargs):
+        return ['homepage', 'new_arrivals', 'best_sellers']
+    
     def get(self, request, format=None):
         import logging
         logger = logging.getLogger(__name__)
         
-        # Use CacheService for consistent caching with tagging
-        from products.services.cache_service import CacheService
-        
-        # Generate query params for cache key
-        params = {k: v for k, v in request.query_params.items() if k not in ['refresh']}
-        
-        # Skip cache if refresh parameter is present
-        if not request.query_params.get('refresh'):
-            cached_data = CacheService.get('homepage', 'data', params)
-            if cached_data:
-                logger.debug("Returning cached homepage data")
-                return Response(cached_data)
+        params = self.get_cache_params(request)
         
         try:
-            logger.debug("Fetching fresh homepage data")
-            
-            # Get new arrivals
-            new_arrivals = ProductService.get_new_arrivals(limit=4)
-            logger.debug(f"Fetched {len(new_arrivals['phones'])} new arrival phones and {len(new_arrivals['accessories'])} accessories")
-            
-            # Get best sellers
-            best_sellers = ProductService.get_best_sellers(limit=4)
-            logger.debug(f"Fetched {len(best_sellers['phones'])} best seller phones and {len(best_sellers['accessories'])} accessories")
-            
-            # Get featured phones (limit to 3)
-            featured_phones = Phone.objects.prefetch_related('variants').all()[:3]
-            logger.debug(f"Fetched {len(featured_phones)} featured phones")
-            
-            # Use the lightweight ProductCardSerializer for better performance
-            response_data = {
-                'new_arrivals': {
-                    'phones': ProductCardSerializer(
-                        new_arrivals['phones'],
-                        many=True,
-                        context={'request': request}
-                    ).data,
-                    'accessories': ProductCardSerializer(
-                        new_arrivals['accessories'],
-                        many=True,
-                        context={'request': request}
-                    ).data
-                },
-                'best_sellers': {
-                    'phones': ProductCardSerializer(
-                        best_sellers['phones'],
-                        many=True,
-                        context={'request': request}
-                    ).data,
-                    'accessories': ProductCardSerializer(
-                        best_sellers['accessories'],
-                        many=True,
-                        context={'request': request}
-                    ).data
-                },
-                'featured_phones': [
-                    {
-                        'id': phone.id,
-                        'name': phone.name,
-                        'slug': phone.slug,
-                        'brand': phone.brand,
-                        'variants_count': phone.variants.count(),
-                        'price_range': self._get_price_range(phone.variants.all())
-                    }
-                    for phone in featured_phones
-                ]
-            }
-            
-            # Cache with tags for precise invalidation
-            # This allows automatic invalidation when products change
-            CacheService.set(
-                'homepage', 'data', 
-                response_data,
+            # Skip cache if refresh parameter is present
+            # Namespace generations allow automatic invalidation when products change
+            response_data = CacheService.get_or_compute(
+                'homepage', 'data',
+                lambda: self.build_homepage_data(request),
                 timeout=60 * 5,  # 5 minutes
                 params=params,
-                tags=[
+                refresh=bool(request.query_params.get('refresh')),
+                namespaces=[
                     'homepage',
                     'new_arrivals',
                     'best_sellers'
                 ]
             )
-            logger.debug("Homepage data cached successfully with tags")
-            
             return Response(response_data)
             
         except Exception as e:
@@ -350,6 +302,64 @@ class HomePageAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def build_homepage_data(self, request):
+        """Query and serialize the homepage collections"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        logger.debug("Fetching fresh homepage data")
+        
+        # Get new arrivals
+        new_arrivals = ProductService.get_new_arrivals(limit=4)
+        logger.debug(f"Fetched {len(new_arrivals['phones'])} new arrival phones and {len(new_arrivals['accessories'])} accessories")
+        
+        # Get best sellers
+        best_sellers = ProductService.get_best_sellers(limit=4)
+        logger.debug(f"Fetched {len(best_sellers['phones'])} best seller phones and {len(best_sellers['accessories'])} accessories")
+        
+        # Get featured phones (limit to 3)
+        featured_phones = Phone.objects.prefetch_related('variants').all()[:3]
+        logger.debug(f"Fetched {len(featured_phones)} featured phones")
+        
+        # Use the lightweight ProductCardSerializer for better performance
+        return {
+            'new_arrivals': {
+                'phones': ProductCardSerializer(
+                    new_arrivals['phones'],
+                    many=True,
+                    context={'request': request}
+                ).data,
+                'accessories': ProductCardSerializer(
+                    new_arrivals['accessories'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            },
+            'best_sellers': {
+                'phones': ProductCardSerializer(
+                    best_sellers['phones'],
+                    many=True,
+                    context={'request': request}
+                ).data,
+                'accessories': ProductCardSerializer(
+                    best_sellers['accessories'],
+                    many=True,
+                    context={'request': request}
+                ).data
+            },
+            'featured_phones': [
+                {
+                    'id': phone.id,
+                    'name': phone.name,
+                    'slug': phone.slug,
+                    'brand': phone.brand,
+                    'variants_count': phone.variants.count(),
+                    'price_range': self._get_price_range(phone.variants.all())
+                }
+                for phone in featured_phones
+            ]
+        }
+    
     def _get_price_range(self, variants):
         """Helper method to get the price range for a phone's variants"""
         if not variants:
@@ -366,3 +376,7 @@ class HomePageAPIView(APIView):
             return {'min': float(min_price), 'max': None}
         else:
             return {'min': float(min_price), 'max': float(max_price)}
+
+
+class AsyncHomePageView(AsyncRenderedResponseView):
+    sync_view_class = HomePageAPIView